@@ -1,89 +1,609 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for, g
+from flask import send_from_directory
+from werkzeug.middleware.proxy_fix import ProxyFix
+from flask import before_render_template, template_rendered
 import sqlite3
+import sys
+import argparse
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
+import re
+import time
+import math
+import contextlib
+import datetime
+import hashlib
+import atexit
+import io
+import csv
+import json
+import zlib
+import gzip
+import mimetypes
+import assets
+from database import ConnectionPool, write_transaction, ROLLUP_HOURLY_DAYS, ROLLUP_SITE
+from vote_buffer import VoteBuffer, BufferFull
+from page_cache import PageCache
+from vote_stream import VoteHub
+from metrics import Metrics, RequestStats
+from passwords import PasswordHasher, HasherBusy
+from reaper import Reaper
+from ranking import HotDecay, HOT_RATE
+from feed import FEED_SORTS, feed_query
+from rollups import RollupCompactor
+from throttle import MemoryLimiter, SqliteLimiter, WriteGate, WriteBusy
 
 app = Flask(__name__)
-app.secret_key = 'your_secret_key_here_change_this_in_production'
-DATABASE = 'instance/app.db'
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your_secret_key_here_change_this_in_production')
+
+# База и пул соединений (размер пула — на каждый процесс)
+app.config['DATABASE'] = os.environ.get('DATABASE_PATH', 'instance/app.db')
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 8))
+# Вызывается для каждого нового соединения пула — для инструментов (bench.py)
+app.config['DB_ON_CONNECT'] = None
+DATABASE = app.config['DATABASE']
+# Перед запуском сервера — PRAGMA quick_check не дольше STARTUP_CHECK_TIMEOUT_S секунд (0 — без проверки)
+app.config['STARTUP_CHECK_TIMEOUT_S'] = float(os.environ.get('STARTUP_CHECK_TIMEOUT_S', 5))
+
+# Отложенная запись голосов для наплыва голосования, по умолчанию выключена.
+# VOTE_FLUSH_INTERVAL_MS — как часто пишем в базу (и сколько голосов можем потерять при падении)
+app.config['VOTE_WRITE_BEHIND'] = os.environ.get('VOTE_WRITE_BEHIND') == '1'
+app.config['VOTE_FLUSH_INTERVAL_MS'] = int(os.environ.get('VOTE_FLUSH_INTERVAL_MS', 200))
+app.config['VOTE_FLUSH_MAX_BATCH'] = int(os.environ.get('VOTE_FLUSH_MAX_BATCH', 500))
+app.config['VOTE_BUFFER_MAX_PENDING'] = int(os.environ.get('VOTE_BUFFER_MAX_PENDING', 10000))
+
+# Кэш отрендеренных страниц ленты
+app.config['PAGE_CACHE_ENTRIES'] = int(os.environ.get('PAGE_CACHE_ENTRIES', 256))
+app.config['PAGE_CACHE_BYTES'] = int(os.environ.get('PAGE_CACHE_BYTES', 16 * 1024 * 1024))
+
+# Поток обновлений рейтинга: журнал изменений в базе читается раз в интервал,
+# не чаще одного события на инициативу за интервал (см. vote_stream.py)
+app.config['STREAM_INTERVAL_MS'] = int(os.environ.get('STREAM_INTERVAL_MS', 1000))
+# Werkzeug держит на каждого подписчика поток обработчика, поэтому тысячи открытых
+# потоков ему не по силам: подписчиков не больше STREAM_MAX_CLIENTS на процесс
+# (на сервер — столько, умноженное на число обработчиков), лишним — 503 и Retry-After
+# STREAM_RETRY_S секунд. События подписчик получает от всех процессов.
+app.config['STREAM_MAX_CLIENTS'] = int(os.environ.get('STREAM_MAX_CLIENTS', 100))
+app.config['STREAM_RETRY_S'] = int(os.environ.get('STREAM_RETRY_S', 15))
+
+# Метрики запросов для /metrics. METRICS_ENABLED=0 отключает их полностью.
+# SLOW_QUERY_MS > 0 — писать в лог SQL-запросы дольше порога.
+# METRICS_TOKEN — если задан, /metrics требует заголовок Authorization: Bearer <токен>
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 0))
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+# Хэширование паролей в пуле процессов. PASSWORD_HASH_METHOD — алгоритм и стоимость
+# в формате werkzeug (pbkdf2:sha256:600000, scrypt:32768:8:1); старые хэши
+# пересчитываются при входе. Когда в очереди больше PASSWORD_HASH_MAX_PENDING,
+# вход и регистрация сразу отвечают 503.
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', min(os.cpu_count() or 1, 4)))
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ.get('PASSWORD_HASH_MAX_PENDING',
+                                                             4 * app.config['PASSWORD_HASH_WORKERS']))
+
+# Уборка скрытых инициатив: раз в REAPER_INTERVAL_S секунд (0 — выключена)
+# инициативы, скрытые дольше REAPER_GRACE_S, уходят в архив пачками по REAPER_BATCH
+app.config['REAPER_INTERVAL_S'] = float(os.environ.get('REAPER_INTERVAL_S', 60))
+app.config['REAPER_GRACE_S'] = int(os.environ.get('REAPER_GRACE_S', 3600))
+app.config['REAPER_BATCH'] = int(os.environ.get('REAPER_BATCH', 100))
+
+# Пересчёт рейтинга «в тренде» (?sort=hot): раз в HOT_DECAY_INTERVAL_S секунд
+# (0 — выключен), пачками по HOT_DECAY_BATCH инициатив
+app.config['HOT_DECAY_INTERVAL_S'] = float(os.environ.get('HOT_DECAY_INTERVAL_S', 600))
+app.config['HOT_DECAY_BATCH'] = int(os.environ.get('HOT_DECAY_BATCH', 500))
+
+# Итоги голосования для графиков: раз в ROLLUP_COMPACT_INTERVAL_S секунд (0 — выключено)
+# часы старше ROLLUP_HOURLY_DAYS суток сворачиваются в сутки пачками по ROLLUP_COMPACT_BATCH
+app.config['ROLLUP_COMPACT_INTERVAL_S'] = float(os.environ.get('ROLLUP_COMPACT_INTERVAL_S', 3600))
+app.config['ROLLUP_HOURLY_DAYS'] = int(os.environ.get('ROLLUP_HOURLY_DAYS', ROLLUP_HOURLY_DAYS))
+app.config['ROLLUP_COMPACT_BATCH'] = int(os.environ.get('ROLLUP_COMPACT_BATCH', 1000))
+
+# Ограничение частоты записи (RATE_LIMIT_ENABLED=0 — выключено): голосов и новых
+# инициатив в минуту на пользователя (*_PER_MIN) и сколько можно сделать подряд (*_BURST).
+# С одного IP — в RATE_LIMIT_IP_FACTOR раз больше: за адресом бывает много пользователей.
+# RATE_LIMIT_BACKEND=sqlite — общие для всех процессов корзины в файле RATE_LIMIT_DB,
+# memory — свои в каждом процессе.
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+app.config['RATE_LIMIT_BACKEND'] = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+app.config['RATE_LIMIT_DB'] = os.environ.get('RATE_LIMIT_DB', 'instance/rate_limit.db')
+app.config['RATE_LIMIT_VOTE_PER_MIN'] = float(os.environ.get('RATE_LIMIT_VOTE_PER_MIN', 120))
+app.config['RATE_LIMIT_VOTE_BURST'] = int(os.environ.get('RATE_LIMIT_VOTE_BURST', 20))
+app.config['RATE_LIMIT_ADD_PER_MIN'] = float(os.environ.get('RATE_LIMIT_ADD_PER_MIN', 2))
+app.config['RATE_LIMIT_ADD_BURST'] = int(os.environ.get('RATE_LIMIT_ADD_BURST', 5))
+app.config['RATE_LIMIT_IP_FACTOR'] = float(os.environ.get('RATE_LIMIT_IP_FACTOR', 10))
+
+# За обратным прокси адрес клиента берётся из X-Forwarded-For: PROXY_FIX_X_FOR —
+# сколько прокси перед приложением добавляют этот заголовок (0 — не доверять ему,
+# адрес — тот, с которого пришло соединение). PROXY_FIX_X_PROTO — то же для X-Forwarded-Proto.
+app.config['PROXY_FIX_X_FOR'] = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+app.config['PROXY_FIX_X_PROTO'] = int(os.environ.get('PROXY_FIX_X_PROTO', 0))
+
+# Одновременных записей в процессе не больше WRITE_GATE_MAX_WRITERS (0 — без ограничения),
+# ещё WRITE_GATE_MAX_WAITING ждут до WRITE_GATE_WAIT_MS, остальным сразу 503.
+# Ограничение действует в каждом обработчике отдельно: у server.py с N обработчиками
+# до N * WRITE_GATE_MAX_WRITERS записей ждут блокировку sqlite (её busy_timeout)
+app.config['WRITE_GATE_MAX_WRITERS'] = int(os.environ.get('WRITE_GATE_MAX_WRITERS', 4))
+app.config['WRITE_GATE_MAX_WAITING'] = int(os.environ.get('WRITE_GATE_MAX_WAITING', 16))
+app.config['WRITE_GATE_WAIT_MS'] = int(os.environ.get('WRITE_GATE_WAIT_MS', 500))
+
+# Сжатие динамических ответов (HTML, JSON) от GZIP_MIN_BYTES байт (0 — выключено)
+app.config['GZIP_MIN_BYTES'] = int(os.environ.get('GZIP_MIN_BYTES', 1024))
+app.config['GZIP_LEVEL'] = int(os.environ.get('GZIP_LEVEL', 6))
+
+# Объекты процесса: пул соединений, кэш страниц, рассылка голосов, метрики,
+# пул хэширования и буфер голосов. Импорт модуля их не создаёт: это делает
+# init_process_resources() — фабрика приложения или обработчик server.py после fork.
+# Фоновые задачи (reaper, hot_decay, rollup_compactor) работают в одном процессе,
+# см. start_background_jobs().
+db_pool = None
+vote_buffer = None
+page_cache = None
+vote_hub = None
+metrics = None
+password_hasher = None
+reaper = None
+hot_decay = None
+rollup_compactor = None
+rate_limiter = None
+write_gate = None
+# Меняется при каждом запуске: ETag от старой версии шаблонов не должен давать 304
+BOOT_ID = os.urandom(4).hex()
+# Адрес клиента за прокси (PROXY_FIX_*); глубину доверия выставляет configure()
+app.wsgi_app = proxy_fix = ProxyFix(app.wsgi_app, x_for=0, x_proto=0)
+# Собранные бандлы статики (assets.py): имя -> файл с хэшем и доступные сжатия
+asset_manifest = {}
+asset_files = {}
 
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
-    return db
+        db = g._database = db_pool.acquire()
+        # С включёнными метриками запросы идут через обёртку, которая их считает
+        if '_request_stats' in g:
+            g._instrumented_db = metrics.instrument(db, g._request_stats)
+    return g.get('_instrumented_db', db)
 
 @app.teardown_appcontext
 def close_connection(exception):
-    db = getattr(g, '_database', None)
+    db = g.pop('_database', None)
     if db is not None:
-        db.close()
+        # После ошибки базы соединение не возвращаем в пул
+        db_pool.release(db, discard=isinstance(exception, sqlite3.DatabaseError))
 
-# Главная страница
-@app.route('/')
-def index():
-    page = request.args.get('page', 1, type=int)
-    limit = 20
-    offset = (page - 1) * limit
+# Проверка состояния для балансировщика и мониторинга
+@app.route('/health')
+def health():
+    status = db_pool.health()
+    return jsonify(status), 200 if status['ok'] else 503
 
-    db = get_db()
-    initiatives = db.execute('''
-        SELECT i.*, u.username FROM initiatives i
-        JOIN users u ON i.author_id = u.id
-        ORDER BY i.created_at DESC
-        LIMIT ? OFFSET ?
-    ''', (limit, offset)).fetchall()
+# Время запроса, SQL и рендеринга шаблонов по обработчикам.
+# Обработчики подключены всегда (Flask не даёт добавлять их после первого запроса),
+# а считают, только если create_app() создал metrics — по METRICS_ENABLED в app.config.
+@app.before_request
+def start_request_metrics():
+    if metrics is not None:
+        g._request_stats = RequestStats()
+
+@app.after_request
+def finish_request_metrics(response):
+    stats = g.get('_request_stats')
+    if stats is not None:
+        metrics.observe(request.endpoint or 'unknown', response.status_code, stats)
+    return response
+
+def start_render_timer(sender, template, context, **extra):
+    stats = g.get('_request_stats')
+    if stats is not None:
+        stats.render_started = time.perf_counter()
+
+def stop_render_timer(sender, template, context, **extra):
+    stats = g.get('_request_stats')
+    if stats is not None and stats.render_started is not None:
+        stats.render_time += time.perf_counter() - stats.render_started
+        stats.render_started = None
+
+before_render_template.connect(start_render_timer, app)
+template_rendered.connect(stop_render_timer, app)
+
+@app.route('/metrics')
+def metrics_page():
+    if metrics is None:
+        return page_not_found(None)
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'success': False, 'message': 'Нет доступа'}), 403
+
+    pool = db_pool.stats()
+    gauges = {
+        'app_db_pool_size': pool['size'],
+        'app_db_pool_opened': pool['opened'],
+        'app_db_pool_idle': pool['idle'],
+        'app_stream_clients': vote_hub.clients,
+    }
+    return app.response_class(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+# Статика из бандлов: имя файла содержит хэш содержимого, поэтому кэшируется навсегда
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+def load_assets():
+    global asset_manifest, asset_files
+    asset_manifest = assets.load_manifest(app.static_folder)
+    if asset_manifest is None:
+        # Статика не собрана (сторонний WSGI-сервер без python assets.py)
+        asset_manifest = assets.build(app.static_folder)
+    asset_files = {entry['file']: entry['encodings'] for entry in asset_manifest.values()}
+
+@app.template_global()
+def asset_url(name):
+    return url_for('asset_file', filename=asset_manifest[name]['file'])
+
+# Готовая сжатая копия, если клиент её принимает; иначе файл как есть
+@app.route('/assets/<filename>')
+def asset_file(filename):
+    encodings = asset_files.get(filename)
+    if encodings is None:
+        return page_not_found(None)
+    encoding = next((e for e in encodings if request.accept_encodings[e]), None)
+    suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+
+    response = send_from_directory(os.path.join(app.static_folder, assets.DIST), filename + suffix,
+                                   mimetype=mimetypes.guess_type(filename)[0], max_age=ASSET_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# Сжатие ответов на лету. Потоковые ответы (/api/stream, выгрузки) не трогаем:
+# их тело нельзя получить целиком, а поток событий должен уходить сразу.
+COMPRESSIBLE_TYPES = {'text/html', 'application/json', 'text/plain'}
+
+@app.after_request
+def compress_response(response):
+    min_bytes = app.config['GZIP_MIN_BYTES']
+    if (not min_bytes or response.status_code != 200
+            or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_TYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip']:
+        return response
+    response.set_data(gzip.compress(body, app.config['GZIP_LEVEL'], mtime=0))
+    response.headers['Content-Encoding'] = 'gzip'
+    # Сжатое тело — другие байты: строгий ETag становится слабым
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+# Курсор ленты: "<значение столбца сортировки>,<id>" последней показанной инициативы,
+# по умолчанию столбец — created_at; kind приводит значение к типу столбца
+def parse_cursor(token, kind=str):
+    if not token:
+        return None
+    value, sep, initiative_id = token.rpartition(',')
+    if not sep or not value or not initiative_id.isdigit():
+        return None
+    try:
+        return kind(value), int(initiative_id)
+    except ValueError:
+        return None
+
+def make_cursor(initiative, column='created_at'):
+    return f"{initiative[column]},{initiative['id']}"
+
+def parse_sort(value):
+    return value if value in FEED_SORTS else 'new'
+
+# Поколение данных ленты: счётчик в базе (общий для всех процессов),
+# плюс версия буфера незаписанных голосов, если он включён
+def data_generation(db):
+    generation = db.execute("SELECT value FROM counters WHERE name = 'generation'").fetchone()[0]
+    if vote_buffer is not None:
+        return f'{generation}.{vote_buffer.version}'
+    return str(generation)
+
+# Меню пользователя не попадает в кэш: на его место ставится метка,
+# которая заменяется при каждом ответе
+USER_MENU_FRAGMENTS = (
+    ('<!-- user-menu:nav -->', '_nav_menu.html'),
+    ('<!-- user-menu:mobile -->', '_mobile_menu.html'),
+)
+
+def fill_user_menu(body):
+    for marker, template in USER_MENU_FRAGMENTS:
+        body = body.replace(marker, render_template(template), 1)
+    return body
+
+def render_feed(db, cursor, page, sort='new', limit=20):
+    column = FEED_SORTS[sort][0]
+    if cursor:
+        # Постраничная выдача по курсору: диапазон по индексу (столбец, id),
+        # время ответа не зависит от глубины страницы
+        page = None
+        rows = db.execute(feed_query(sort, after=True),
+                          (cursor[0], cursor[1], limit + 1)).fetchall()
+    else:
+        # Старые ссылки вида ?page=N продолжают работать через OFFSET
+        offset = (page - 1) * limit
+        rows = db.execute(feed_query(sort, offset=True), (limit + 1, offset)).fetchall()
 
-    total = db.execute('SELECT COUNT(*) FROM initiatives').fetchone()[0]
+    initiatives = rows[:limit]
+    next_cursor = make_cursor(initiatives[-1], column) if len(rows) > limit else None
+    initiatives = with_pending_votes(initiatives)
+
+    total = db.execute("SELECT value FROM counters WHERE name = 'initiatives'").fetchone()[0]
 
     return render_template('index.html',
                            initiatives=initiatives,
                            page=page,
+                           next_cursor=next_cursor,
+                           sort=sort,
                            total=total,
                            limit=limit,
-                           user=session.get('user'))
+                           defer_user_menu=True)
+
+# Главная страница.
+# Отрендеренная лента кэшируется по (вошёл ли пользователь, порядок, страница) и
+# проверяется по поколению данных; ETag позволяет браузеру получить 304.
+@app.route('/')
+def index():
+    sort = parse_sort(request.args.get('sort'))
+    cursor = parse_cursor(request.args.get('after'), FEED_SORTS[sort][1])
+    page = None if cursor else max(request.args.get('page', 1, type=int), 1)
+    variant = 'user' if session.get('user') else 'anon'
+    key = (variant, sort, cursor or page)
+
+    db = get_db()
+    generation = data_generation(db)
+    etag = hashlib.sha1(
+        f"{BOOT_ID}|{generation}|{key}|{session.get('user', '')}".encode()
+    ).hexdigest()
+
+    # Всплывающие сообщения одноразовые — такие страницы не кэшируем
+    cacheable = '_flashes' not in session
+    # Сравнение слабое: ETag сжатого ответа помечен как слабый
+    if cacheable and request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        body = page_cache.get(key, generation) if cacheable else None
+        if body is None:
+            body = render_feed(db, cursor, page, sort)
+            if cacheable:
+                page_cache.put(key, generation, body)
+        response = app.response_class(fill_user_menu(body))
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = ('private' if variant == 'user' else 'public') + ', no-cache'
+    response.vary.add('Cookie')
+    return response
+
+# Инициативы с рейтингом ниже порога удаляются
+DELETE_THRESHOLD = -10
+MAX_BATCH_VOTES = 100
+
+def parse_vote(data):
+    if not isinstance(data, dict):
+        return None
+    try:
+        initiative_id = int(data.get('initiative_id'))
+    except (TypeError, ValueError):
+        return None
+    vote_value = data.get('vote')  # 1 или -1
+    if vote_value not in [1, -1]:
+        return None
+    return initiative_id, vote_value
+
+# Голос одного пользователя. Вызывается внутри транзакции BEGIN IMMEDIATE:
+# счётчик меняется на разницу со старым голосом, затем голос записывается upsert'ом.
+# hot_score так же: значение пересчитывается с hot_at на текущий момент, прибавляется
+# новый голос и вычитается старый с его весом на сейчас; hot_at сдвигается на сейчас.
+# Все множители не больше 1, поэтому давно не обновлявшаяся строка не переполняется.
+# Повтор того же голоса ничего не меняет: время голоса остаётся прежним, и вес
+# в hot_score не обновляется — повторными голосами рейтинг не накрутить.
+# Возвращает новый итог или None, если инициативы нет или она уже скрыта.
+# Инициатива ниже порога только скрывается; удаляет её фоновый уборщик (reaper.py).
+def apply_vote(db, user_id, initiative_id, vote_value):
+    row = db.execute('''
+        UPDATE initiatives
+        SET votes = votes + ? - COALESCE(
+                (SELECT vote FROM votes WHERE user_id = ? AND initiative_id = ?), 0),
+            hot_score = hot_score * pow(2, (julianday(COALESCE(hot_at, 'now')) - julianday('now')) * ?)
+                + COALESCE((
+                    SELECT iif(v.vote = ?, 0,
+                               ? - v.vote * pow(2, (julianday(v.created_at) - julianday('now')) * ?))
+                    FROM votes v WHERE v.user_id = ? AND v.initiative_id = ?), ?),
+            hot_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND status = 'active'
+        RETURNING votes
+    ''', (vote_value, user_id, initiative_id, HOT_RATE, vote_value, vote_value, HOT_RATE,
+          user_id, initiative_id, vote_value, initiative_id)).fetchone()
+    if row is None:
+        return None
+
+    db.execute('''
+        INSERT INTO votes (user_id, initiative_id, vote) VALUES (?, ?, ?)
+        ON CONFLICT(user_id, initiative_id)
+        DO UPDATE SET vote = excluded.vote,
+                      created_at = CASE WHEN votes.vote = excluded.vote
+                                        THEN votes.created_at ELSE CURRENT_TIMESTAMP END
+    ''', (user_id, initiative_id, vote_value))
+
+    total = row['votes']
+    if total < DELETE_THRESHOLD:
+        db.execute('''
+            UPDATE initiatives SET status = 'hidden', hidden_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (initiative_id,))
+    return total
+
+def vote_result(initiative_id, total):
+    if total is None:
+        return {'success': False, 'initiative_id': initiative_id,
+                'message': 'Инициатива не найдена'}
+    return {'success': True, 'initiative_id': initiative_id,
+            'votes': total, 'deleted': total < DELETE_THRESHOLD}
+
+def start_vote_buffer():
+    global vote_buffer
+    vote_buffer = VoteBuffer(db_pool, apply_vote,
+                             flush_interval=app.config['VOTE_FLUSH_INTERVAL_MS'] / 1000,
+                             max_batch=app.config['VOTE_FLUSH_MAX_BATCH'],
+                             max_pending=app.config['VOTE_BUFFER_MAX_PENDING'])
+    vote_buffer.start()
+
+# Рейтинги с учётом голосов, которые ещё не записаны в базу
+def with_pending_votes(initiatives):
+    if vote_buffer is None:
+        return initiatives
+    return vote_buffer.merge(initiatives)
 
 # API для голосования
+# Отказ по частоте запросов: 429 и через сколько секунд повторить
+def too_many_requests(wait):
+    retry_after = max(math.ceil(wait), 1)
+    response = jsonify({'success': False,
+                        'message': f'Слишком много запросов, попробуйте через {retry_after} с'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+# Списывает cost запросов из корзин IP и пользователя; возвращает ответ 429 или None.
+# Сначала IP: если отказал он, корзина пользователя не тратится; если отказала
+# корзина пользователя, списанное с IP возвращается — отказ не тратит общий лимит адреса.
+# Вызывается после разбора запроса: неверный запрос лимит не тратит.
+def check_rate_limit(action, cost=1):
+    if rate_limiter is None:
+        return None
+    rate = app.config[f'RATE_LIMIT_{action}_PER_MIN'] / 60
+    burst = app.config[f'RATE_LIMIT_{action}_BURST']
+    factor = app.config['RATE_LIMIT_IP_FACTOR']
+    # Больше корзины не списать никогда — такой пакет забирает её целиком
+    cost = min(cost, burst)
+    ip_key = f'{action}:ip:{request.remote_addr}'
+    wait = rate_limiter.take(ip_key, rate * factor, burst * factor, cost)
+    if not wait:
+        wait = rate_limiter.take(f'{action}:user:{session["user_id"]}', rate, burst, cost)
+        if wait:
+            rate_limiter.refund(ip_key, burst * factor, cost)
+    return too_many_requests(wait) if wait else None
+
+# Запись в базу через WriteGate: лишние запросы получают 503, а не встают в очередь блокировки
+@contextlib.contextmanager
+def gated_write(db):
+    try:
+        with write_gate or contextlib.nullcontext(), write_transaction(db):
+            yield
+    except sqlite3.OperationalError as e:
+        # Не дождались блокировки sqlite (busy_timeout) — это тоже перегрузка.
+        # Остальные ошибки (нет таблицы, сбой диска) — настоящие сбои, их не прячем.
+        if is_locked(e):
+            raise WriteBusy() from e
+        raise
+
+def is_locked(error):
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return 'locked' in str(error)
+
+def write_busy():
+    response = jsonify({'success': False, 'message': 'База занята, попробуйте ещё раз'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 @app.route('/api/vote', methods=['POST'])
 def api_vote():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Не авторизован'})
 
-    data = request.json
-    initiative_id = data.get('initiative_id')
-    vote_value = data.get('vote')  # 1 или -1
+    vote = parse_vote(request.json)
+    if not vote:
+        return jsonify({'success': False, 'message': 'Неверные данные'})
+    limited = check_rate_limit('VOTE')
+    if limited:
+        return limited
+
+    db = get_db()
+    if vote_buffer is not None:
+        try:
+            result = vote_result(vote[0], vote_buffer.add(db, session['user_id'], *vote))
+            mark_data_changed()
+            return jsonify(result)
+        except BufferFull:
+            pass  # буфер переполнен — пишем голос сразу
+
+    try:
+        with gated_write(db):
+            total = apply_vote(db, session['user_id'], *vote)
+    except sqlite3.IntegrityError:
+        # Пользователя удалили, пока сессия ещё жива
+        return jsonify({'success': False, 'message': 'Инициатива не найдена'})
+    except WriteBusy:
+        return write_busy()
 
-    if not initiative_id or vote_value not in [1, -1]:
+    result = vote_result(vote[0], total)
+    mark_data_changed()
+    return jsonify(result)
+
+# API для пакетного голосования: все голоса применяются в одной транзакции
+@app.route('/api/votes/batch', methods=['POST'])
+def api_votes_batch():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Не авторизован'})
+
+    items = (request.json or {}).get('votes')
+    if not isinstance(items, list) or not 0 < len(items) <= MAX_BATCH_VOTES:
+        return jsonify({'success': False, 'message': 'Неверные данные'})
+    votes = [parse_vote(item) for item in items]
+    if None in votes:
         return jsonify({'success': False, 'message': 'Неверные данные'})
+    # Каждый голос пакета — как отдельный голос для лимита
+    limited = check_rate_limit('VOTE', cost=len(votes))
+    if limited:
+        return limited
 
     db = get_db()
-    user_id = session['user_id']
+    try:
+        with gated_write(db):
+            results = [vote_result(initiative_id, apply_vote(db, session['user_id'],
+                                                             initiative_id, vote_value))
+                       for initiative_id, vote_value in votes]
+    except sqlite3.IntegrityError:
+        return jsonify({'success': False, 'message': 'Инициатива не найдена'})
+    except WriteBusy:
+        return write_busy()
 
-    # Проверяем, не голосовал ли уже
-    existing = db.execute('SELECT * FROM votes WHERE user_id = ? AND initiative_id = ?',
-                          (user_id, initiative_id)).fetchone()
-
-    if existing:
-        db.execute('DELETE FROM votes WHERE id = ?', (existing['id'],))
-        # Отменяем предыдущий голос
-        db.execute('UPDATE initiatives SET votes = votes - ? WHERE id = ?',
-                   (existing['vote'], initiative_id))
-
-    # Добавляем новый голос
-    db.execute('INSERT INTO votes (user_id, initiative_id, vote) VALUES (?, ?, ?)',
-               (user_id, initiative_id, vote_value))
-    db.execute('UPDATE initiatives SET votes = votes + ? WHERE id = ?',
-               (vote_value, initiative_id))
-
-    # Проверяем, не упали ли голоса ниже -10
-    initiative = db.execute('SELECT * FROM initiatives WHERE id = ?', (initiative_id,)).fetchone()
-    if initiative and initiative['votes'] < -10:
-        db.execute('DELETE FROM initiatives WHERE id = ?', (initiative_id,))
-        db.execute('DELETE FROM votes WHERE initiative_id = ?', (initiative_id,))
+    mark_data_changed()
+    return jsonify({'success': True, 'results': results})
 
-    db.commit()
-    return jsonify({'success': True})
+# Поток обновлений рейтинга (Server-Sent Events)
+@app.route('/api/stream')
+def api_stream():
+    if not vote_hub.subscribe():
+        retry_after = app.config['STREAM_RETRY_S']
+        response = jsonify({'success': False, 'message': 'Слишком много подписчиков',
+                            'retry': retry_after})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    # Новый EventSource (main.js переподключается сам) передаёт номер в параметре
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id', '')
+    last_seq = int(last_event_id) if last_event_id.isdigit() else None
+
+    response = app.response_class(vote_hub.stream(last_seq), mimetype='text/event-stream')
+    response.call_on_close(vote_hub.unsubscribe)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 # API для добавления инициативы
 @app.route('/api/add', methods=['POST'])
@@ -91,20 +611,33 @@ def api_add_initiative():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Не авторизован'})
 
-    data = request.json
+    data = request.json or {}
     title = data.get('title')
     description = data.get('description')
 
     if not title or not description:
         return jsonify({'success': False, 'message': 'Заполните все поля'})
+    limited = check_rate_limit('ADD')
+    if limited:
+        return limited
 
     db = get_db()
-    db.execute('INSERT INTO initiatives (title, description, author_id) VALUES (?, ?, ?)',
-               (title, description, session['user_id']))
-    db.commit()
+    try:
+        with gated_write(db):
+            db.execute('INSERT INTO initiatives (title, description, author_id) VALUES (?, ?, ?)',
+                       (title, description, session['user_id']))
+    except WriteBusy:
+        return write_busy()
+    mark_data_changed()
 
     return jsonify({'success': True})
 
+# Очередь хэширования переполнена — просим повторить позже, а не ждать
+def hasher_busy(template):
+    response = app.make_response((render_template(template, error='Сервер перегружен, попробуйте через минуту'), 503))
+    response.headers['Retry-After'] = '5'
+    return response
+
 # Авторизация
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -115,7 +648,19 @@ def login():
         db = get_db()
         user = db.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
 
-        if user and check_password_hash(user['password'], password):
+        try:
+            if user:
+                ok = password_hasher.verify(user['password'], password)
+            else:
+                ok = password_hasher.reject_unknown()
+            if ok and password_hasher.needs_rehash(user['password']):
+                db.execute('UPDATE users SET password = ? WHERE id = ?',
+                           (password_hasher.hash(password), user['id']))
+                db.commit()
+        except HasherBusy:
+            return hasher_busy('login.html')
+
+        if ok:
             session['user_id'] = user['id']
             session['user'] = user['username']
             return redirect(url_for('index'))
@@ -135,11 +680,15 @@ def register():
             return render_template('register.html', error='Заполните все поля')
 
         db = get_db()
-        hash_pass = generate_password_hash(password)
+        try:
+            hash_pass = password_hasher.hash(password)
+        except HasherBusy:
+            return hasher_busy('register.html')
 
         try:
             db.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, hash_pass))
             db.commit()
+            mark_data_changed()
             return redirect(url_for('login'))
         except sqlite3.IntegrityError:
             return render_template('register.html', error='Пользователь уже существует')
@@ -169,36 +718,26 @@ def profile_page():
     user_id = session['user_id']
     
     try:
-        # Получаем данные пользователя
-        user = db.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+        # Пользователь и его статистика — один поиск по первичному ключу
+        user = db.execute('''
+            SELECT u.*,
+                   COALESCE(s.initiatives_count, 0) AS initiatives_count,
+                   COALESCE(s.total_votes, 0) AS total_votes,
+                   COALESCE(s.positive_votes, 0) AS positive_votes,
+                   COALESCE(s.negative_votes, 0) AS negative_votes,
+                   COALESCE(s.initiatives_votes, 0) AS initiatives_votes
+            FROM users u
+            LEFT JOIN user_stats s ON s.user_id = u.id
+            WHERE u.id = ?
+        ''', (user_id,)).fetchone()
         
         if not user:
             session.clear()
             return redirect(url_for('login'))
         
         # Статистика пользователя
-        stats = {
-            'initiatives_count': db.execute(
-                'SELECT COUNT(*) FROM initiatives WHERE author_id = ?', 
-                (user_id,)
-            ).fetchone()[0] or 0,
-            'total_votes': db.execute('''
-                SELECT COALESCE(SUM(vote), 0) FROM votes 
-                WHERE user_id = ?
-            ''', (user_id,)).fetchone()[0] or 0,
-            'positive_votes': db.execute(
-                'SELECT COUNT(*) FROM votes WHERE user_id = ? AND vote = 1', 
-                (user_id,)
-            ).fetchone()[0] or 0,
-            'negative_votes': db.execute(
-                'SELECT COUNT(*) FROM votes WHERE user_id = ? AND vote = -1', 
-                (user_id,)
-            ).fetchone()[0] or 0,
-            'initiatives_votes': db.execute('''
-                SELECT COALESCE(SUM(votes), 0) FROM initiatives 
-                WHERE author_id = ?
-            ''', (user_id,)).fetchone()[0] or 0
-        }
+        stats = {key: user[key] for key in ('initiatives_count', 'total_votes', 'positive_votes',
+                                            'negative_votes', 'initiatives_votes')}
         
         return render_template('profile.html', 
                              user=dict(user),  # Преобразуем Row в dict для безопасности
@@ -216,14 +755,83 @@ def my_initiatives_page():
     db = get_db()
     initiatives = db.execute('''
         SELECT * FROM initiatives 
-        WHERE author_id = ? 
+        WHERE author_id = ? AND status = 'active'
         ORDER BY created_at DESC
     ''', (session['user_id'],)).fetchall()
     
     return render_template('my_initiatives.html', 
-                           initiatives=initiatives, 
+                           initiatives=with_pending_votes(initiatives), 
                            user=session.get('user'))
 
+# Статистика админки кэшируется на ADMIN_STATS_TTL секунд;
+# любая запись сбрасывает кэш, пересчёт — при следующем открытии админки.
+# Активные берём из счётчика, удалённые автоматически — скрытые плюс архив.
+ADMIN_STATS_TTL = 60
+ADMIN_USERS_LIMIT = 50
+ADMIN_HISTORY_LIMIT = 20
+admin_stats_cache = {'stats': None, 'expires': 0.0}
+
+def admin_stats(db):
+    now = time.monotonic()
+    if admin_stats_cache['stats'] is None or admin_stats_cache['expires'] <= now:
+        row = db.execute('''
+            SELECT (SELECT COUNT(*) FROM users) AS total_users,
+                   (SELECT value FROM counters WHERE name = 'initiatives') AS active_initiatives,
+                   (SELECT COUNT(*) FROM initiatives WHERE status = 'hidden') AS hidden_initiatives,
+                   (SELECT COUNT(*) FROM initiatives_archive) AS archived_initiatives
+        ''').fetchone()
+        stats = dict(row)
+        stats['deleted_initiatives'] = stats['hidden_initiatives'] + stats['archived_initiatives']
+        stats['total_initiatives'] = stats['active_initiatives'] + stats['deleted_initiatives']
+        stats['activity'] = site_activity(db)
+        admin_stats_cache['stats'] = stats
+        admin_stats_cache['expires'] = now + ADMIN_STATS_TTL
+    return admin_stats_cache['stats']
+
+# Голоса по площадке за последние ADMIN_ACTIVITY_DAYS суток из итогов.
+# Дни без голосов в итогах отсутствуют — дополняем нулями.
+ADMIN_ACTIVITY_DAYS = 7
+
+def site_activity(db, days=ADMIN_ACTIVITY_DAYS):
+    today = db.execute("SELECT date('now')").fetchone()[0]
+    start = (datetime.date.fromisoformat(today) - datetime.timedelta(days=days - 1)).isoformat()
+    totals = {row['bucket']: row for row in vote_timeline(db, ROLLUP_SITE, 'day', start)}
+    activity = []
+    for offset in range(days):
+        day = (datetime.date.fromisoformat(start) + datetime.timedelta(days=offset)).isoformat()
+        row = totals.get(day)
+        activity.append({'day': day,
+                         'positive': row['positive'] if row else 0,
+                         'negative': row['negative'] if row else 0})
+    peak = max(day['positive'] + day['negative'] for day in activity) or 1
+    for day in activity:
+        day['height'] = round(100 * (day['positive'] + day['negative']) / peak)
+    return activity
+
+# Последние автоматически снятые инициативы: ещё скрытые и уже в архиве
+def removed_initiatives(db):
+    hidden = db.execute('''
+        SELECT i.id, i.title, i.votes, i.hidden_at, u.username AS author, 0 AS archived
+        FROM initiatives i
+        LEFT JOIN users u ON u.id = i.author_id
+        WHERE i.status = 'hidden'
+        ORDER BY i.hidden_at DESC
+        LIMIT ?
+    ''', (ADMIN_HISTORY_LIMIT,)).fetchall()
+    archived = db.execute('''
+        SELECT a.id, a.title, a.votes, a.hidden_at, u.username AS author, 1 AS archived
+        FROM initiatives_archive a
+        LEFT JOIN users u ON u.id = a.author_id
+        ORDER BY a.hidden_at DESC
+        LIMIT ?
+    ''', (ADMIN_HISTORY_LIMIT,)).fetchall()
+    removed = sorted(hidden + archived, key=lambda init: init['hidden_at'] or '', reverse=True)
+    return removed[:ADMIN_HISTORY_LIMIT]
+
+# Вызывается после каждой записи в базу
+def mark_data_changed():
+    admin_stats_cache['expires'] = 0.0
+
 # Админ-панель
 @app.route('/admin')
 def admin_panel_page():
@@ -238,21 +846,247 @@ def admin_panel_page():
     if not user or not user['is_admin']:
         return redirect(url_for('index'))
     
-    # Данные для админки
-    users = db.execute('SELECT * FROM users ORDER BY created_at DESC').fetchall()
-    
-    stats = {
-        'total_users': db.execute('SELECT COUNT(*) FROM users').fetchone()[0],
-        'total_initiatives': db.execute('SELECT COUNT(*) FROM initiatives').fetchone()[0],
-        'active_initiatives': db.execute('SELECT COUNT(*) FROM initiatives WHERE votes > -10').fetchone()[0],
-        'deleted_initiatives': db.execute('SELECT COUNT(*) FROM initiatives WHERE votes <= -10').fetchone()[0]
-    }
+    # Пользователи постранично по курсору, только нужные столбцы
+    cursor = parse_cursor(request.args.get('after'))
+    if cursor:
+        rows = db.execute('''
+            SELECT id, username, is_admin, created_at FROM users
+            WHERE (created_at, id) < (?, ?)
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', (cursor[0], cursor[1], ADMIN_USERS_LIMIT + 1)).fetchall()
+    else:
+        rows = db.execute('''
+            SELECT id, username, is_admin, created_at FROM users
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', (ADMIN_USERS_LIMIT + 1,)).fetchall()
+
+    users = rows[:ADMIN_USERS_LIMIT]
+    next_cursor = make_cursor(users[-1]) if len(rows) > ADMIN_USERS_LIMIT else None
     
     return render_template('admin.html', 
                            users=users, 
-                           stats=stats, 
+                           next_cursor=next_cursor,
+                           first_page=cursor is None,
+                           stats=admin_stats(db), 
+                           removed=removed_initiatives(db),
                            user=session.get('user'))
 
+# Поисковый запрос FTS5: каждое слово ищем по префиксу, все слова обязательны.
+# Кавычки вокруг слов не дают пользователю сломать синтаксис MATCH.
+SEARCH_LIMIT = 20
+SEARCH_MAX_PAGE = 50
+
+def fts_query(text):
+    words = re.findall(r'\w+', text.lower().replace('ё', 'е'))[:8]
+    return ' '.join(f'"{word}"*' for word in words)
+
+def search_initiatives(db, text, limit=SEARCH_LIMIT, offset=0):
+    match = fts_query(text)
+    if not match:
+        return []
+    initiatives = db.execute('''
+        SELECT i.id, i.title, i.votes, i.created_at, u.username AS author
+        FROM initiatives_fts f
+        JOIN initiatives i ON i.id = f.rowid
+        JOIN users u ON u.id = i.author_id
+        WHERE initiatives_fts MATCH ? AND i.status = 'active'
+        ORDER BY f.rank
+        LIMIT ? OFFSET ?
+    ''', (match, limit, offset)).fetchall()
+    return [search_result(init) for init in initiatives]
+
+def search_result(init):
+    return {
+        'id': init['id'],
+        'title': init['title'],
+        'author': init['author'],
+        'votes': init['votes'],
+        'created_at': init['created_at'][:10]
+    }
+
+# Поля, которые можно запросить у /api/initiatives
+INITIATIVE_FIELDS = {
+    'id': 'i.id',
+    'title': 'i.title',
+    'description': 'i.description',
+    'author_id': 'i.author_id',
+    'author': 'u.username',
+    'votes': 'i.votes',
+    'created_at': 'i.created_at',
+}
+DEFAULT_INITIATIVE_FIELDS = ('id', 'title', 'author', 'votes', 'created_at')
+API_MAX_LIMIT = 100
+
+# API списка инициатив: выбор полей (?fields=id,title), порядок (?sort=new|top|hot)
+# и страницы по курсору (?after=)
+@app.route('/api/initiatives')
+def api_initiatives():
+    fields = [field for field in request.args.get('fields', '').split(',') if field]
+    fields = fields or list(DEFAULT_INITIATIVE_FIELDS)
+    unknown = [field for field in fields if field not in INITIATIVE_FIELDS]
+    if unknown:
+        return jsonify({'success': False, 'message': f"Неизвестные поля: {', '.join(unknown)}"}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), API_MAX_LIMIT)
+    sort = parse_sort(request.args.get('sort'))
+    column, kind = FEED_SORTS[sort]
+    cursor = parse_cursor(request.args.get('after'), kind)
+
+    # Для курсора всегда нужны столбец сортировки и id, даже если их не просили
+    columns = ', '.join(f'{INITIATIVE_FIELDS[field]} AS {field}' for field in fields)
+    sql = feed_query(sort, f'{columns}, i.id AS cursor_id, i.{column} AS cursor_value',
+                     after=cursor is not None)
+    params = (*cursor, limit + 1) if cursor else (limit + 1,)
+    rows = get_db().execute(sql, params).fetchall()
+
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = f"{page[-1]['cursor_value']},{page[-1]['cursor_id']}"
+
+    initiatives = []
+    for row in page:
+        item = {field: row[field] for field in fields}
+        if 'votes' in item and vote_buffer is not None:
+            item['votes'] += vote_buffer.pending_delta(row['cursor_id'])
+        initiatives.append(item)
+    return jsonify({'initiatives': initiatives, 'next': next_cursor})
+
+# Голоса по времени из итогов (vote_rollup_*), сырые голоса не читаются.
+# Почасовые точки есть только за последние ROLLUP_HOURLY_DAYS суток; суточные
+# складываются из свёрнутых суток и ещё не свёрнутых часов.
+TIMELINE_MAX_DAYS = 366
+
+def vote_timeline(db, initiative_id, granularity, start):
+    if granularity == 'hour':
+        return db.execute('''
+            SELECT bucket, positive, negative FROM vote_rollup_hourly
+            WHERE initiative_id = ? AND bucket >= ?
+            ORDER BY bucket
+        ''', (initiative_id, start)).fetchall()
+    return db.execute('''
+        SELECT bucket, SUM(positive) AS positive, SUM(negative) AS negative
+        FROM (
+            SELECT bucket, positive, negative FROM vote_rollup_daily
+            WHERE initiative_id = ? AND bucket >= ?
+            UNION ALL
+            SELECT substr(bucket, 1, 10), positive, negative FROM vote_rollup_hourly
+            WHERE initiative_id = ? AND bucket >= ?
+        )
+        GROUP BY bucket
+        ORDER BY bucket
+    ''', (initiative_id, start, initiative_id, start)).fetchall()
+
+# График голосов инициативы: ?granularity=day|hour, ?days= — за сколько суток
+@app.route('/api/initiative/<int:initiative_id>/timeline')
+def initiative_timeline(initiative_id):
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ('day', 'hour'):
+        return jsonify({'success': False, 'message': 'granularity: day или hour'}), 400
+    max_days = app.config['ROLLUP_HOURLY_DAYS'] if granularity == 'hour' else TIMELINE_MAX_DAYS
+    days = min(max(request.args.get('days', 30 if granularity == 'day' else 2, type=int), 1), max_days)
+
+    db = get_db()
+    initiative = db.execute("SELECT id FROM initiatives WHERE id = ? AND status = 'active'",
+                            (initiative_id,)).fetchone()
+    if not initiative:
+        return jsonify({'success': False, 'message': 'Инициатива не найдена'}), 404
+
+    start = db.execute("SELECT date('now', ?)", (f'-{days - 1} days',)).fetchone()[0]
+    points = [{'bucket': row['bucket'], 'positive': row['positive'], 'negative': row['negative']}
+              for row in vote_timeline(db, initiative_id, granularity, start)]
+    return jsonify({'initiative_id': initiative_id, 'granularity': granularity,
+                    'days': days, 'points': points})
+
+# Выгрузка таблиц целиком. Это намеренно полный проход по первичному ключу,
+# строки читаются пачками по EXPORT_BATCH и сразу уходят клиенту.
+EXPORT_QUERIES = {
+    'initiatives': ('SELECT id, title, description, author_id, votes, created_at, status, hidden_at '
+                    'FROM initiatives ORDER BY id'),
+    'votes': 'SELECT id, user_id, initiative_id, vote, created_at FROM votes ORDER BY id',
+}
+EXPORT_BATCH = 1000
+
+def export_rows(table, fmt):
+    # Соединение своё: соединение запроса вернётся в пул раньше, чем закончится выгрузка
+    conn = db_pool.acquire()
+    try:
+        cursor = conn.execute(EXPORT_QUERIES[table])
+        columns = [column[0] for column in cursor.description]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == 'csv':
+            writer.writerow(columns)
+
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH)
+            if not rows:
+                break
+            for row in rows:
+                if fmt == 'csv':
+                    writer.writerow(tuple(row))
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+                    buffer.write('\n')
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    finally:
+        db_pool.release(conn)
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# API для админки - потоковая выгрузка initiatives/votes в NDJSON или CSV
+@app.route('/api/export')
+def api_export():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Не авторизован'})
+
+    db = get_db()
+    admin_check = db.execute('SELECT is_admin FROM users WHERE id = ?',
+                             (session['user_id'],)).fetchone()
+    if not admin_check or not admin_check['is_admin']:
+        return jsonify({'success': False, 'message': 'Нет прав администратора'})
+
+    table = request.args.get('table', 'initiatives')
+    fmt = request.args.get('format', 'ndjson')
+    if table not in EXPORT_QUERIES or fmt not in ('ndjson', 'csv'):
+        return jsonify({'success': False, 'message': 'Неверные параметры выгрузки'}), 400
+
+    filename = f'{table}.{fmt}'
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    body = export_rows(table, fmt)
+    if request.args.get('gzip') == '1':
+        body = gzip_stream(body)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    response = app.response_class(body, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# API поиска инициатив
+@app.route('/api/search')
+def api_search():
+    query = request.args.get('q', '')
+    page = min(max(request.args.get('page', 1, type=int), 1), SEARCH_MAX_PAGE)
+
+    db = get_db()
+    # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+    initiatives = search_initiatives(db, query, SEARCH_LIMIT + 1, (page - 1) * SEARCH_LIMIT)
+
+    return jsonify({'initiatives': initiatives[:SEARCH_LIMIT],
+                    'page': page,
+                    'has_more': len(initiatives) > SEARCH_LIMIT and page < SEARCH_MAX_PAGE})
+
 # API для поиска инициатив (админка)
 @app.route('/api/admin/search')
 def api_admin_search():
@@ -270,27 +1104,21 @@ def api_admin_search():
     if not query:
         return jsonify({'initiatives': []})
     
-    # Поиск по названию и автору
-    initiatives = db.execute('''
-        SELECT i.*, u.username as author 
-        FROM initiatives i
-        JOIN users u ON i.author_id = u.id
-        WHERE i.title LIKE ? OR u.username LIKE ?
+    # Поиск по названию и описанию, затем инициативы автора с таким логином
+    result = search_initiatives(db, query)
+    by_author = db.execute('''
+        SELECT i.id, i.title, i.votes, i.created_at, u.username AS author
+        FROM users u
+        JOIN initiatives i ON i.author_id = u.id
+        WHERE u.username = ? AND i.status = 'active'
         ORDER BY i.created_at DESC
-        LIMIT 20
-    ''', (f'%{query}%', f'%{query}%')).fetchall()
-    
-    result = []
-    for init in initiatives:
-        result.append({
-            'id': init['id'],
-            'title': init['title'],
-            'author': init['author'],
-            'votes': init['votes'],
-            'created_at': init['created_at'][:10]
-        })
+        LIMIT ?
+    ''', (query.strip(), SEARCH_LIMIT)).fetchall()
+
+    found = {init['id'] for init in result}
+    result += [search_result(init) for init in by_author if init['id'] not in found]
     
-    return jsonify({'initiatives': result})
+    return jsonify({'initiatives': result[:SEARCH_LIMIT]})
 
 # API для удаления инициативы
 @app.route('/api/initiative/<int:initiative_id>', methods=['DELETE'])
@@ -317,11 +1145,11 @@ def api_delete_initiative(initiative_id):
     if not (is_author or is_admin):
         return jsonify({'success': False, 'message': 'Нет прав на удаление'})
     
-    # Удаляем голоса и инициативу
+    # Голоса удаляются каскадом по внешнему ключу
     try:
-        db.execute('DELETE FROM votes WHERE initiative_id = ?', (initiative_id,))
         db.execute('DELETE FROM initiatives WHERE id = ?', (initiative_id,))
         db.commit()
+        mark_data_changed()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -348,6 +1176,7 @@ def api_admin_toggle(user_id):
     new_status = 0 if target_user['is_admin'] else 1
     db.execute('UPDATE users SET is_admin = ? WHERE id = ?', (new_status, user_id))
     db.commit()
+    mark_data_changed()
     
     return jsonify({'success': True})
 
@@ -368,12 +1197,11 @@ def api_admin_delete_user(user_id):
     if not admin_check or not admin_check['is_admin']:
         return jsonify({'success': False, 'message': 'Нет прав администратора'})
     
-    # Удаляем пользователя и его инициативы
+    # Его голоса, инициативы и голоса за них удаляются каскадом по внешним ключам
     try:
-        db.execute('DELETE FROM votes WHERE user_id = ?', (user_id,))
-        db.execute('DELETE FROM initiatives WHERE author_id = ?', (user_id,))
         db.execute('DELETE FROM users WHERE id = ?', (user_id,))
         db.commit()
+        mark_data_changed()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -383,45 +1211,182 @@ def api_admin_delete_user(user_id):
 def page_not_found(e):
     return render_template('404.html'), 404
 
-if __name__ == '__main__':
-    # Проверяем и создаем БД при первом запуске
-    if not os.path.exists('instance'):
-        os.makedirs('instance')
-    
-    if not os.path.exists(DATABASE):
-        from database import init_db
-        init_db()
-        print("База данных создана. Администратор: admin / Admin123!")
-    
-    app.run(debug=True, port=5000)
+# Проверка базы перед запуском. Повреждённую базу не трогаем и сервер
+# не запускаем — восстановление из копии: python database.py restore.
+# Если проверка не уложилась во время, запускаемся: ошибок она не нашла.
+def check_db():
+    folder = os.path.dirname(DATABASE)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
 
-    # Функция для проверки и восстановления базы данных
-def check_and_repair_db():
-    if not os.path.exists('instance'):
-        os.makedirs('instance')
-    
-    db_path = DATABASE
-    needs_repair = False
-    
-    if os.path.exists(db_path):
-        try:
-            test_conn = sqlite3.connect(db_path)
-            test_cursor = test_conn.cursor()
-            # Пробуем выполнить простой запрос
-            test_cursor.execute("SELECT 1")
-            test_conn.close()
-        except sqlite3.Error:
-            needs_repair = True
-            print("Обнаружена поврежденная база данных, пересоздаю...")
-            os.remove(db_path)
-    
-    if not os.path.exists(db_path) or needs_repair:
-        print("Создание новой базы данных...")
-        from database import init_db
-        init_db()
+    timeout = app.config['STARTUP_CHECK_TIMEOUT_S']
+    if os.path.exists(DATABASE) and timeout > 0:
+        from database import quick_check
+        finished, problems = quick_check(DATABASE, timeout)
+        if problems:
+            print(f"База {DATABASE} повреждена, сервер не запущен:")
+            for problem in problems:
+                print(f"    {problem}")
+            print(f"Восстановление из копии: python database.py --db {DATABASE} restore")
+            return False
+        if not finished:
+            print(f"Проверка базы не уложилась в {timeout:g} с, ошибок до этого места нет")
+
+    # Создаёт базу при первом запуске или докатывает миграции на существующую
+    from database import init_db
+    init_db(DATABASE)
+    return True
+
+def init_process_resources():
+    global db_pool, vote_buffer, page_cache, vote_hub, metrics, password_hasher, rate_limiter, write_gate
+    db_pool = ConnectionPool(app.config['DATABASE'], size=app.config['DB_POOL_SIZE'],
+                             on_connect=app.config['DB_ON_CONNECT'])
+    page_cache = PageCache(app.config['PAGE_CACHE_ENTRIES'], app.config['PAGE_CACHE_BYTES'])
+    vote_hub = VoteHub(db_pool, interval=app.config['STREAM_INTERVAL_MS'] / 1000,
+                       max_clients=app.config['STREAM_MAX_CLIENTS'])
+    metrics = Metrics(slow_query_ms=app.config['SLOW_QUERY_MS']) if app.config['METRICS_ENABLED'] else None
+    password_hasher = PasswordHasher(method=app.config['PASSWORD_HASH_METHOD'],
+                                     workers=app.config['PASSWORD_HASH_WORKERS'],
+                                     max_pending=app.config['PASSWORD_HASH_MAX_PENDING'])
+    rate_limiter = None
+    if app.config['RATE_LIMIT_ENABLED']:
+        if app.config['RATE_LIMIT_BACKEND'] == 'sqlite':
+            rate_limiter = SqliteLimiter(app.config['RATE_LIMIT_DB'])
+        else:
+            rate_limiter = MemoryLimiter()
+    write_gate = None
+    if app.config['WRITE_GATE_MAX_WRITERS'] > 0:
+        write_gate = WriteGate(max_writers=app.config['WRITE_GATE_MAX_WRITERS'],
+                               max_waiting=app.config['WRITE_GATE_MAX_WAITING'],
+                               wait=app.config['WRITE_GATE_WAIT_MS'] / 1000)
+    vote_buffer = None
+    if app.config['VOTE_WRITE_BEHIND']:
+        start_vote_buffer()
+    # Статистика админки могла остаться от прежней базы
+    mark_data_changed()
+
+# Фоновые задачи в единственном экземпляре: в процессе `run` или в отдельном
+# процессе задач server.py, но не в каждом обработчике
+def start_background_jobs():
+    global reaper, hot_decay, rollup_compactor
+    if app.config['REAPER_INTERVAL_S'] > 0:
+        reaper = Reaper(db_pool, interval=app.config['REAPER_INTERVAL_S'],
+                        grace=app.config['REAPER_GRACE_S'], batch=app.config['REAPER_BATCH'],
+                        on_change=mark_data_changed)
+        reaper.start()
+    if app.config['HOT_DECAY_INTERVAL_S'] > 0:
+        hot_decay = HotDecay(db_pool, interval=app.config['HOT_DECAY_INTERVAL_S'],
+                             batch=app.config['HOT_DECAY_BATCH'])
+        hot_decay.start()
+    if app.config['ROLLUP_COMPACT_INTERVAL_S'] > 0:
+        rollup_compactor = RollupCompactor(db_pool, interval=app.config['ROLLUP_COMPACT_INTERVAL_S'],
+                                           keep_days=app.config['ROLLUP_HOURLY_DAYS'],
+                                           batch=app.config['ROLLUP_COMPACT_BATCH'])
+        rollup_compactor.start()
+
+# Процесс задач server.py: запросы он не обслуживает, нужен только пул соединений
+def start_jobs_process():
+    global db_pool
+    db_pool = ConnectionPool(app.config['DATABASE'], size=2)
+    start_background_jobs()
+
+# Обработчик больше не принимает соединения: потоки /api/stream завершаем сразу,
+# чтобы остановка не ждала их весь graceful_timeout
+def close_streams():
+    if vote_hub is not None:
+        vote_hub.close()
+
+# При выходе процесса останавливаем задачи, дописываем буфер голосов и закрываем пулы.
+# Создано может быть не всё (процесс задач, мастер server.py), поэтому проверяем каждый объект.
+def release_process_resources():
+    global db_pool, vote_buffer, password_hasher, rate_limiter, reaper, hot_decay, rollup_compactor
+    for job in (reaper, hot_decay, rollup_compactor):
+        if job is not None:
+            job.stop()
+    reaper = hot_decay = rollup_compactor = None
+    if vote_buffer is not None:
+        vote_buffer.stop()
+        vote_buffer = None
+    close_streams()
+    if password_hasher is not None:
+        password_hasher.shutdown()
+        password_hasher = None
+    if rate_limiter is not None:
+        rate_limiter.close()
+        rate_limiter = None
+    if db_pool is not None:
+        db_pool.close_all()
+        db_pool = None
+
+def configure(config=None):
+    global DATABASE
+    app.config.update(config or {})
+    DATABASE = app.config['DATABASE']
+    proxy_fix.x_for = app.config['PROXY_FIX_X_FOR']
+    proxy_fix.x_proto = app.config['PROXY_FIX_X_PROTO']
+    return app
+
+# Фабрика приложения. Приложение одно на процесс, поэтому настройки
+# применяются к нему, а объекты процесса пересоздаются под новые настройки.
+# Значения по умолчанию берутся из переменных окружения (см. выше).
+# Фоновые задачи фабрика не запускает. Для стороннего WSGI-сервера: app:create_app().
+def create_app(config=None):
+    configure(config)
+    release_process_resources()
+    init_process_resources()
+    load_assets()
+    return app
+
+atexit.register(release_process_resources)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Запуск приложения')
+    parser.add_argument('--db', help='путь к файлу базы')
+    parser.add_argument('--pool-size', type=int, help='соединений с базой на процесс')
+    parser.add_argument('--page-cache', type=int, help='страниц ленты в кэше')
+    commands = parser.add_subparsers(dest='command')
+    dev = commands.add_parser('run', help='отладочный сервер Flask (по умолчанию)')
+    dev.add_argument('--host', default='127.0.0.1')
+    dev.add_argument('--port', type=int, default=5000)
+    dev.add_argument('--no-debug', action='store_true', help='без отладчика и перезагрузки')
+    prod = commands.add_parser('serve', help='несколько процессов-обработчиков на одном сокете')
+    prod.add_argument('--bind', default='127.0.0.1:8000', help='адрес:порт')
+    prod.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='процессов-обработчиков')
+    prod.add_argument('--graceful-timeout', type=float, default=30,
+                      help='сколько секунд ждать начатые запросы при остановке')
+    args = parser.parse_args(argv)
+
+    config = {}
+    if args.db:
+        config['DATABASE'] = args.db
+    if args.pool_size:
+        config['DB_POOL_SIZE'] = args.pool_size
+    if args.page_cache:
+        config['PAGE_CACHE_ENTRIES'] = args.page_cache
+    configure(config)
+    # Проверяем и создаем БД до запуска сервера и до первого соединения с ней
+    if not check_db():
+        return 1
+    # Статика собирается один раз здесь, процессы приложения читают готовый манифест
+    assets.build(app.static_folder)
+
+    if args.command == 'serve':
+        from server import serve
+        # Мастер только форкает: объекты процесса и потоки создаются уже в обработчиках,
+        # фоновые задачи — в одном отдельном процессе. Манифест статики обработчики получают от мастера.
+        load_assets()
+        return serve(app, args.bind, workers=args.workers,
+                     post_fork=init_process_resources, on_exit=release_process_resources,
+                     on_drain=close_streams, jobs=start_jobs_process, graceful_timeout=args.graceful_timeout)
+
+    debug = not getattr(args, 'no_debug', False)
+    # С отладчиком werkzeug запускает приложение заново в дочернем процессе,
+    # родитель только следит за файлами — ему объекты процесса не нужны
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        create_app()
+        start_background_jobs()
+    app.run(host=getattr(args, 'host', '127.0.0.1'), port=getattr(args, 'port', 5000), debug=debug)
+    return 0
 
 if __name__ == '__main__':
-    # Проверяем и восстанавливаем БД при запуске
-    check_and_repair_db()
-    
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    sys.exit(main())
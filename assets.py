@@ -0,0 +1,133 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Сборка статики. Исходники из static/ склеиваются в бандлы, в имени файла —
+# хэш содержимого (app.3f2a9c1b.css), рядом лежат сжатые копии .gz и .br
+# (brotli — если установлен). Файл с таким именем никогда не меняется, поэтому
+# отдаётся с Cache-Control immutable; новая версия получает новое имя, а шаблоны
+# берут актуальное через asset_url(). Сборка идемпотентна: существующие файлы
+# не перезаписываются, старые версии остаются для страниц, открытых до выкладки.
+# Собирает python assets.py или app.py main() перед запуском сервера;
+# процессы приложения только читают манифест (load_manifest).
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+# Общие app.css/app.js подключает layout.html, остальные — свои страницы
+BUNDLES = {
+    'app.css': ('css/style.css',),
+    'app.js': ('js/main.js', 'js/layout.js'),
+    '404.css': ('css/pages/404.css',),
+    'add_initiative.js': ('js/pages/add_initiative.js',),
+    'admin.css': ('css/pages/admin.css',),
+    'admin.js': ('js/pages/admin.js',),
+    'index.css': ('css/pages/index.css',),
+    'index.js': ('js/pages/index.js',),
+    'login.css': ('css/pages/login.css',),
+    'my_initiatives.js': ('js/pages/my_initiatives.js',),
+    'profile.css': ('css/pages/profile.css',),
+    'register.css': ('css/pages/register.css',),
+    'register.js': ('js/pages/register.js',),
+}
+
+# Сжатые копии: (Content-Encoding, суффикс файла, функция сжатия)
+ENCODINGS = [('gzip', '.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+if brotli is not None:
+    ENCODINGS.insert(0, ('br', '.br', lambda data: brotli.compress(data, quality=11)))
+
+def bundle_content(sources, static_dir=STATIC_DIR):
+    parts = []
+    for source in sources:
+        with open(os.path.join(static_dir, source), 'rb') as f:
+            parts.append(f.read().rstrip(b'\n') + b'\n')
+    return b'\n'.join(parts)
+
+def write_file(path, data):
+    if not os.path.exists(path):
+        # Через временный файл: параллельный запуск не отдаст недописанный бандл
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+# Собирает все бандлы; возвращает манифест
+# {имя: {'file': имя с хэшем, 'encodings': [доступные сжатия]}}
+def build(static_dir=STATIC_DIR, quiet=True):
+    dist = os.path.join(static_dir, DIST)
+    os.makedirs(dist, exist_ok=True)
+
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        data = bundle_content(sources, static_dir)
+        base, ext = os.path.splitext(name)
+        filename = f'{base}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        write_file(os.path.join(dist, filename), data)
+
+        encodings = []
+        for encoding, suffix, compress in ENCODINGS:
+            path = os.path.join(dist, filename + suffix)
+            if not os.path.exists(path):
+                compressed = compress(data)
+                # Сжатие, которое не экономит, не храним
+                if len(compressed) >= len(data):
+                    continue
+                write_file(path, compressed)
+            encodings.append(encoding)
+        manifest[name] = {'file': filename, 'encodings': encodings}
+        if not quiet:
+            print(f"{filename}: {len(data)} байт, сжатия: {', '.join(encodings) or 'нет'}")
+
+    path = os.path.join(dist, MANIFEST)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+    return manifest
+
+# Манифест последней сборки; None, если статика ещё не собрана
+def load_manifest(static_dir=STATIC_DIR):
+    try:
+        with open(os.path.join(static_dir, DIST, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+# Удаляет собранные файлы, которых нет в манифесте
+def clean(manifest, static_dir=STATIC_DIR):
+    dist = os.path.join(static_dir, DIST)
+    keep = {MANIFEST}
+    for entry in manifest.values():
+        keep.add(entry['file'])
+        keep.update(entry['file'] + suffix for _, suffix, _ in ENCODINGS)
+    removed = 0
+    for filename in os.listdir(dist):
+        if filename not in keep:
+            os.remove(os.path.join(dist, filename))
+            removed += 1
+    return removed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Сборка статики')
+    parser.add_argument('--static', default=STATIC_DIR, help='папка static')
+    parser.add_argument('--clean', action='store_true', help='удалить старые версии бандлов')
+    args = parser.parse_args(argv)
+
+    if brotli is None:
+        print("Модуль brotli не установлен, собираем только gzip")
+    manifest = build(args.static, quiet=False)
+    if args.clean:
+        print(f"Удалено старых файлов: {clean(manifest, args.static)}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import glob
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+from database import connect, quick_check
+
+# Резервные копии работающей базы через backup API sqlite.
+# Копия снимается в открытой транзакции чтения: в режиме WAL она не мешает
+# записи, а все шаги копирования видят один и тот же снимок, поэтому чужая запись
+# не заставляет начинать копию заново. Копируем по pages страниц за шаг с паузой
+# между шагами, чтобы не занимать диск целиком. Готовая копия проверяется
+# quick_check и появляется под своим именем только целиком (os.replace).
+# Хранится keep последних копий; копии, сохранённые перед восстановлением
+# (…-pre-restore.db), в это число не входят и не удаляются.
+
+# Суффикс копии текущей базы, которую restore() сохраняет перед подменой
+PRE_RESTORE = '-pre-restore'
+
+# Копии лежат рядом с базой: instance/backups/app-20250101-120000-123456.db.
+# В имени микросекунды: две копии в одну секунду не затирают друг друга.
+def backup_dir_for(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'backups')
+
+def snapshot_path(db_path, backup_dir, suffix=''):
+    base = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(backup_dir, f'{base}-{datetime.now():%Y%m%d-%H%M%S-%f}{suffix}.db')
+
+# Копии с суффиксом suffix (по умолчанию — обычные) в порядке создания
+def list_backups(db_path, backup_dir, suffix=''):
+    base = os.path.splitext(os.path.basename(db_path))[0]
+    paths = glob.glob(os.path.join(backup_dir, f'{base}-*{suffix}.db'))
+    if not suffix:
+        paths = [path for path in paths if not path.endswith(f'{PRE_RESTORE}.db')]
+    # Имена сортируются по времени создания
+    return sorted(paths)
+
+def fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# Снимает копию базы в файл target; возвращает число скопированных страниц
+def copy_database(source, target, pages=256, pause=0.005):
+    tmp = f'{target}.{os.getpid()}.tmp'
+    dest = sqlite3.connect(tmp)
+    try:
+        source.execute('BEGIN')
+        # Снимок фиксируется первым чтением
+        source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        copied = {'pages': 0}
+        def progress(status, remaining, total):
+            copied['pages'] = total
+        try:
+            source.backup(dest, pages=pages, progress=progress, sleep=pause)
+        finally:
+            source.rollback()
+        # Копия — самостоятельный файл без -wal рядом
+        dest.execute('PRAGMA journal_mode = DELETE')
+    except BaseException:
+        dest.close()
+        os.remove(tmp)
+        raise
+    dest.close()
+
+    _, problems = quick_check(tmp)
+    if problems:
+        os.remove(tmp)
+        raise sqlite3.DatabaseError(f"Копия не прошла проверку: {'; '.join(problems)}")
+    fsync_path(tmp)
+    os.replace(tmp, target)
+    return copied['pages']
+
+# Удаляет старые копии сверх keep; возвращает удалённые файлы
+def rotate(db_path, backup_dir, keep=7):
+    backups = list_backups(db_path, backup_dir)
+    removed = backups[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+def backup(db_path, backup_dir=None, keep=7, pages=256, pause=0.005):
+    backup_dir = backup_dir or backup_dir_for(db_path)
+    os.makedirs(backup_dir, exist_ok=True)
+    target = snapshot_path(db_path, backup_dir)
+
+    started = time.monotonic()
+    source = connect(db_path)
+    try:
+        copied = copy_database(source, target, pages, pause)
+    finally:
+        source.close()
+    elapsed = time.monotonic() - started
+    return target, copied, elapsed, rotate(db_path, backup_dir, keep)
+
+# Восстановление из копии. Сервер должен быть остановлен.
+# Копия проверяется целиком до того, как трогаем базу; текущая база не удаляется,
+# а сохраняется рядом с копиями (…-pre-restore.db). Если её уже не прочитать
+# как базу — сохраняем файлы как есть.
+def restore(backup_path, db_path, backup_dir=None):
+    _, problems = quick_check(backup_path)
+    if problems:
+        raise sqlite3.DatabaseError(f"Копия повреждена: {'; '.join(problems)}")
+
+    backup_dir = backup_dir or backup_dir_for(db_path)
+    os.makedirs(backup_dir, exist_ok=True)
+    saved = None
+    if os.path.exists(db_path):
+        saved = snapshot_path(db_path, backup_dir, PRE_RESTORE)
+        try:
+            source = connect(db_path)
+            try:
+                copy_database(source, saved)
+            finally:
+                source.close()
+        except sqlite3.DatabaseError:
+            for suffix in ('', '-wal'):
+                if os.path.exists(db_path + suffix):
+                    shutil.copy2(db_path + suffix, saved + suffix)
+
+    # Новую базу собираем во временном файле и подменяем целиком.
+    # Старый -wal относится к старой базе — удаляем его до подмены.
+    tmp = f'{db_path}.{os.getpid()}.tmp'
+    source = sqlite3.connect(backup_path)
+    dest = sqlite3.connect(tmp)
+    try:
+        source.backup(dest)
+    finally:
+        source.close()
+        dest.close()
+    fsync_path(tmp)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    os.replace(tmp, db_path)
+    return saved
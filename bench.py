@@ -0,0 +1,391 @@
+import sqlite3
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import threading
+import http.client
+import logging
+from datetime import datetime
+from urllib.parse import quote
+
+from database import migrate
+
+# Нагрузочный прогон горячих страниц приложения.
+# Для каждого размера данных и каждого режима (тестовый клиент Flask или
+# настоящий многопоточный сервер) несколько потоков в течение --duration секунд
+# шлют смесь запросов на чтение и запись. Итог — запросы в секунду,
+# p50/p95/p99 задержки и число SQL-запросов на HTTP-запрос по каждой операции.
+#
+#   python bench.py --sizes small,medium --output bench.json
+#   python bench.py --baseline bench.json   # код возврата 1 при регрессии
+
+# Параметры генератора данных (seed.py) для каждого размера
+SIZES = {
+    'small': {'users': 100, 'initiatives': 1000, 'votes_per_initiative': 10},
+    'medium': {'users': 1000, 'initiatives': 20000, 'votes_per_initiative': 30},
+    'large': {'users': 10000, 'initiatives': 100000, 'votes_per_initiative': 50},
+}
+# Фиксированная дата, чтобы данные не менялись от запуска к запуску
+BENCH_UNTIL = datetime(2025, 12, 1)
+
+# Веса операций в смеси запросов
+MIXES = {
+    'read': {'feed': 55, 'profile': 15, 'admin': 10, 'admin_search': 20},
+    'mixed': {'feed': 45, 'vote': 25, 'add': 5, 'profile': 10, 'admin': 5, 'admin_search': 10},
+    'write': {'feed': 20, 'vote': 65, 'add': 15},
+}
+
+SEARCH_TERMS = ['библиотека', 'курсы англ', 'кресла', 'велопарковка', 'наставничество', 'user42']
+
+QUERIES_HEADER = 'X-Bench-Queries'
+
+# Считает SQL-запросы, выполненные при обработке HTTP-запроса, и отдаёт число
+# в заголовке ответа. Запрос обрабатывается в одном потоке, поэтому счётчик
+# потоковый. Вход в каждый триггер sqlite сообщает повтором текста того же
+# оператора, а внутренние операторы FTS5 — строками "-- ...": их не считаем.
+class QueryCounter:
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.local = threading.local()
+
+    def trace(self, sql):
+        if sql.startswith('--') or sql == getattr(self.local, 'last', None):
+            return
+        self.local.last = sql
+        self.local.queries = getattr(self.local, 'queries', 0) + 1
+
+    def __call__(self, environ, start_response):
+        self.local.queries = 0
+        self.local.last = None
+
+        def counting_start_response(status, headers, exc_info=None):
+            headers = headers + [(QUERIES_HEADER, str(self.local.queries))]
+            return start_response(status, headers, exc_info)
+
+        return self.wsgi_app(environ, counting_start_response)
+
+def dataset_path(name, data_dir):
+    params = SIZES[name]
+    return os.path.join(data_dir, f"{name}-{params['users']}-{params['initiatives']}-"
+                                  f"{params['votes_per_initiative']}.db")
+
+# Сгенерированная база переиспользуется между запусками: генератор
+# детерминированный, так что при тех же параметрах данные те же
+def prepare_dataset(name, data_dir):
+    from seed import seed
+
+    path = dataset_path(name, data_dir)
+    if os.path.exists(path):
+        return path
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+
+    print(f"Генерация данных {name}...")
+    partial = path + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    conn = sqlite3.connect(partial)
+    migrate(conn, quiet=True)
+    seed(conn, until=BENCH_UNTIL, quiet=True, **SIZES[name])
+    conn.close()
+    os.replace(partial, path)
+    return path
+
+# Каждый прогон пишет в свою копию, исходная база не меняется
+def working_copy(source, target):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    src.backup(dst)
+    migrate(dst, quiet=True)
+    dst.close()
+    src.close()
+
+# Подписанные cookie сессии — без входа через /login и проверки пароля
+class Dataset:
+    def __init__(self, app, path, rng):
+        conn = sqlite3.connect(path)
+        self.max_initiative = conn.execute('SELECT MAX(id) FROM initiatives').fetchone()[0]
+        admin = conn.execute('SELECT id, username FROM users WHERE is_admin = 1 ORDER BY id LIMIT 1').fetchone()
+        users = conn.execute('SELECT id, username FROM users WHERE is_admin = 0').fetchall()
+        conn.close()
+
+        serializer = app.session_interface.get_signing_serializer(app)
+        cookie_name = app.config['SESSION_COOKIE_NAME']
+
+        def cookie(user):
+            return f"{cookie_name}={serializer.dumps({'user_id': user[0], 'user': user[1]})}"
+
+        self.admin_cookie = cookie(admin)
+        self.user_cookies = [cookie(user) for user in rng.sample(users, min(len(users), 500))]
+
+# Операция -> (метод, путь, тело JSON, cookie)
+def make_request(op, rng, data):
+    user = rng.choice(data.user_cookies)
+    if op == 'feed':
+        path = '/' if rng.random() < 0.8 else f'/?page={rng.randint(2, 5)}'
+        return 'GET', path, None, user if rng.random() < 0.5 else None
+    if op == 'vote':
+        body = {'initiative_id': rng.randint(1, data.max_initiative), 'vote': rng.choice((1, 1, -1))}
+        return 'POST', '/api/vote', body, user
+    if op == 'add':
+        number = rng.randrange(10 ** 9)
+        body = {'title': f'Нагрузочная инициатива {number}',
+                'description': f'Описание нагрузочной инициативы {number}'}
+        return 'POST', '/api/add', body, user
+    if op == 'profile':
+        return 'GET', '/profile', None, user
+    if op == 'admin':
+        return 'GET', '/admin', None, data.admin_cookie
+    if op == 'admin_search':
+        return 'GET', f'/api/admin/search?q={quote(rng.choice(SEARCH_TERMS))}', None, data.admin_cookie
+    raise ValueError(f'Неизвестная операция: {op}')
+
+def client_sender(app):
+    client = app.test_client(use_cookies=False)
+
+    def send(method, path, body, cookie):
+        headers = {'Cookie': cookie} if cookie else {}
+        response = client.open(path, method=method, json=body, headers=headers)
+        response.close()
+        return response.status_code, int(response.headers.get(QUERIES_HEADER, 0))
+
+    return send
+
+def server_sender(host, port):
+    def send(method, path, body, cookie):
+        headers = {'Cookie': cookie} if cookie else {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status, int(response.getheader(QUERIES_HEADER) or 0)
+        finally:
+            conn.close()
+
+    return send
+
+# Один поток нагрузки. Результаты до конца прогрева отбрасываются.
+def worker(send, data, mix, seed_value, warmup_until, deadline, samples):
+    rng = random.Random(seed_value)
+    ops, weights = list(mix), list(mix.values())
+    local = {op: [] for op in ops}
+    while True:
+        op = rng.choices(ops, weights)[0]
+        method, path, body, cookie = make_request(op, rng, data)
+        started = time.perf_counter()
+        if started >= deadline:
+            break
+        try:
+            status, queries = send(method, path, body, cookie)
+        except Exception:
+            status, queries = None, 0
+        elapsed = time.perf_counter() - started
+        if started >= warmup_until:
+            local[op].append((elapsed, queries, status is not None and status < 400))
+    samples.append(local)
+
+# Перцентиль по ближайшему рангу
+def percentile(values, p):
+    if not values:
+        return 0.0
+    rank = max(int(round(p / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+def summarize(entries, seconds):
+    latencies = sorted(entry[0] * 1000 for entry in entries)
+    return {
+        'requests': len(entries),
+        'throughput': round(len(entries) / seconds, 1),
+        'errors': sum(1 for entry in entries if not entry[2]),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries': round(sum(entry[1] for entry in entries) / len(entries), 2) if entries else 0,
+    }
+
+def run_load(send_factory, data, mix, threads, duration, warmup, seed_value):
+    samples = []
+    warmup_until = time.perf_counter() + warmup
+    deadline = warmup_until + duration
+    workers = [threading.Thread(target=worker,
+                                args=(send_factory(), data, mix, seed_value + n,
+                                      warmup_until, deadline, samples))
+               for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    by_op = {op: [] for op in mix}
+    for local in samples:
+        for op, entries in local.items():
+            by_op[op].extend(entries)
+    result = summarize([entry for entries in by_op.values() for entry in entries], duration)
+    result['endpoints'] = {op: summarize(entries, duration) for op, entries in by_op.items()}
+    return result
+
+# Приложение создаётся заново на рабочей копии базы: объекты процесса и кэши
+# от прошлого прогона не переживают. Фоновые задачи не запускаются.
+def run_benchmark(app_module, counter, size, mode, args, mix):
+    source = prepare_dataset(size, args.data_dir)
+    path = os.path.join(args.data_dir, f'{size}.work.db')
+    working_copy(source, path)
+    app = app_module.create_app({
+        'DATABASE': path,
+        'DB_ON_CONNECT': lambda conn: conn.set_trace_callback(counter.trace),
+        'VOTE_WRITE_BEHIND': args.write_behind,
+        # Вся нагрузка идёт с одного IP
+        'RATE_LIMIT_ENABLED': args.rate_limit,
+    })
+    data = Dataset(app, path, random.Random(args.seed))
+
+    server = None
+    if mode == 'server':
+        from werkzeug.serving import make_server
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        send_factory = lambda: server_sender('127.0.0.1', server.server_port)
+    else:
+        send_factory = lambda: client_sender(app)
+
+    try:
+        return run_load(send_factory, data, mix, args.threads, args.duration, args.warmup, args.seed)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        # Дописывает буфер голосов и закрывает пул
+        app_module.release_process_resources()
+
+# Сравнение с сохранённым прогоном. Задержка считается регрессией, если выросла
+# больше чем на threshold и при этом больше чем на min_delta_ms — иначе
+# субмиллисекундные операции дают ложные срабатывания.
+def compare(results, baseline, threshold, min_delta_ms):
+    regressions = []
+    for key, base in baseline['results'].items():
+        current = results.get(key)
+        if current is None:
+            continue
+        if current['throughput'] < base['throughput'] * (1 - threshold):
+            regressions.append(f"{key}: пропускная способность {base['throughput']} -> "
+                               f"{current['throughput']} запр/с")
+        for op, base_op in base['endpoints'].items():
+            current_op = current['endpoints'].get(op)
+            if current_op is None or not current_op['requests'] or not base_op['requests']:
+                continue
+            for metric in ('p50_ms', 'p95_ms'):
+                before, after = base_op[metric], current_op[metric]
+                if after > before * (1 + threshold) and after - before > min_delta_ms:
+                    regressions.append(f"{key} {op}: {metric} {before} -> {after}")
+            before, after = base_op['queries'], current_op['queries']
+            if after > before * (1 + threshold) and after - before >= 0.5:
+                regressions.append(f"{key} {op}: запросов к базе {before} -> {after}")
+            if current_op['errors'] and not base_op['errors']:
+                regressions.append(f"{key} {op}: ошибок {current_op['errors']}")
+    return regressions
+
+def parse_mix(text):
+    if text in MIXES:
+        return MIXES[text]
+    mix = {}
+    for part in text.split(','):
+        op, _, weight = part.partition('=')
+        mix[op.strip()] = int(weight or 1)
+    return mix
+
+def print_result(key, result):
+    print(f"{key}: {result['throughput']} запр/с, p50 {result['p50_ms']} мс, "
+          f"p95 {result['p95_ms']} мс, p99 {result['p99_ms']} мс, ошибок {result['errors']}")
+    for op, stats in result['endpoints'].items():
+        print(f"    {op:<13} {stats['requests']:>7} запр. {stats['throughput']:>8} запр/с  "
+              f"p50 {stats['p50_ms']:>8}  p95 {stats['p95_ms']:>8}  p99 {stats['p99_ms']:>8} мс  "
+              f"SQL {stats['queries']:>5}  ошибок {stats['errors']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон приложения')
+    parser.add_argument('--sizes', default='small,medium', help=f"размеры данных: {', '.join(SIZES)}")
+    parser.add_argument('--modes', default='client,server', help='client — тестовый клиент, server — HTTP-сервер')
+    parser.add_argument('--mix', default='mixed',
+                        help=f"смесь запросов: {', '.join(MIXES)} или op=вес,... "
+                             f"(feed, vote, add, profile, admin, admin_search)")
+    parser.add_argument('--threads', type=int, default=8, help='потоков нагрузки')
+    parser.add_argument('--duration', type=float, default=10, help='секунд замера на прогон')
+    parser.add_argument('--warmup', type=float, default=2, help='секунд прогрева перед замером')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--data-dir', default='instance/bench', help='где хранить сгенерированные базы')
+    parser.add_argument('--write-behind', action='store_true', help='включить отложенную запись голосов')
+    parser.add_argument('--rate-limit', action='store_true',
+                        help='не отключать ограничение частоты (вся нагрузка идёт с одного IP)')
+    parser.add_argument('--output', help='сохранить результаты в JSON')
+    parser.add_argument('--baseline', help='JSON прошлого прогона для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.2, help='допустимое ухудшение, доля')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='меньшее изменение задержки не считается')
+    args = parser.parse_args(argv)
+
+    sizes = [size.strip() for size in args.sizes.split(',')]
+    modes = [mode.strip() for mode in args.modes.split(',')]
+    mix = parse_mix(args.mix)
+    unknown = [size for size in sizes if size not in SIZES] + \
+              [mode for mode in modes if mode not in ('client', 'server')] + \
+              [op for op in mix if op not in MIXES['mixed']]
+    if unknown:
+        parser.error(f"неизвестные значения: {', '.join(unknown)}")
+
+    import app as app_module
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    counter = QueryCounter(app_module.app.wsgi_app)
+    app_module.app.wsgi_app = counter
+
+    results = {}
+    for size in sizes:
+        for mode in modes:
+            key = f'{size}/{mode}'
+            results[key] = run_benchmark(app_module, counter, size, mode, args, mix)
+            print_result(key, results[key])
+
+    report = {
+        'meta': {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'threads': args.threads,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'mix': mix,
+            'write_behind': args.write_behind,
+            'rate_limit': args.rate_limit,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        for name in ('threads', 'duration', 'mix', 'write_behind'):
+            if baseline['meta'].get(name) != report['meta'][name]:
+                print(f"Внимание: {name} отличается от базового прогона")
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for line in regressions:
+            print(f"Регрессия: {line}")
+        if regressions:
+            return 1
+        print("Регрессий нет")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import sqlite3
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import app as app_module
+from database import migrate
+
+# Дешёвый хэш: тестам не нужна стойкость пароля
+TEST_HASH_METHOD = 'pbkdf2:sha256:1'
+
+# Свежая база во временном каталоге: схема и пара пользователей с инициативой
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'app.db')
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = WAL')
+    migrate(conn, quiet=True)
+    password = generate_password_hash('secret', method=TEST_HASH_METHOD)
+    conn.executemany('INSERT INTO users (username, password, is_admin) VALUES (?, ?, ?)',
+                     [('admin', password, 1), ('alice', password, 0), ('bob', password, 0)])
+    conn.execute("INSERT INTO initiatives (title, description, author_id) VALUES ('Первая', 'Описание', 2)")
+    conn.commit()
+    conn.close()
+    return path
+
+def connect_test_db(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+@pytest.fixture
+def db(db_path):
+    conn = connect_test_db(db_path)
+    yield conn
+    conn.close()
+
+# Приложение одно на процесс: настройки теста откатываются после него
+@pytest.fixture
+def make_app(db_path, tmp_path):
+    saved = dict(app_module.app.config)
+
+    def make(config=None):
+        settings = {
+            'TESTING': True,
+            'DATABASE': db_path,
+            'RATE_LIMIT_ENABLED': False,
+            'RATE_LIMIT_DB': str(tmp_path / 'rate_limit.db'),
+            'PASSWORD_HASH_METHOD': TEST_HASH_METHOD,
+            'PASSWORD_HASH_WORKERS': 1,
+        }
+        settings.update(config or {})
+        return app_module.create_app(settings)
+
+    yield make
+    app_module.release_process_resources()
+    app_module.app.config.clear()
+    app_module.app.config.update(saved)
+    app_module.configure()
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def login(client, user_id, username='alice'):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['user'] = username
@@ -1,153 +1,1064 @@
 import sqlite3
 import os
-from werkzeug.security import generate_password_hash
-from datetime import datetime, timedelta
-import random
+import sys
+import ast
+import argparse
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
 
-def init_db():
-    # Создаем папку instance, если её нет
-    if not os.path.exists('instance'):
-        os.makedirs('instance')
-    
-    conn = sqlite3.connect('instance/app.db')
-    c = conn.cursor()
-
-    # Создаем таблицы с IF NOT EXISTS
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            is_admin INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+DATABASE = 'instance/app.db'
+
+# Статистика пользователей, посчитанная с нуля по votes и initiatives.
+# Порядок столбцов совпадает с таблицей user_stats.
+USER_STATS_QUERY = '''
+    SELECT u.id AS user_id,
+           (SELECT COUNT(*) FROM initiatives WHERE author_id = u.id) AS initiatives_count,
+           (SELECT COALESCE(SUM(votes), 0) FROM initiatives WHERE author_id = u.id) AS initiatives_votes,
+           (SELECT COALESCE(SUM(vote), 0) FROM votes WHERE user_id = u.id) AS total_votes,
+           (SELECT COUNT(*) FROM votes WHERE user_id = u.id AND vote = 1) AS positive_votes,
+           (SELECT COUNT(*) FROM votes WHERE user_id = u.id AND vote = -1) AS negative_votes
+    FROM users u
+'''
 
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS initiatives (
+# Рейтинг «в тренде» (hot_score): сумма голосов, где вес голоса вдвое меньше
+# каждые HOT_HALF_LIFE_HOURS часов. В строке хранится значение на момент hot_at;
+# голос сначала пересчитывает значение к текущему моменту и сдвигает hot_at,
+# а ranking.py периодически пересчитывает остальные строки. От периода полураспада зависят сохранённые
+# значения, поэтому он задан здесь, а не в настройках.
+HOT_HALF_LIFE_HOURS = 12
+HOT_SCORE_QUERY = f'''
+    SELECT COALESCE(SUM(v.vote * pow(2, (julianday(v.created_at) - julianday('now')) * 24.0
+                                        / {HOT_HALF_LIFE_HOURS})), 0)
+    FROM votes v WHERE v.initiative_id = initiatives.id
+'''
+
+# Итоги голосования по часам и по суткам, initiative_id = 0 — вся площадка.
+# Считаются поданные голоса: смена голоса — ещё одно событие, а удаление голоса
+# итоги не меняет. Часы старше ROLLUP_HOURLY_DAYS суток сворачиваются в сутки
+# (rollups.py); пересчёт с нуля сразу раскладывает голоса по этой границе.
+ROLLUP_HOURLY_DAYS = 14
+ROLLUP_SITE = 0
+VOTE_ROLLUP_REBUILD = tuple(
+    f'''
+    INSERT INTO {table} (initiative_id, bucket, positive, negative)
+    SELECT {key}, strftime('{bucket}', created_at), SUM(vote = 1), SUM(vote = -1)
+    FROM votes
+    WHERE created_at {op} date('now', '-{ROLLUP_HOURLY_DAYS} days')
+    GROUP BY 1, 2
+    '''
+    for table, bucket, op in (('vote_rollup_hourly', '%Y-%m-%d %H:00:00', '>='),
+                              ('vote_rollup_daily', '%Y-%m-%d', '<'))
+    for key in ('initiative_id', ROLLUP_SITE)
+)
+
+# Сколько последних изменений рейтинга хранит журнал vote_changes
+VOTE_CHANGES_KEEP = 10000
+
+# Таблицы с внешними ключами ON DELETE CASCADE: схема и условие, при котором
+# строка не сирота. Порядок важен — голоса сверяются с уже очищенными инициативами.
+CASCADE_TABLES = (
+    ('initiatives', '''
+        CREATE TABLE initiatives_new (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT NOT NULL,
             description TEXT NOT NULL,
-            author_id INTEGER NOT NULL,
+            author_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
             votes INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT NOT NULL DEFAULT 'active',
+            hidden_at TIMESTAMP
         )
-    ''')
-
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS votes (
+    ''', 'author_id IN (SELECT id FROM users)'),
+    ('votes', '''
+        CREATE TABLE votes_new (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            initiative_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            initiative_id INTEGER NOT NULL REFERENCES initiatives (id) ON DELETE CASCADE,
             vote INTEGER NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             UNIQUE(user_id, initiative_id)
         )
-    ''')
-    
-    # ... остальной код без изменений
+    ''', 'user_id IN (SELECT id FROM users) AND initiative_id IN (SELECT id FROM initiatives)'),
+)
 
-    # Таблица голосов
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS votes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            initiative_id INTEGER NOT NULL,
-            vote INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(user_id, initiative_id),
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (initiative_id) REFERENCES initiatives (id)
-        )
-    ''')
-
-    # Очистка старых данных
-    c.execute("DELETE FROM votes")
-    c.execute("DELETE FROM initiatives")
-    c.execute("DELETE FROM users WHERE username != 'admin'")
-
-    # Добавляем администратора
-    admin_hash = generate_password_hash('Admin123!')
-    c.execute("INSERT OR IGNORE INTO users (username, password, is_admin) VALUES (?, ?, ?)",
-              ('admin', admin_hash, 1))
-
-    # Добавляем тестовых пользователей (30+)
-    user_ids = [1]  # ID администратора
-    for i in range(2, 35):
-        username = f'user{i}'
-        password_hash = generate_password_hash('password123')
-        c.execute("INSERT INTO users (username, password) VALUES (?, ?)",
-                  (username, password_hash))
-        user_ids.append(i)
-
-    # Добавляем тестовые инициативы (100+)
-    initiative_titles = [
-        "Внедрение гибкого графика работы",
-        "Установка кулеров с водой на этажах",
-        "Организация курсов английского языка",
-        "Создание комнаты отдыха для сотрудников",
-        "Внедрение системы удаленной работы",
-        "Покупка новых ортопедических кресел",
-        "Организация корпоративной библиотеки",
-        "Введение дня здорового питания",
-        "Установка велопарковки у офиса",
-        "Создание программы наставничества"
-    ]
-
-    initiative_descriptions = [
-        "Предлагаю внедрить гибкий график работы с 7:00 до 10:00 утра...",
-        "Недостаток питьевой воды влияет на продуктивность сотрудников...",
-        "Знание английского необходимо для работы с иностранными клиентами...",
-        "Комната отдыха поможет сотрудникам восстанавливать силы...",
-        "Удаленная работа повысит удовлетворенность сотрудников...",
-        "Новые кресла улучшат осанку и снизят усталость...",
-        "Корпоративная библиотека будет полезна для самообразования...",
-        "День здорового питания улучшит культуру питания в коллективе...",
-        "Велопарковка поощрит экологичный способ передвижения...",
-        "Программа наставничества поможет новичкам быстрее адаптироваться..."
-    ]
-
-    # Генерируем 100+ инициатив
-    for i in range(1, 105):
-        title = f"{random.choice(initiative_titles)} #{i}"
-        description = f"{random.choice(initiative_descriptions)} Это предложение номер {i}."
-        author_id = random.choice(user_ids)
-        votes = random.randint(-5, 25)
-        
-        # Создаем разную дату для каждой инициативы
-        days_ago = random.randint(0, 180)
-        created_at = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d %H:%M:%S')
-        
-        c.execute('''
-            INSERT INTO initiatives (title, description, author_id, votes, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (title, description, author_id, votes, created_at))
-        
-        initiative_id = c.lastrowid
-        
-        # Добавляем голоса для этой инициативы
-        voters = random.sample(user_ids, random.randint(5, 20))
-        for voter_id in voters:
-            if voter_id != author_id:  # Автор не голосует за свою инициативу
-                vote_value = random.choice([1, -1])
+# Миграция 8. Внешний ключ в SQLite меняется только пересборкой таблицы:
+# новая таблица, копия строк без сирот, замена старой. Индексы и триггеры
+# пересоздаём из sqlite_master, счётчик AUTOINCREMENT сохраняем.
+def add_cascades(conn):
+    objects = conn.execute('''
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+          AND tbl_name IN ('initiatives', 'votes')
+    ''').fetchall()
+    for kind, name, _ in objects:
+        if kind == 'trigger':
+            conn.execute(f'DROP TRIGGER {name}')
+
+    removed = 0
+    for table, create, keep in CASCADE_TABLES:
+        # Сироты уходят и из поискового индекса, он хранит только токены
+        if table == 'initiatives':
+            conn.execute(f'''
+                INSERT INTO initiatives_fts (initiatives_fts, rowid, title, description)
+                SELECT 'delete', id,
+                       replace(replace(title, 'ё', 'е'), 'Ё', 'Е'),
+                       replace(replace(description, 'ё', 'е'), 'Ё', 'Е')
+                FROM initiatives WHERE NOT ({keep})
+            ''')
+        sequence = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+        columns = ', '.join(row[1] for row in conn.execute(f'PRAGMA table_info({table})'))
+
+        conn.execute(create)
+        copied = conn.execute(f'''
+            INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table} WHERE {keep}
+        ''').rowcount
+        removed += conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] - copied
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+        # Строки счётчика нет, если новая таблица пуста: UPDATE ничего бы не сделал,
+        # и номера удалённых строк пошли бы в ход снова. У sqlite_sequence нет
+        # ключа для INSERT OR REPLACE, поэтому заменяем строку вручную
+        if sequence:
+            current = conn.execute('SELECT MAX(seq) FROM sqlite_sequence WHERE name = ?',
+                                   (table,)).fetchone()[0]
+            conn.execute('DELETE FROM sqlite_sequence WHERE name = ?', (table,))
+            conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)',
+                         (table, max(sequence[0], current or 0)))
+
+    for _, _, sql in objects:
+        conn.execute(sql)
+
+    if removed:
+        conn.execute('''
+            UPDATE counters SET value = (SELECT COUNT(*) FROM initiatives WHERE status = 'active')
+            WHERE name = 'initiatives'
+        ''')
+        conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'generation'")
+        conn.execute('DELETE FROM user_stats')
+        conn.execute(f'INSERT INTO user_stats {USER_STATS_QUERY}')
+    if conn.execute('PRAGMA foreign_key_check').fetchone():
+        raise sqlite3.IntegrityError('После пересборки таблиц остались нарушения внешних ключей')
+
+# Миграции схемы. Номер миграции = позиция в списке + 1,
+# применённая версия хранится в PRAGMA user_version.
+# Миграция — SQL-скрипт или функция, которая получает соединение.
+# Уже выпущенные миграции не меняем — только добавляем новые в конец.
+MIGRATIONS = [
+    # 1. Базовые таблицы
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        is_admin INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS initiatives (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        author_id INTEGER NOT NULL,
+        votes INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS votes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        initiative_id INTEGER NOT NULL,
+        vote INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, initiative_id),
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (initiative_id) REFERENCES initiatives (id)
+    );
+    ''',
+
+    # 2. Лента по курсору и счётчик инициатив, который поддерживают триггеры
+    '''
+    CREATE INDEX IF NOT EXISTS idx_initiatives_created_id
+        ON initiatives (created_at, id);
+
+    CREATE TABLE IF NOT EXISTS counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    );
+
+    INSERT OR IGNORE INTO counters (name, value)
+        SELECT 'initiatives', COUNT(*) FROM initiatives;
+
+    CREATE TRIGGER IF NOT EXISTS trg_initiatives_count_insert
+    AFTER INSERT ON initiatives
+    BEGIN
+        UPDATE counters SET value = value + 1 WHERE name = 'initiatives';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_initiatives_count_delete
+    AFTER DELETE ON initiatives
+    BEGIN
+        UPDATE counters SET value = value - 1 WHERE name = 'initiatives';
+    END;
+    ''',
+
+    # 3. Индексы для горячих запросов.
+    # Голоса пользователя уже покрыты UNIQUE(user_id, initiative_id).
+    '''
+    CREATE INDEX IF NOT EXISTS idx_votes_initiative
+        ON votes (initiative_id);
+
+    CREATE INDEX IF NOT EXISTS idx_initiatives_author_created
+        ON initiatives (author_id, created_at);
+
+    CREATE INDEX IF NOT EXISTS idx_users_created
+        ON users (created_at);
+    ''',
+
+    # 4. Полнотекстовый поиск по названию и описанию.
+    # unicode61 не считает "ё" буквой с диакритикой, поэтому приводим ё к е сами
+    # и храним только индекс (content=''); удаление передаёт те же значения.
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS initiatives_fts USING fts5(
+        title, description,
+        content = '',
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    );
+
+    INSERT INTO initiatives_fts (initiatives_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)');
+
+    INSERT INTO initiatives_fts (rowid, title, description)
+        SELECT id,
+               replace(replace(title, 'ё', 'е'), 'Ё', 'Е'),
+               replace(replace(description, 'ё', 'е'), 'Ё', 'Е')
+        FROM initiatives;
+
+    CREATE TRIGGER IF NOT EXISTS trg_initiatives_fts_insert
+    AFTER INSERT ON initiatives
+    BEGIN
+        INSERT INTO initiatives_fts (rowid, title, description) VALUES (
+            new.id,
+            replace(replace(new.title, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(new.description, 'ё', 'е'), 'Ё', 'Е'));
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_initiatives_fts_delete
+    AFTER DELETE ON initiatives
+    BEGIN
+        INSERT INTO initiatives_fts (initiatives_fts, rowid, title, description) VALUES (
+            'delete', old.id,
+            replace(replace(old.title, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(old.description, 'ё', 'е'), 'Ё', 'Е'));
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_initiatives_fts_update
+    AFTER UPDATE OF title, description ON initiatives
+    BEGIN
+        INSERT INTO initiatives_fts (initiatives_fts, rowid, title, description) VALUES (
+            'delete', old.id,
+            replace(replace(old.title, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(old.description, 'ё', 'е'), 'Ё', 'Е'));
+        INSERT INTO initiatives_fts (rowid, title, description) VALUES (
+            new.id,
+            replace(replace(new.title, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(new.description, 'ё', 'е'), 'Ё', 'Е'));
+    END;
+    ''',
+
+    # 5. Статистика пользователей для профиля, которую поддерживают триггеры
+    f'''
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INTEGER PRIMARY KEY,
+        initiatives_count INTEGER NOT NULL DEFAULT 0,
+        initiatives_votes INTEGER NOT NULL DEFAULT 0,
+        total_votes INTEGER NOT NULL DEFAULT 0,
+        positive_votes INTEGER NOT NULL DEFAULT 0,
+        negative_votes INTEGER NOT NULL DEFAULT 0
+    );
+
+    INSERT OR REPLACE INTO user_stats {USER_STATS_QUERY};
+
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_user_insert
+    AFTER INSERT ON users
+    BEGIN
+        INSERT OR IGNORE INTO user_stats (user_id) VALUES (new.id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_user_delete
+    AFTER DELETE ON users
+    BEGIN
+        DELETE FROM user_stats WHERE user_id = old.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_initiative_insert
+    AFTER INSERT ON initiatives
+    BEGIN
+        UPDATE user_stats
+        SET initiatives_count = initiatives_count + 1,
+            initiatives_votes = initiatives_votes + COALESCE(new.votes, 0)
+        WHERE user_id = new.author_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_initiative_votes
+    AFTER UPDATE OF votes ON initiatives
+    WHEN new.votes IS NOT old.votes
+    BEGIN
+        UPDATE user_stats
+        SET initiatives_votes = initiatives_votes + COALESCE(new.votes, 0) - COALESCE(old.votes, 0)
+        WHERE user_id = new.author_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_initiative_delete
+    AFTER DELETE ON initiatives
+    BEGIN
+        UPDATE user_stats
+        SET initiatives_count = initiatives_count - 1,
+            initiatives_votes = initiatives_votes - COALESCE(old.votes, 0)
+        WHERE user_id = old.author_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_vote_insert
+    AFTER INSERT ON votes
+    BEGIN
+        UPDATE user_stats
+        SET total_votes = total_votes + new.vote,
+            positive_votes = positive_votes + (new.vote = 1),
+            negative_votes = negative_votes + (new.vote = -1)
+        WHERE user_id = new.user_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_vote_update
+    AFTER UPDATE OF vote ON votes
+    WHEN new.vote IS NOT old.vote
+    BEGIN
+        UPDATE user_stats
+        SET total_votes = total_votes + new.vote - old.vote,
+            positive_votes = positive_votes + (new.vote = 1) - (old.vote = 1),
+            negative_votes = negative_votes + (new.vote = -1) - (old.vote = -1)
+        WHERE user_id = new.user_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_vote_delete
+    AFTER DELETE ON votes
+    BEGIN
+        UPDATE user_stats
+        SET total_votes = total_votes - old.vote,
+            positive_votes = positive_votes - (old.vote = 1),
+            negative_votes = negative_votes - (old.vote = -1)
+        WHERE user_id = old.user_id;
+    END;
+    ''',
+
+    # 6. Поколение данных ленты: растёт при любом изменении инициатив,
+    # по нему проверяется кэш отрендеренных страниц во всех процессах
+    '''
+    INSERT OR IGNORE INTO counters (name, value) VALUES ('generation', 0);
+
+    CREATE TRIGGER IF NOT EXISTS trg_generation_initiative_insert
+    AFTER INSERT ON initiatives
+    BEGIN
+        UPDATE counters SET value = value + 1 WHERE name = 'generation';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_generation_initiative_update
+    AFTER UPDATE ON initiatives
+    BEGIN
+        UPDATE counters SET value = value + 1 WHERE name = 'generation';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_generation_initiative_delete
+    AFTER DELETE ON initiatives
+    BEGIN
+        UPDATE counters SET value = value + 1 WHERE name = 'generation';
+    END;
+    ''',
+
+    # 7. Мягкое удаление: инициатива с рейтингом ниже порога получает статус
+    # 'hidden' и пропадает из ленты, а фоновый уборщик (reaper.py) переносит
+    # её в архив и удаляет вместе с голосами. Лента идёт по частичному индексу
+    # только активных инициатив; счётчик 'initiatives' тоже считает только их.
+    '''
+    ALTER TABLE initiatives ADD COLUMN status TEXT NOT NULL DEFAULT 'active';
+    ALTER TABLE initiatives ADD COLUMN hidden_at TIMESTAMP;
+
+    UPDATE initiatives SET status = 'hidden', hidden_at = CURRENT_TIMESTAMP WHERE votes < -10;
+
+    DROP INDEX IF EXISTS idx_initiatives_created_id;
+    CREATE INDEX IF NOT EXISTS idx_initiatives_active_created
+        ON initiatives (created_at, id) WHERE status = 'active';
+    CREATE INDEX IF NOT EXISTS idx_initiatives_hidden
+        ON initiatives (hidden_at) WHERE status = 'hidden';
+
+    CREATE TABLE IF NOT EXISTS initiatives_archive (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        author_id INTEGER NOT NULL,
+        votes INTEGER NOT NULL,
+        positive_votes INTEGER NOT NULL,
+        negative_votes INTEGER NOT NULL,
+        created_at TIMESTAMP,
+        hidden_at TIMESTAMP,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_initiatives_archive_hidden
+        ON initiatives_archive (hidden_at);
+
+    UPDATE counters SET value = (SELECT COUNT(*) FROM initiatives WHERE status = 'active')
+    WHERE name = 'initiatives';
+
+    DROP TRIGGER IF EXISTS trg_initiatives_count_insert;
+    CREATE TRIGGER IF NOT EXISTS trg_initiatives_count_insert
+    AFTER INSERT ON initiatives
+    WHEN new.status = 'active'
+    BEGIN
+        UPDATE counters SET value = value + 1 WHERE name = 'initiatives';
+    END;
+
+    DROP TRIGGER IF EXISTS trg_initiatives_count_delete;
+    CREATE TRIGGER IF NOT EXISTS trg_initiatives_count_delete
+    AFTER DELETE ON initiatives
+    WHEN old.status = 'active'
+    BEGIN
+        UPDATE counters SET value = value - 1 WHERE name = 'initiatives';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_initiatives_count_status
+    AFTER UPDATE OF status ON initiatives
+    WHEN new.status IS NOT old.status
+    BEGIN
+        UPDATE counters
+        SET value = value + (new.status = 'active') - (old.status = 'active')
+        WHERE name = 'initiatives';
+    END;
+    ''',
+
+    # 8. Внешние ключи с ON DELETE CASCADE: удаление пользователя уносит его
+    # инициативы и голоса, удаление инициативы — голоса за неё
+    add_cascades,
+
+    # 9. Лента по рейтингу (?sort=top) и «в тренде» (?sort=hot): частичные индексы
+    # по активным инициативам, страница — проход по диапазону, как для новых
+    f'''
+    ALTER TABLE initiatives ADD COLUMN hot_score REAL NOT NULL DEFAULT 0;
+    ALTER TABLE initiatives ADD COLUMN hot_at TIMESTAMP;
+
+    UPDATE initiatives SET hot_score = ({HOT_SCORE_QUERY}), hot_at = CURRENT_TIMESTAMP;
+
+    CREATE INDEX IF NOT EXISTS idx_initiatives_active_top
+        ON initiatives (votes, id) WHERE status = 'active';
+    CREATE INDEX IF NOT EXISTS idx_initiatives_active_hot
+        ON initiatives (hot_score, id) WHERE status = 'active';
+    ''',
+
+    # 10. Итоги голосования по времени для графиков: триггеры на votes пополняют
+    # почасовые итоги инициативы и площадки, графики читают только их
+    f'''
+    CREATE TABLE IF NOT EXISTS vote_rollup_hourly (
+        initiative_id INTEGER NOT NULL,
+        bucket TEXT NOT NULL,
+        positive INTEGER NOT NULL DEFAULT 0,
+        negative INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (initiative_id, bucket)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS vote_rollup_daily (
+        initiative_id INTEGER NOT NULL,
+        bucket TEXT NOT NULL,
+        positive INTEGER NOT NULL DEFAULT 0,
+        negative INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (initiative_id, bucket)
+    ) WITHOUT ROWID;
+
+    -- Сворачивание берёт самые старые часы
+    CREATE INDEX IF NOT EXISTS idx_vote_rollup_hourly_bucket
+        ON vote_rollup_hourly (bucket, initiative_id);
+
+    {';'.join(VOTE_ROLLUP_REBUILD)};
+
+    CREATE TRIGGER IF NOT EXISTS trg_vote_rollup_insert
+    AFTER INSERT ON votes
+    BEGIN
+        INSERT INTO vote_rollup_hourly (initiative_id, bucket, positive, negative)
+        VALUES (new.initiative_id, strftime('%Y-%m-%d %H:00:00', new.created_at),
+                new.vote = 1, new.vote = -1),
+               ({ROLLUP_SITE}, strftime('%Y-%m-%d %H:00:00', new.created_at),
+                new.vote = 1, new.vote = -1)
+        ON CONFLICT (initiative_id, bucket) DO UPDATE
+        SET positive = positive + excluded.positive, negative = negative + excluded.negative;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_vote_rollup_update
+    AFTER UPDATE OF vote ON votes
+    WHEN new.vote IS NOT old.vote
+    BEGIN
+        INSERT INTO vote_rollup_hourly (initiative_id, bucket, positive, negative)
+        VALUES (new.initiative_id, strftime('%Y-%m-%d %H:00:00', new.created_at),
+                new.vote = 1, new.vote = -1),
+               ({ROLLUP_SITE}, strftime('%Y-%m-%d %H:00:00', new.created_at),
+                new.vote = 1, new.vote = -1)
+        ON CONFLICT (initiative_id, bucket) DO UPDATE
+        SET positive = positive + excluded.positive, negative = negative + excluded.negative;
+    END;
+
+    -- Итоги удалённой инициативы не нужны; в итогах площадки её голоса остаются
+    CREATE TRIGGER IF NOT EXISTS trg_vote_rollup_initiative_delete
+    AFTER DELETE ON initiatives
+    BEGIN
+        DELETE FROM vote_rollup_hourly WHERE initiative_id = old.id;
+        DELETE FROM vote_rollup_daily WHERE initiative_id = old.id;
+    END;
+    ''',
+
+    # 11. Журнал изменений рейтинга для /api/stream: триггеры на initiatives пишут
+    # новый итог, каждый процесс-обработчик читает журнал по номеру (vote_stream.py),
+    # поэтому подписчик видит голоса, принятые любым процессом
+    f'''
+    CREATE TABLE IF NOT EXISTS vote_changes (
+        seq INTEGER PRIMARY KEY,
+        initiative_id INTEGER NOT NULL,
+        votes INTEGER NOT NULL,
+        deleted INTEGER NOT NULL
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_vote_changes_update
+    AFTER UPDATE OF votes, status ON initiatives
+    WHEN new.votes IS NOT old.votes OR new.status IS NOT old.status
+    BEGIN
+        INSERT INTO vote_changes (initiative_id, votes, deleted)
+        VALUES (new.id, new.votes, new.status != 'active');
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_vote_changes_delete
+    AFTER DELETE ON initiatives
+    WHEN old.status = 'active'
+    BEGIN
+        INSERT INTO vote_changes (initiative_id, votes, deleted) VALUES (old.id, old.votes, 1);
+    END;
+
+    -- Хранятся последние VOTE_CHANGES_KEEP записей: раз в 1000 вставок удаляем старые.
+    -- Удаляются только самые старые, поэтому номера новых записей не повторяются.
+    CREATE TRIGGER IF NOT EXISTS trg_vote_changes_prune
+    AFTER INSERT ON vote_changes
+    WHEN new.seq % 1000 = 0
+    BEGIN
+        DELETE FROM vote_changes WHERE seq <= new.seq - {VOTE_CHANGES_KEEP};
+    END;
+    ''',
+]
+
+# Настройки, которые применяются к каждому соединению один раз при открытии.
+# journal_mode=WAL хранится в самом файле базы, его включаем отдельно.
+SQLITE_PRAGMAS = (
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -16000),
+    ('foreign_keys', 'ON'),
+    ('temp_store', 'MEMORY'),
+)
+
+class PooledConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.opened_at = self.last_used = time.monotonic()
+
+def connect(path=DATABASE):
+    conn = sqlite3.connect(path, timeout=5, cached_statements=256,
+                           check_same_thread=False, factory=PooledConnection)
+    conn.row_factory = sqlite3.Row
+    for name, value in SQLITE_PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+# Пул соединений на процесс. Соединение выдаётся на время запроса и
+# возвращается в пул; последним вернули — первым выдадим, чтобы кэш страниц был горячим.
+# on_connect(conn) вызывается для каждого нового соединения (bench.py считает через него запросы).
+class ConnectionPool:
+    def __init__(self, path=DATABASE, size=8, max_age=3600, check_interval=30, timeout=10,
+                 on_connect=None):
+        self.path = path
+        self.size = size
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.on_connect = on_connect
+        self._idle = []
+        self._opened = 0
+        self._wal_ready = False
+        self._cond = threading.Condition()
+
+    def _open(self):
+        conn = connect(self.path)
+        if not self._wal_ready:
+            conn.execute('PRAGMA journal_mode = WAL')
+            self._wal_ready = True
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._opened -= 1
+            self._cond.notify()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while not self._idle and self._opened >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise sqlite3.OperationalError('Нет свободных соединений с базой')
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                conn = None
+                self._opened += 1
+
+        if conn is None:
+            try:
+                return self._open()
+            except sqlite3.Error:
+                with self._cond:
+                    self._opened -= 1
+                    self._cond.notify()
+                raise
+
+        # Старые соединения пересоздаём, давно простаивающие проверяем
+        now = time.monotonic()
+        if now - conn.opened_at > self.max_age or (
+                now - conn.last_used > self.check_interval and not self.ping(conn)):
+            self._discard(conn)
+            return self.acquire()
+        return conn
+
+    def release(self, conn, discard=False):
+        # Незавершённая транзакция не должна достаться следующему запросу
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            discard = True
+
+        if discard:
+            self._discard(conn)
+            return
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @staticmethod
+    def ping(conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def health(self):
+        try:
+            conn = self.acquire()
+        except sqlite3.Error:
+            ok = False
+        else:
+            ok = self.ping(conn)
+            self.release(conn, discard=not ok)
+        return {'ok': ok, **self.stats()}
+
+    def stats(self):
+        with self._cond:
+            return {'size': self.size, 'opened': self._opened, 'idle': len(self._idle)}
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+        for conn in idle:
+            conn.close()
+
+# Транзакция записи: блокировку на запись берём сразу, а не при первом UPDATE,
+# чтобы два параллельных голоса не читали устаревший счётчик
+@contextmanager
+def write_transaction(conn):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+# Транзакция только для чтения: все запросы видят один снимок базы,
+# блокировку записи не берём и ничего не фиксируем
+@contextmanager
+def read_transaction(conn):
+    conn.execute('BEGIN')
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn, quiet=False):
+    # Применяем недостающие миграции, каждую в своей транзакции.
+    # Существующая база обновляется на месте, данные не трогаем.
+    current = schema_version(conn)
+    if current == 0:
+        # Для новой базы: свободные страницы возвращаются по частям (maintenance.py).
+        # Уже созданную базу переводит только VACUUM, см. maintain --enable-incremental-vacuum
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    # Пересборка таблиц идёт с выключенными внешними ключами,
+    # а переключить их внутри транзакции нельзя
+    foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+    conn.execute('PRAGMA foreign_keys = OFF')
+    try:
+        for version, script in enumerate(MIGRATIONS, start=1):
+            if version <= current:
+                continue
+            if callable(script):
+                conn.execute('BEGIN')
                 try:
-                    c.execute('''
-                        INSERT INTO votes (user_id, initiative_id, vote)
-                        VALUES (?, ?, ?)
-                    ''', (voter_id, initiative_id, vote_value))
-                except sqlite3.IntegrityError:
-                    pass  # Уже проголосовал
-
-    conn.commit()
+                    script(conn)
+                    conn.execute(f'PRAGMA user_version = {version}')
+                except BaseException:
+                    conn.rollback()
+                    raise
+                conn.commit()
+            else:
+                conn.executescript(f'''
+                    BEGIN;
+                    {script}
+                    PRAGMA user_version = {version};
+                    COMMIT;
+                ''')
+            if not quiet:
+                print(f"Применена миграция {version}")
+    finally:
+        if foreign_keys:
+            conn.execute('PRAGMA foreign_keys = ON')
+    return schema_version(conn)
+
+def init_db(path=DATABASE):
+    # Создаем папку instance, если её нет
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+
+    conn = sqlite3.connect(path)
+    migrate(conn)
+
+    # Тестовые данные добавляем только в пустую базу
+    if conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 0:
+        from seed import seed
+        seed(conn, quiet=True)
+        print("База данных инициализирована с тестовыми данными.")
+        print("Администратор: admin / Admin123!")
+        print("Пользователи: user2-user34 / password123")
+
     conn.close()
-    print("База данных инициализирована с тестовыми данными.")
-    print("Папка instance создана, файл app.db создан.")
-    print("Администратор: admin / Admin123!")
-    print("Пользователи: user2-user34 / password123")
 
-    
+# PRAGMA quick_check не дольше timeout секунд (None — без ограничения).
+# Возвращает (проверка завершена, список ошибок); файл, который вовсе
+# не открывается как база, — тоже ошибка.
+def quick_check(path, timeout=None, max_errors=10):
+    conn = sqlite3.connect(path)
+    if timeout is not None:
+        deadline = time.monotonic() + timeout
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+    try:
+        problems = [line for row in conn.execute(f'PRAGMA quick_check({int(max_errors)})')
+                    for line in row[0].splitlines()]
+    except sqlite3.OperationalError as e:
+        if 'interrupted' in str(e):
+            return False, []
+        return True, [str(e)]
+    except sqlite3.DatabaseError as e:
+        return True, [str(e)]
+    finally:
+        conn.close()
+    return True, [] if problems == ['ok'] else problems
 
-if __name__ == '__main__':
-    init_db()
+# Пересчитывает user_stats с нуля. Возвращает число пользователей,
+# у которых сохранённая статистика расходилась с пересчитанной.
+# С check_only=True только сверяет в транзакции чтения, не мешая записи.
+def rebuild_user_stats(conn, check_only=False):
+    with read_transaction(conn) if check_only else write_transaction(conn):
+        mismatched = conn.execute(f'''
+            SELECT COUNT(*) FROM (
+                SELECT * FROM ({USER_STATS_QUERY})
+                EXCEPT
+                SELECT user_id, initiatives_count, initiatives_votes,
+                       total_votes, positive_votes, negative_votes
+                FROM user_stats
+            )
+        ''').fetchone()[0]
+        orphaned = conn.execute(
+            'SELECT COUNT(*) FROM user_stats WHERE user_id NOT IN (SELECT id FROM users)'
+        ).fetchone()[0]
+
+        if not check_only:
+            conn.execute('DELETE FROM user_stats')
+            conn.execute(f'INSERT INTO user_stats {USER_STATS_QUERY}')
+    return mismatched + orphaned
+
+# Пересобирает поисковый индекс по таблице initiatives
+def rebuild_search_index(conn):
+    with write_transaction(conn):
+        conn.execute("INSERT INTO initiatives_fts (initiatives_fts) VALUES ('delete-all')")
+        conn.execute('''
+            INSERT INTO initiatives_fts (rowid, title, description)
+            SELECT id,
+                   replace(replace(title, 'ё', 'е'), 'Ё', 'Е'),
+                   replace(replace(description, 'ё', 'е'), 'Ё', 'Е')
+            FROM initiatives
+        ''')
+
+# Пересчитывает всё, что обычно поддерживают триггеры: после массовой загрузки
+# с отключёнными триггерами или для проверки после сбоя
+def rebuild_derived_data(conn):
+    with write_transaction(conn):
+        conn.execute('''
+            UPDATE counters SET value = (SELECT COUNT(*) FROM initiatives WHERE status = 'active')
+            WHERE name = 'initiatives'
+        ''')
+        conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'generation'")
+        conn.execute(f'UPDATE initiatives SET hot_score = ({HOT_SCORE_QUERY}), hot_at = CURRENT_TIMESTAMP')
+        conn.execute('DELETE FROM vote_rollup_hourly')
+        conn.execute('DELETE FROM vote_rollup_daily')
+        for sql in VOTE_ROLLUP_REBUILD:
+            conn.execute(sql)
+    rebuild_user_stats(conn)
+    rebuild_search_index(conn)
+
+# Модули, которые выполняют запросы при обработке HTTP-запросов
+QUERY_SOURCES = ('app.py', 'vote_buffer.py', 'reaper.py', 'ranking.py', 'rollups.py', 'vote_stream.py')
+
+# Все SQL-запросы модуля: строковые литералы, переданные в execute()
+def collect_queries(source_path):
+    with open(source_path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+
+    queries = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr == 'execute'
+                and node.args
+                and isinstance(node.args[0], ast.Constant)
+                and isinstance(node.args[0].value, str)):
+            queries.append((f'{source_path}:{node.lineno}', ' '.join(node.args[0].value.split())))
+    return sorted(queries, key=lambda query: int(query[0].rsplit(':', 1)[1]))
+
+# Запросы, которым полный проход по таблице пока разрешён
+KNOWN_SCANS = {
+    # Статистика админки: подсчёт строк, результат кэшируется в app.admin_stats()
+    "SELECT (SELECT COUNT(*) FROM users) AS total_users, "
+    "(SELECT value FROM counters WHERE name = 'initiatives') AS active_initiatives, "
+    "(SELECT COUNT(*) FROM initiatives WHERE status = 'hidden') AS hidden_initiatives, "
+    "(SELECT COUNT(*) FROM initiatives_archive) AS archived_initiatives",
+}
 
-    
\ No newline at end of file
+# Проход по индексу в нужном порядке допустим только вместе с LIMIT
+# и без фильтра LIKE, который заставит пройти индекс целиком.
+# Поиск по FTS5 в плане выглядит как SCAN ... VIRTUAL TABLE INDEX, это не скан.
+# Проход по результату подзапроса (SCAN (subquery-N)) тоже: таблицы внутри
+# подзапроса проверяются своими шагами плана.
+def is_table_scan(step, sql):
+    if not step.startswith('SCAN') or step.startswith('SCAN CONSTANT ROW'):
+        return False
+    if ' VIRTUAL TABLE INDEX ' in step or step.startswith('SCAN (subquery-'):
+        return False
+    ordered_walk = ' USING INDEX ' in step and ' LIMIT ' in f' {sql} '
+    return not ordered_walk or ' LIKE ' in sql
+
+# Запросы, которые код собирает сам (f-строки): collect_queries их не видит,
+# поэтому варианты берутся у функций, которые их строят
+def built_queries():
+    from feed import feed_queries
+    return list(feed_queries())
+
+# EXPLAIN QUERY PLAN для каждого запроса приложения на пустой базе
+# с актуальной схемой; возвращает запросы, которые сканируют таблицу
+def check_query_plans(sources=QUERY_SOURCES):
+    conn = sqlite3.connect(':memory:')
+    migrate(conn, quiet=True)
+
+    queries = [query for path in sources for query in collect_queries(path)]
+    queries += [(location, ' '.join(sql.split())) for location, sql in built_queries()]
+    failures = []
+    for location, sql in queries:
+        if sql.split()[0].upper() not in ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH'):
+            continue
+        params = (None,) * sql.count('?')
+        plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+        scans = [step for step in plan if is_table_scan(step, sql)]
+        if scans and sql not in KNOWN_SCANS:
+            failures.append((location, sql, scans))
+
+    conn.close()
+    return failures
+
+def seed_command(args):
+    from seed import seed
+
+    if args.reset:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    folder = os.path.dirname(args.db)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+
+    conn = sqlite3.connect(args.db)
+    migrate(conn, quiet=True)
+    if conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]:
+        conn.close()
+        print("База уже содержит данные. Чтобы пересоздать её, добавьте --reset")
+        return 1
+
+    until = datetime.strptime(args.until, '%Y-%m-%d') if args.until else None
+    users, initiatives, votes = seed(conn, users=args.users, initiatives=args.initiatives,
+                                     votes_per_initiative=args.votes, skew=args.skew,
+                                     seed_value=args.seed, until=until, days=args.days)
+    conn.close()
+    print(f"Создано пользователей: {users}, инициатив: {initiatives}, голосов: {votes}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Управление базой данных')
+    parser.add_argument('--db', default=DATABASE, help='путь к файлу базы')
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('init', help='создать базу и добавить тестовые данные')
+    commands.add_parser('migrate', help='применить миграции к существующей базе')
+    commands.add_parser('check-plans', help='проверить планы запросов приложения')
+    seeding = commands.add_parser('seed', help='заполнить базу тестовыми данными')
+    seeding.add_argument('--users', type=int, default=1000)
+    seeding.add_argument('--initiatives', type=int, default=10000)
+    seeding.add_argument('--votes', type=int, default=50, help='голосов на инициативу в среднем')
+    seeding.add_argument('--skew', type=float, default=1.0, help='показатель распределения популярности')
+    seeding.add_argument('--seed', type=int, default=42)
+    seeding.add_argument('--until', help='дата последних данных, ГГГГ-ММ-ДД (по умолчанию сегодня)')
+    seeding.add_argument('--days', type=int, default=180, help='за сколько дней генерировать данные')
+    seeding.add_argument('--reset', action='store_true', help='удалить существующую базу перед заполнением')
+    reaping = commands.add_parser('reap', help='перенести в архив скрытые инициативы')
+    reaping.add_argument('--grace', type=int, default=3600, help='сколько секунд инициатива должна быть скрыта')
+    reaping.add_argument('--batch', type=int, default=100, help='инициатив в одной транзакции')
+    decaying = commands.add_parser('decay-hot', help='пересчитать рейтинг «в тренде» к текущему моменту')
+    decaying.add_argument('--batch', type=int, default=500, help='инициатив в одной транзакции')
+    compacting = commands.add_parser('compact-rollups', help='свернуть старые почасовые итоги голосования в суточные')
+    compacting.add_argument('--keep-days', type=int, default=ROLLUP_HOURLY_DAYS, help='сколько суток хранить по часам')
+    compacting.add_argument('--batch', type=int, default=1000, help='часов в одной транзакции')
+    backing = commands.add_parser('backup', help='снять копию работающей базы')
+    backing.add_argument('--dir', help='папка копий (по умолчанию backups рядом с базой)')
+    backing.add_argument('--keep', type=int, default=7, help='сколько последних копий хранить')
+    backing.add_argument('--pages', type=int, default=256, help='страниц за шаг копирования')
+    backing.add_argument('--pause', type=float, default=0.005, help='пауза между шагами, с')
+    restoring = commands.add_parser('restore', help='восстановить базу из копии (сервер остановлен)')
+    restoring.add_argument('file', nargs='?', help='файл копии (по умолчанию последняя)')
+    restoring.add_argument('--dir', help='папка копий (по умолчанию backups рядом с базой)')
+    checking = commands.add_parser('check', help='проверить целостность базы (quick_check)')
+    checking.add_argument('--timeout', type=float, help='не дольше, с')
+    maintaining = commands.add_parser('maintain', help='удалить сирот, вернуть свободное место, обновить статистику')
+    maintaining.add_argument('--chunk', type=int, default=2000, help='строк за один проход поиска сирот')
+    maintaining.add_argument('--batch', type=int, default=100, help='сирот в одной транзакции')
+    maintaining.add_argument('--vacuum-step', type=int, default=64, help='страниц за одну транзакцию')
+    maintaining.add_argument('--pause', type=float, default=0.01, help='пауза между транзакциями, с')
+    maintaining.add_argument('--enable-incremental-vacuum', action='store_true',
+                             help='перевести базу на auto_vacuum=INCREMENTAL (VACUUM, блокирует базу)')
+    rebuild = commands.add_parser('rebuild-stats', help='пересчитать статистику пользователей')
+    rebuild.add_argument('--check', action='store_true', help='только сверить, не пересчитывая')
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        conn = sqlite3.connect(args.db)
+        print(f"Версия схемы: {migrate(conn)}")
+        conn.close()
+    elif args.command == 'check-plans':
+        failures = check_query_plans()
+        for location, sql, scans in failures:
+            print(f"{location}: {sql}")
+            for step in scans:
+                print(f"    {step}")
+        if failures:
+            print(f"Запросов с полным сканированием: {len(failures)}")
+            return 1
+        print("Все запросы используют индексы")
+    elif args.command == 'seed':
+        return seed_command(args)
+    elif args.command == 'reap':
+        from reaper import reap
+        conn = connect(args.db)
+        print(f"Перенесено в архив: {reap(conn, args.grace, args.batch)}")
+        conn.close()
+    elif args.command == 'decay-hot':
+        from ranking import decay
+        conn = connect(args.db)
+        print(f"Пересчитано инициатив: {decay(conn, args.batch, min_age=0)}")
+        conn.close()
+    elif args.command == 'compact-rollups':
+        from rollups import compact
+        conn = connect(args.db)
+        print(f"Свёрнуто почасовых итогов: {compact(conn, args.keep_days, args.batch)}")
+        conn.close()
+    elif args.command == 'backup':
+        import backup
+        target, pages, elapsed, removed = backup.backup(args.db, args.dir, args.keep, args.pages, args.pause)
+        print(f"Копия: {target} ({pages} страниц, {elapsed:.1f} с)")
+        for path in removed:
+            print(f"Удалена старая копия: {path}")
+    elif args.command == 'restore':
+        import backup
+        source = args.file
+        if source is None:
+            backups = backup.list_backups(args.db, args.dir or backup.backup_dir_for(args.db))
+            if not backups:
+                print("Копий не найдено")
+                return 1
+            source = backups[-1]
+        try:
+            saved = backup.restore(source, args.db, args.dir)
+        except sqlite3.DatabaseError as e:
+            print(f"База не восстановлена: {e}")
+            return 1
+        if saved:
+            print(f"Прежняя база сохранена: {saved}")
+        print(f"База восстановлена из {source}")
+    elif args.command == 'check':
+        finished, problems = quick_check(args.db, args.timeout)
+        for problem in problems:
+            print(problem)
+        if problems:
+            return 1
+        print("Ошибок не найдено" if finished else "Проверка не уложилась во время, ошибок до этого места нет")
+    elif args.command == 'maintain':
+        import maintenance
+        conn = connect(args.db)
+        if args.enable_incremental_vacuum:
+            print(f"auto_vacuum=INCREMENTAL: {maintenance.enable_incremental_vacuum(conn)}")
+        report = maintenance.maintain(conn, args.chunk, args.batch, args.vacuum_step, args.pause)
+        conn.close()
+        for line in report.lines():
+            print(line)
+    elif args.command == 'rebuild-stats':
+        conn = sqlite3.connect(args.db)
+        mismatched = rebuild_user_stats(conn, check_only=args.check)
+        conn.close()
+        print(f"Расхождений в статистике: {mismatched}")
+        if args.check and mismatched:
+            return 1
+    else:
+        init_db(args.db)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,32 @@
+# Запросы ленты инициатив (главная страница и /api/initiatives).
+# SQL собирается из порядка сортировки и вида страницы, поэтому проверка планов
+# (database.check_query_plans) не видит его в исходниках и берёт все варианты
+# из feed_queries().
+
+# Порядок ленты (?sort=): столбец и тип его значения в курсоре.
+# Для каждого есть частичный индекс (столбец, id) по активным инициативам,
+# поэтому любая страница — проход по диапазону индекса.
+FEED_SORTS = {
+    'new': ('created_at', str),
+    'top': ('votes', int),
+    'hot': ('hot_score', float),
+}
+
+# Страница ленты: после курсора (after) или по OFFSET (offset) для старых ссылок ?page=N.
+# Параметры: значение столбца и id курсора, если after; затем LIMIT и OFFSET, если offset.
+def feed_query(sort, columns='i.*, u.username', after=False, offset=False):
+    column = FEED_SORTS[sort][0]
+    return f'''
+        SELECT {columns} FROM initiatives i
+        JOIN users u ON i.author_id = u.id
+        WHERE i.status = 'active' {f'AND (i.{column}, i.id) < (?, ?)' if after else ''}
+        ORDER BY i.{column} DESC, i.id DESC
+        LIMIT ? {'OFFSET ?' if offset else ''}
+    '''
+
+# Все варианты запроса: (место для отчёта, SQL)
+def feed_queries():
+    for sort in FEED_SORTS:
+        for after, offset in ((False, False), (True, False), (False, True)):
+            yield (f'feed.py:feed_query({sort!r}, after={after}, offset={offset})',
+                   feed_query(sort, after=after, offset=offset))
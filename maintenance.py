@@ -0,0 +1,129 @@
+import json
+import time
+
+from database import write_transaction
+
+# Обслуживание базы: удаление сирот, возврат свободных страниц, статистика
+# для планировщика. Работа разбита на короткие шаги: чтение идёт без блокировки
+# записи (WAL), а каждая запись — своя маленькая транзакция, между которыми
+# запросы приложения успевают взять блокировку. Самая долгая блокировка
+# попадает в отчёт.
+
+# Строки без родителя: таблица, ключ и условие «сирота».
+# При включённых foreign_keys новые сироты не появляются, но остаются от
+# соединений без внешних ключей (загрузка seed, ручные правки базы).
+# Голоса инициативы-сироты уходят каскадом вместе с ней.
+ORPHAN_CHECKS = (
+    ('initiatives', 'id',
+     'NOT EXISTS (SELECT 1 FROM users u WHERE u.id = t.author_id)'),
+    ('votes', 'id',
+     'NOT EXISTS (SELECT 1 FROM users u WHERE u.id = t.user_id)'
+     ' OR NOT EXISTS (SELECT 1 FROM initiatives i WHERE i.id = t.initiative_id)'),
+    ('user_stats', 'user_id',
+     'NOT EXISTS (SELECT 1 FROM users u WHERE u.id = t.user_id)'),
+)
+
+class Report:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.orphans = {}
+        self.pages_freed = 0
+        self.bytes_reclaimed = 0
+        self.longest_lock = 0.0
+        self.writes = 0
+        self.incremental_vacuum = True
+
+    # Выполняет запросы в одной транзакции записи и запоминает, сколько её держали:
+    # от взятия блокировки (BEGIN IMMEDIATE) до конца COMMIT включительно
+    def write(self, conn, *statements):
+        with write_transaction(conn):
+            started = time.perf_counter()
+            for sql, params in statements:
+                conn.execute(sql, params).fetchall()
+            conn.commit()
+            self.longest_lock = max(self.longest_lock, time.perf_counter() - started)
+        self.writes += 1
+
+    def lines(self):
+        lines = [f"Сирот удалено: {table} — {count}" for table, count in self.orphans.items()]
+        if self.incremental_vacuum:
+            lines.append(f"Освобождено страниц: {self.pages_freed} "
+                         f"({self.bytes_reclaimed / 1024 / 1024:.1f} МБ)")
+        else:
+            lines.append("auto_vacuum выключен: страницы не возвращаются, "
+                         "см. maintain --enable-incremental-vacuum")
+        lines.append(f"Транзакций записи: {self.writes}, самая долгая: "
+                     f"{self.longest_lock * 1000:.1f} мс")
+        lines.append(f"Заняло: {time.monotonic() - self.started:.1f} с")
+        return lines
+
+# Проходит таблицу кусками по chunk строк в порядке ключа и удаляет найденных
+# сирот пачками не больше batch
+def collect_orphans(conn, report, chunk=2000, batch=100, pause=0.01, stopping=None):
+    for table, key, orphan in ORPHAN_CHECKS:
+        removed = 0
+        last = -1
+        while stopping is None or not stopping.is_set():
+            rows = conn.execute(f'''
+                SELECT t.{key}, {orphan} FROM {table} t
+                WHERE t.{key} > ? ORDER BY t.{key} LIMIT ?
+            ''', (last, chunk)).fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+            ids = [row[0] for row in rows if row[1]]
+            for start in range(0, len(ids), batch):
+                report.write(conn, (f'DELETE FROM {table} WHERE {key} IN (SELECT value FROM json_each(?))',
+                                    (json.dumps(ids[start:start + batch]),)))
+                time.sleep(pause)
+            removed += len(ids)
+        report.orphans[table] = removed
+
+# Возвращает свободные страницы в файловую систему по step страниц за транзакцию
+# (64 страницы — единицы миллисекунд). Работает только в базе с auto_vacuum = INCREMENTAL,
+# а файл в режиме WAL укорачивается при следующей контрольной точке.
+def reclaim_pages(conn, report, step=64, pause=0.01, stopping=None):
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        report.incremental_vacuum = False
+        return
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    before = conn.execute('PRAGMA page_count').fetchone()[0]
+    while stopping is None or not stopping.is_set():
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if not free:
+            break
+        # sqlite освобождает по странице за шаг, а модуль sqlite3 делает
+        # один шаг у запроса без столбцов — поэтому повторяем pragma
+        report.write(conn, *[('PRAGMA incremental_vacuum(1)', ())] * min(free, step))
+        time.sleep(pause)
+    report.pages_freed = before - conn.execute('PRAGMA page_count').fetchone()[0]
+    report.bytes_reclaimed = report.pages_freed * page_size
+
+# Обновляет статистику планировщика там, где она устарела.
+# analysis_limit ограничивает ANALYZE выборкой, а не проходом по всему индексу.
+def optimize(conn, report):
+    conn.execute('PRAGMA analysis_limit = 400')
+    report.write(conn, ('PRAGMA optimize', ()))
+
+def maintain(conn, chunk=2000, batch=100, step=64, pause=0.01, stopping=None):
+    report = Report()
+    # Контрольная точка внутри commit удлинила бы наши транзакции;
+    # её сделают запросы приложения или PASSIVE в конце
+    autocheckpoint = conn.execute('PRAGMA wal_autocheckpoint').fetchone()[0]
+    conn.execute('PRAGMA wal_autocheckpoint = 0')
+    try:
+        collect_orphans(conn, report, chunk, batch, pause, stopping)
+        reclaim_pages(conn, report, step, pause, stopping)
+        optimize(conn, report)
+    finally:
+        conn.execute(f'PRAGMA wal_autocheckpoint = {autocheckpoint}')
+    conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall()
+    return report
+
+# Разовый перевод существующей базы на auto_vacuum = INCREMENTAL.
+# VACUUM переписывает весь файл и на это время блокирует запись —
+# запускать в окно обслуживания.
+def enable_incremental_vacuum(conn):
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
@@ -0,0 +1,179 @@
+import bisect
+import threading
+import time
+
+# Метрики запросов в памяти процесса, отдаются в текстовом формате Prometheus.
+# На каждый HTTP-запрос заводится RequestStats; соединение из get_db()
+# оборачивается в InstrumentedConnection, которое считает запросы и время SQL.
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.render_started = None
+
+# Курсор, у которого время выборки строк тоже идёт в SQL:
+# sqlite выполняет запрос по мере чтения результата
+class TimedCursor:
+    def __init__(self, cursor, sql, conn):
+        self._cursor = cursor
+        self._sql = sql
+        self._conn = conn
+        self._elapsed = 0.0
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._add(time.perf_counter() - started)
+
+    def _add(self, elapsed):
+        before = self._elapsed
+        self._elapsed += elapsed
+        self._conn._record(elapsed, self._sql, before, self._elapsed)
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class InstrumentedConnection:
+    def __init__(self, conn, stats, metrics):
+        self._conn = conn
+        self._stats = stats
+        self._metrics = metrics
+
+    # Медленный запрос пишем в лог один раз — когда его время перешло порог
+    def _record(self, elapsed, sql, before=0.0, total=None):
+        self._stats.sql_time += elapsed
+        total = elapsed if total is None else total
+        threshold = self._metrics.slow_query_seconds
+        if threshold and before < threshold <= total:
+            self._metrics.slow_query(sql, total)
+
+    def _run(self, method, sql, *args):
+        self._stats.queries += 1
+        started = time.perf_counter()
+        cursor = method(sql, *args)
+        elapsed = time.perf_counter() - started
+        timed = TimedCursor(cursor, sql, self)
+        timed._add(elapsed)
+        return timed
+
+    def execute(self, sql, parameters=()):
+        return self._run(self._conn.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(self._conn.executemany, sql, seq_of_parameters)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            self._conn.commit()
+        finally:
+            self._record(time.perf_counter() - started, 'COMMIT')
+
+    def rollback(self):
+        started = time.perf_counter()
+        try:
+            self._conn.rollback()
+        finally:
+            self._record(time.perf_counter() - started, 'ROLLBACK')
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class Metrics:
+    def __init__(self, slow_query_ms=0):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self._lock = threading.Lock()
+        # endpoint -> гистограммы
+        self._duration = {}
+        self._sql = {}
+        self._render = {}
+        self._queries = {}
+        # (endpoint, status) -> число запросов
+        self._requests = {}
+        self._slow_queries = 0
+
+    def instrument(self, conn, stats):
+        return InstrumentedConnection(conn, stats, self)
+
+    def slow_query(self, sql, elapsed):
+        with self._lock:
+            self._slow_queries += 1
+        print(f"Медленный запрос ({elapsed * 1000:.1f} мс): {' '.join(sql.split())}")
+
+    def observe(self, endpoint, status, stats):
+        total = time.perf_counter() - stats.started
+        with self._lock:
+            for histograms, buckets, value in (
+                    (self._duration, TIME_BUCKETS, total),
+                    (self._sql, TIME_BUCKETS, stats.sql_time),
+                    (self._render, TIME_BUCKETS, stats.render_time),
+                    (self._queries, QUERY_BUCKETS, stats.queries)):
+                histogram = histograms.get(endpoint)
+                if histogram is None:
+                    histogram = histograms[endpoint] = Histogram(buckets)
+                histogram.observe(value)
+            key = (endpoint, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    # Текстовый формат Prometheus; gauges — дополнительные метрики вида имя -> значение
+    def render(self, gauges=None):
+        lines = []
+        with self._lock:
+            lines += ['# HELP app_requests_total HTTP-запросы по обработчику и коду ответа',
+                      '# TYPE app_requests_total counter']
+            for (endpoint, status), count in sorted(self._requests.items()):
+                lines.append(f'app_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+            for name, help_text, histograms in (
+                    ('app_request_duration_seconds', 'Полное время обработки запроса', self._duration),
+                    ('app_request_sql_seconds', 'Время SQL за запрос', self._sql),
+                    ('app_request_render_seconds', 'Время рендеринга шаблонов за запрос', self._render),
+                    ('app_request_queries', 'Число SQL-запросов за запрос', self._queries)):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for endpoint, histogram in sorted(histograms.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{endpoint="{endpoint}"}} {histogram.count}')
+
+            lines += ['# HELP app_slow_queries_total Запросы дольше порога SLOW_QUERY_MS',
+                      '# TYPE app_slow_queries_total counter',
+                      f'app_slow_queries_total {self._slow_queries}']
+
+        for name, value in (gauges or {}).items():
+            lines += [f'# TYPE {name} gauge', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
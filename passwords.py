@@ -0,0 +1,105 @@
+import multiprocessing
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class HasherBusy(Exception):
+    pass
+
+# Функции выполняются в процессах пула, поэтому объявлены на уровне модуля
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+def _verify(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+# Хэширование паролей в отдельных процессах.
+# PBKDF2 — сотни миллисекунд чистого CPU; в потоке веб-сервера он держит GIL
+# и тормозит все остальные запросы процесса. Очередь ограничена max_pending:
+# при переполнении сразу HasherBusy, а не ожидание в хвосте.
+# Процессы запускаются через spawn — fork многопоточного сервера небезопасен.
+# При spawn дочерний процесс заново импортирует главный модуль (app.py), поэтому
+# импорт app ничего не запускает: пул и потоки создаются только в create_app().
+class PasswordHasher:
+    def __init__(self, method='pbkdf2:sha256:600000', workers=2, max_pending=8, timeout=10):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._dummy_hash = None
+        # Время последних проверок пароля: медиану столько же ждёт ответ для
+        # несуществующего логина. Медиана не сбивается первым, холодным запуском пула.
+        self._verify_times = deque(maxlen=32)
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HasherBusy()
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            executor = self._executor
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._done()
+            raise
+        # Место в очереди освобождается, когда задача завершилась, а не когда
+        # запрос перестал её ждать: иначе после таймаутов очередь растёт без предела
+        future.add_done_callback(self._done)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            raise HasherBusy()
+
+    def _done(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def hash(self, password):
+        return self._submit(_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        started = time.perf_counter()
+        ok = self._submit(_verify, pwhash, password)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._verify_times.append(elapsed)
+        return ok
+
+    # Хэш сделан с другими параметрами — при входе его пересчитываем
+    def needs_rehash(self, pwhash):
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash('')
+        return pwhash.split('$', 1)[0] != self._dummy_hash.split('$', 1)[0]
+
+    # Отказ для несуществующего пользователя. Хэш не считаем, а ждём столько,
+    # сколько в среднем занимает проверка: время ответа не выдаёт, есть ли логин,
+    # а ожидание не занимает ни процессор, ни место в очереди.
+    def reject_unknown(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HasherBusy()
+            estimate = statistics.median(self._verify_times) if self._verify_times else None
+        if estimate is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash('')
+            self.verify(self._dummy_hash, 'x')
+        else:
+            time.sleep(estimate * random.uniform(0.9, 1.1))
+        return False
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
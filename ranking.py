@@ -0,0 +1,84 @@
+import sqlite3
+import threading
+
+from database import HOT_HALF_LIFE_HOURS, write_transaction
+
+# Пересчёт рейтинга «в тренде» (hot_score) к текущему моменту.
+# Голос пересчитывает hot_score своей строки сразу (app.apply_vote), но у строк без
+# новых голосов значение само не убывает: раз в interval секунд значение каждой активной инициативы
+# умножается на 2^(-прошло / полураспад), а hot_at сдвигается на текущий момент.
+# Множитель считается от hot_at самой строки, поэтому прерванный проход или
+# одновременный запуск в нескольких процессах ничего не портят.
+
+# Показатель степени двойки на сутки: вес голоса за сутки падает в 2^HOT_RATE раз
+HOT_RATE = 24.0 / HOT_HALF_LIFE_HOURS
+
+# Рейтинг меньше этого по модулю обнуляем: давно забытые инициативы
+# выпадают из пересчёта, а не уменьшаются вечно. hot_at обнулённой строки тоже
+# сдвигается, а голос пересчитывает значение от hot_at множителем не больше 1,
+# поэтому старый hot_at ничего не раздувает.
+HOT_EPSILON = 1e-3
+
+# Один проход по активным инициативам с ненулевым рейтингом в порядке id.
+# Строки выбираются чтением без блокировки, обновляются пачками по batch
+# в коротких транзакциях. Строки, пересчитанные меньше min_age секунд назад, пропускаем.
+# Кэш ленты сбрасывается сам: обновление инициатив меняет поколение данных.
+def decay(conn, batch=500, min_age=60, stopping=None):
+    total = 0
+    last = 0
+    while stopping is None or not stopping.is_set():
+        ids = [row[0] for row in conn.execute('''
+            SELECT id FROM initiatives
+            WHERE id > ? AND status = 'active' AND hot_score != 0
+            ORDER BY id
+            LIMIT ?
+        ''', (last, batch))]
+        if not ids:
+            break
+        last = ids[-1]
+        with write_transaction(conn):
+            total += conn.execute('''
+                UPDATE initiatives
+                SET hot_score = iif(abs(hot_score) * pow(2, (julianday(hot_at) - julianday('now')) * ?) < ?,
+                                    0,
+                                    hot_score * pow(2, (julianday(hot_at) - julianday('now')) * ?)),
+                    hot_at = CURRENT_TIMESTAMP
+                WHERE id BETWEEN ? AND ? AND status = 'active' AND hot_score != 0
+                  AND hot_at <= datetime('now', ?)
+            ''', (HOT_RATE, HOT_EPSILON, HOT_RATE, ids[0], last, f'-{int(min_age)} seconds')).rowcount
+    return total
+
+class HotDecay:
+    def __init__(self, pool, interval=600, batch=500):
+        self.pool = pool
+        self.interval = interval
+        self.batch = batch
+
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='hot-decay', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.run_once()
+            except sqlite3.Error as e:
+                print(f"Ошибка пересчёта рейтинга: {e}")
+
+    def run_once(self):
+        conn = self.pool.acquire()
+        try:
+            # Другой процесс мог только что пройти те же строки — их не трогаем
+            return decay(conn, self.batch, self.interval / 2, self._stopping)
+        finally:
+            self.pool.release(conn)
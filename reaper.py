@@ -0,0 +1,89 @@
+import json
+import sqlite3
+import threading
+
+from database import write_transaction
+
+# Уборка инициатив, скрытых за низкий рейтинг (status = 'hidden').
+# Голосование только меняет статус, а удаление идёт здесь, в фоне: инициатива,
+# пролежавшая скрытой больше grace секунд, переносится в initiatives_archive
+# (с итогами голосов) и удаляется, голоса за неё уходят каскадом.
+# Пачки маленькие, чтобы не держать блокировку записи дольше обычного голоса.
+
+# Одна пачка в одной транзакции; возвращает число убранных инициатив
+def reap_batch(conn, grace=3600, batch=100):
+    with write_transaction(conn):
+        ids = [row[0] for row in conn.execute('''
+            SELECT id FROM initiatives
+            WHERE status = 'hidden' AND hidden_at <= datetime('now', ?)
+            ORDER BY hidden_at
+            LIMIT ?
+        ''', (f'-{int(grace)} seconds', batch))]
+        if not ids:
+            return 0
+        id_list = json.dumps(ids)
+
+        conn.execute('''
+            INSERT OR REPLACE INTO initiatives_archive
+                (id, title, description, author_id, votes, positive_votes, negative_votes,
+                 created_at, hidden_at)
+            SELECT i.id, i.title, i.description, i.author_id, i.votes,
+                   (SELECT COUNT(*) FROM votes v WHERE v.initiative_id = i.id AND v.vote = 1),
+                   (SELECT COUNT(*) FROM votes v WHERE v.initiative_id = i.id AND v.vote = -1),
+                   i.created_at, i.hidden_at
+            FROM initiatives i
+            WHERE i.id IN (SELECT value FROM json_each(?))
+        ''', (id_list,))
+        # Голоса удаляются каскадом
+        conn.execute('DELETE FROM initiatives WHERE id IN (SELECT value FROM json_each(?))',
+                     (id_list,))
+    return len(ids)
+
+# Убирает всё, что накопилось, пачками; между пачками блокировка отпускается
+def reap(conn, grace=3600, batch=100, stopping=None):
+    total = 0
+    while stopping is None or not stopping.is_set():
+        reaped = reap_batch(conn, grace, batch)
+        total += reaped
+        if reaped < batch:
+            break
+    return total
+
+class Reaper:
+    def __init__(self, pool, interval=60, grace=3600, batch=100, on_change=None):
+        self.pool = pool
+        self.interval = interval
+        self.grace = grace
+        self.batch = batch
+        self.on_change = on_change
+
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='initiative-reaper', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.run_once()
+            except sqlite3.Error as e:
+                print(f"Ошибка уборки инициатив: {e}")
+
+    def run_once(self):
+        conn = self.pool.acquire()
+        try:
+            reaped = reap(conn, self.grace, self.batch, self._stopping)
+        finally:
+            self.pool.release(conn)
+        if reaped and self.on_change is not None:
+            self.on_change()
+        return reaped
@@ -0,0 +1,84 @@
+import sqlite3
+import threading
+
+from database import ROLLUP_HOURLY_DAYS, write_transaction
+
+# Сворачивание почасовых итогов голосования в суточные.
+# Триггеры на votes пишут только в vote_rollup_hourly; часы старше keep_days
+# суток складываются в vote_rollup_daily и удаляются из почасовой таблицы
+# в той же транзакции, поэтому сумма по обеим таблицам не меняется, а прерванный
+# проход или одновременный запуск в нескольких процессах ничего не портят.
+
+# Переносит до batch самых старых часов за границей; возвращает, сколько перенесено
+def compact_batch(conn, cutoff, batch=1000):
+    with write_transaction(conn):
+        conn.execute('''
+            INSERT INTO vote_rollup_daily (initiative_id, bucket, positive, negative)
+            SELECT initiative_id, substr(bucket, 1, 10), SUM(positive), SUM(negative)
+            FROM (
+                SELECT initiative_id, bucket, positive, negative FROM vote_rollup_hourly
+                WHERE bucket < ?
+                ORDER BY bucket, initiative_id
+                LIMIT ?
+            )
+            WHERE true
+            GROUP BY 1, 2
+            ON CONFLICT (initiative_id, bucket) DO UPDATE
+            SET positive = positive + excluded.positive, negative = negative + excluded.negative
+        ''', (cutoff, batch))
+        return conn.execute('''
+            DELETE FROM vote_rollup_hourly
+            WHERE (initiative_id, bucket) IN (
+                SELECT initiative_id, bucket FROM vote_rollup_hourly
+                WHERE bucket < ?
+                ORDER BY bucket, initiative_id
+                LIMIT ?
+            )
+        ''', (cutoff, batch)).rowcount
+
+# Сворачивает все часы старше keep_days суток пачками по batch
+def compact(conn, keep_days=ROLLUP_HOURLY_DAYS, batch=1000, stopping=None):
+    # Граница считается один раз, иначе проход через полночь захватил бы лишние сутки
+    cutoff = conn.execute("SELECT date('now', ?)", (f'-{int(keep_days)} days',)).fetchone()[0]
+    total = 0
+    while stopping is None or not stopping.is_set():
+        moved = compact_batch(conn, cutoff, batch)
+        if not moved:
+            break
+        total += moved
+    return total
+
+class RollupCompactor:
+    def __init__(self, pool, interval=3600, keep_days=ROLLUP_HOURLY_DAYS, batch=1000):
+        self.pool = pool
+        self.interval = interval
+        self.keep_days = keep_days
+        self.batch = batch
+
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='rollup-compactor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.run_once()
+            except sqlite3.Error as e:
+                print(f"Ошибка сворачивания итогов: {e}")
+
+    def run_once(self):
+        conn = self.pool.acquire()
+        try:
+            return compact(conn, self.keep_days, self.batch, self._stopping)
+        finally:
+            self.pool.release(conn)
@@ -0,0 +1,174 @@
+import random
+import time
+from datetime import datetime, timedelta
+from werkzeug.security import generate_password_hash
+
+from database import rebuild_derived_data
+
+INITIATIVE_TITLES = [
+    "Внедрение гибкого графика работы",
+    "Установка кулеров с водой на этажах",
+    "Организация курсов английского языка",
+    "Создание комнаты отдыха для сотрудников",
+    "Внедрение системы удаленной работы",
+    "Покупка новых ортопедических кресел",
+    "Организация корпоративной библиотеки",
+    "Введение дня здорового питания",
+    "Установка велопарковки у офиса",
+    "Создание программы наставничества"
+]
+
+INITIATIVE_DESCRIPTIONS = [
+    "Предлагаю внедрить гибкий график работы с 7:00 до 10:00 утра...",
+    "Недостаток питьевой воды влияет на продуктивность сотрудников...",
+    "Знание английского необходимо для работы с иностранными клиентами...",
+    "Комната отдыха поможет сотрудникам восстанавливать силы...",
+    "Удаленная работа повысит удовлетворенность сотрудников...",
+    "Новые кресла улучшат осанку и снизят усталость...",
+    "Корпоративная библиотека будет полезна для самообразования...",
+    "День здорового питания улучшит культуру питания в коллективе...",
+    "Велопарковка поощрит экологичный способ передвижения...",
+    "Программа наставничества поможет новичкам быстрее адаптироваться..."
+]
+
+SEED_TABLES = ('users', 'initiatives', 'votes')
+INSERT_INITIATIVE = ('INSERT INTO initiatives (id, title, description, author_id, votes, created_at, '
+                     'status, hidden_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
+BATCH_SIZE = 100000
+
+def timestamp(moment):
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+# Сколько голосов получит каждая инициатива: распределение Ципфа с показателем skew,
+# в среднем votes_per_initiative, но не больше, чем есть возможных голосующих
+def vote_counts(rng, initiatives, votes_per_initiative, skew, max_votes):
+    weights = [1 / (rank ** skew) for rank in range(1, initiatives + 1)]
+    scale = initiatives * votes_per_initiative / sum(weights)
+    counts = [min(int(weight * scale), max_votes) for weight in weights]
+    # Популярность не должна зависеть от даты создания
+    rng.shuffle(counts)
+    return counts
+
+# Индексы и триггеры на время загрузки удаляем: индексы строятся потом одной
+# сортировкой, а производные данные пересчитываются разом
+def drop_derived_objects(conn):
+    objects = conn.execute(f'''
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+          AND tbl_name IN ({', '.join('?' * len(SEED_TABLES))})
+    ''', SEED_TABLES).fetchall()
+    for kind, name, _ in objects:
+        conn.execute(f'DROP {kind.upper()} {name}')
+    return [sql for _, _, sql in objects]
+
+def insert_batches(conn, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany(sql, batch)
+            batch.clear()
+    if batch:
+        conn.executemany(sql, batch)
+
+# Детерминированный генератор данных: при одинаковых параметрах и seed
+# получается одна и та же база. Пароль у всех пользователей один,
+# поэтому хэш считается один раз.
+def seed(conn, users=33, initiatives=104, votes_per_initiative=12, skew=1.0,
+         seed_value=42, until=None, days=180, quiet=False):
+    rng = random.Random(seed_value)
+    until = until or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    since = until - timedelta(days=days)
+    span = int((until - since).total_seconds())
+    started = time.monotonic()
+
+    def log(message):
+        if not quiet:
+            print(f"[{time.monotonic() - started:7.1f} с] {message}")
+
+    admin_hash = generate_password_hash('Admin123!')
+    user_hash = generate_password_hash('password123')
+
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -262144')
+    conn.commit()
+    # Голоса пишутся раньше своих инициатив; ссылки верны по построению
+    foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+    conn.execute('PRAGMA foreign_keys = OFF')
+    conn.execute('BEGIN')
+    deferred = drop_derived_objects(conn)
+
+    # Пользователи: admin и user2..userN, как в прежних тестовых данных
+    user_rows = [('admin', admin_hash, 1, timestamp(since))]
+    for i in range(2, users + 2):
+        created_at = since + timedelta(seconds=rng.randrange(span))
+        user_rows.append((f'user{i}', user_hash, 0, timestamp(created_at)))
+    insert_batches(conn, 'INSERT INTO users (username, password, is_admin, created_at) VALUES (?, ?, ?, ?)',
+                   user_rows)
+    user_ids = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+    log(f"пользователей: {len(user_rows)}")
+
+    counts = vote_counts(rng, initiatives, votes_per_initiative, skew, len(user_ids) - 1)
+    first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM initiatives").fetchone()[0]
+
+    # Голоса генерируем вместе с инициативами, чтобы сразу знать их итог
+    initiative_rows = []
+    vote_rows = []
+    total_votes = 0
+    for n in range(initiatives):
+        initiative_id = first_id + n
+        author_id = rng.choice(user_ids)
+        offset = rng.randrange(span)
+        created_at = since + timedelta(seconds=offset)
+
+        # Автор не голосует за свою инициативу
+        voters = rng.sample(user_ids, counts[n] + 1)
+        if author_id in voters:
+            voters.remove(author_id)
+        else:
+            voters.pop()
+
+        score = 0
+        last_vote = created_at
+        for voter_id in voters:
+            vote = 1 if rng.random() < 0.7 else -1
+            voted_at = created_at + timedelta(seconds=rng.randrange(span - offset + 1))
+            vote_rows.append((voter_id, initiative_id, vote, timestamp(voted_at)))
+            score += vote
+            last_vote = max(last_vote, voted_at)
+        # Ниже порога инициатива скрыта, как если бы её скрыло голосование
+        hidden = score < -10
+
+        title = f"{rng.choice(INITIATIVE_TITLES)} #{initiative_id}"
+        description = f"{rng.choice(INITIATIVE_DESCRIPTIONS)} Это предложение номер {initiative_id}."
+        initiative_rows.append((initiative_id, title, description, author_id, score, timestamp(created_at),
+                                'hidden' if hidden else 'active', timestamp(last_vote) if hidden else None))
+
+        if len(vote_rows) >= BATCH_SIZE:
+            conn.executemany('INSERT INTO votes (user_id, initiative_id, vote, created_at) VALUES (?, ?, ?, ?)',
+                             vote_rows)
+            total_votes += len(vote_rows)
+            vote_rows.clear()
+            conn.execute('COMMIT')
+            conn.execute('BEGIN')
+        if len(initiative_rows) >= BATCH_SIZE:
+            conn.executemany(INSERT_INITIATIVE, initiative_rows)
+            initiative_rows.clear()
+            log(f"инициатив: {n + 1}, голосов: {total_votes}")
+
+    conn.executemany('INSERT INTO votes (user_id, initiative_id, vote, created_at) VALUES (?, ?, ?, ?)',
+                     vote_rows)
+    total_votes += len(vote_rows)
+    conn.executemany(INSERT_INITIATIVE, initiative_rows)
+    log(f"инициатив: {initiatives}, голосов: {total_votes}")
+
+    for sql in deferred:
+        conn.execute(sql)
+    conn.execute('COMMIT')
+    log("индексы и триггеры созданы")
+
+    rebuild_derived_data(conn)
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA foreign_keys = {foreign_keys}')
+    log("производные данные пересчитаны")
+    return len(user_rows), initiatives, total_votes
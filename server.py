@@ -0,0 +1,196 @@
+import os
+import sys
+import time
+import signal
+import socket
+import threading
+import traceback
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+# Многопроцессный сервер: мастер открывает слушающий сокет и загружает
+# приложение, затем fork-ает workers процессов-обработчиков. Все они принимают
+# соединения с одного сокета, каждый обслуживает запросы в потоках.
+#
+#   SIGTERM, SIGINT — плавная остановка: обработчики дообслуживают начатые запросы
+#   SIGHUP          — плавный перезапуск: новые обработчики стартуют, старые
+#                     перестают принимать соединения и завершаются
+# Упавший обработчик мастер запускает заново.
+# Объекты процесса у каждого обработчика свои: кэш страниц сверяется с базой,
+# а подписчик /api/stream получает только голоса, принятые его процессом.
+# Сам мастер потоков не запускает — fork многопоточного процесса небезопасен.
+# Фоновые задачи (jobs) идут в одном отдельном процессе, а не в каждом обработчике;
+# при SIGHUP он не перезапускается, упавший запускается заново.
+
+# Считает запросы в работе, чтобы при остановке дождаться их завершения.
+# Считаем в обработчике соединения, а не в WSGI: если клиент оборвал
+# соединение, werkzeug может не закрыть ответ приложения.
+class ActiveRequests:
+    def __init__(self):
+        self.count = 0
+        self._cond = threading.Condition()
+
+    def enter(self):
+        with self._cond:
+            self.count += 1
+
+    def leave(self):
+        with self._cond:
+            self.count -= 1
+            self._cond.notify_all()
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+class CountingRequestHandler(WSGIRequestHandler):
+    def run_wsgi(self):
+        self.server.active.enter()
+        try:
+            super().run_wsgi()
+        finally:
+            self.server.active.leave()
+
+def run_jobs(sock, jobs, on_exit):
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, signal.SIG_DFL)
+    sock.close()
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    jobs()
+    # Короткие ожидания: обработчик сигнала выполняется между ними
+    while not stopping.wait(0.5):
+        pass
+    on_exit()
+    return 0
+
+def parse_bind(bind):
+    host, _, port = bind.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+def run_worker(app, sock, post_fork, on_exit, on_drain, graceful_timeout):
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, signal.SIG_DFL)
+    # Соединения с базой, потоки и пулы процессов после fork не переиспользуются
+    post_fork()
+
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, app, threaded=True, request_handler=CountingRequestHandler,
+                         fd=sock.fileno())
+    server.active = active = ActiveRequests()
+
+    def stop(signum, frame):
+        # shutdown() ждёт выхода из serve_forever, поэтому из другого потока
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server.serve_forever()
+    server.socket.close()
+    sock.close()
+    # Новых соединений нет: приложение завершает долгие ответы (поток /api/stream),
+    # а не дождавшиеся и после этого обрываем по истечении graceful_timeout
+    on_drain()
+    if not active.wait(graceful_timeout):
+        print(f"[{os.getpid()}] Не дождались {active.count} запросов, завершаемся")
+    on_exit()
+    return 0
+
+def serve(app, bind='127.0.0.1:8000', workers=2, post_fork=lambda: None, on_exit=lambda: None,
+          on_drain=lambda: None, graceful_timeout=30, jobs=None):
+    host, port = parse_bind(bind)
+    sock = socket.create_server((host, port), backlog=2048)
+    sock.set_inheritable(True)
+
+    # pid -> 'worker' или 'jobs'
+    children = {}
+    state = {'stopping': False, 'restart': False}
+
+    def spawn(role='worker'):
+        pid = os.fork()
+        if pid == 0:
+            # Из дочернего процесса не возвращаемся в цикл мастера
+            code = 1
+            try:
+                if role == 'jobs':
+                    code = run_jobs(sock, jobs, on_exit)
+                else:
+                    code = run_worker(app, sock, post_fork, on_exit, on_drain, graceful_timeout)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        children[pid] = role
+        return pid
+
+    # Обработчику отправлен SIGTERM; не завершился за graceful_timeout — SIGKILL
+    retiring = {}
+
+    def retire(pid):
+        if pid not in retiring:
+            os.kill(pid, signal.SIGTERM)
+            retiring[pid] = time.monotonic() + graceful_timeout + 5
+
+    def on_stop(signum, frame):
+        state['stopping'] = True
+
+    def on_restart(signum, frame):
+        state['restart'] = True
+
+    signal.signal(signal.SIGTERM, on_stop)
+    signal.signal(signal.SIGINT, on_stop)
+    signal.signal(signal.SIGHUP, on_restart)
+
+    print(f"Сервер на http://{host}:{port}, обработчиков: {workers}, мастер {os.getpid()}")
+    for _ in range(workers):
+        spawn()
+    if jobs is not None:
+        spawn('jobs')
+
+    while children:
+        if state['stopping']:
+            for pid in list(children):
+                retire(pid)
+        elif state['restart']:
+            state['restart'] = False
+            old = [pid for pid, role in children.items() if role == 'worker' and pid not in retiring]
+            for _ in old:
+                spawn()
+            for pid in old:
+                retire(pid)
+            print(f"Перезапуск: новые обработчики запущены, {len(old)} старых завершаются")
+
+        now = time.monotonic()
+        for pid, deadline in retiring.items():
+            if deadline < now:
+                os.kill(pid, signal.SIGKILL)
+
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+
+        role = children.pop(pid)
+        if pid in retiring:
+            del retiring[pid]
+        elif not state['stopping']:
+            # Процесс упал сам — заменяем, но не чаще раза в секунду
+            print(f"Процесс {pid} ({role}) завершился (код {os.waitstatus_to_exitcode(status)}), запускаем новый")
+            time.sleep(1)
+            spawn(role)
+
+    sock.close()
+    print("Сервер остановлен")
+    return 0
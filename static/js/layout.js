@@ -0,0 +1,34 @@
+// Мобильное меню
+document.querySelector('.mobile-menu-btn').addEventListener('click', function() {
+    document.querySelector('.mobile-menu').classList.toggle('active');
+    this.innerHTML = this.innerHTML.includes('bars') ? 
+        '<i class="fas fa-times"></i>' : 
+        '<i class="fas fa-bars"></i>';
+});
+
+// Закрытие мобильного меню при клике на ссылку
+document.querySelectorAll('.mobile-menu a').forEach(link => {
+    link.addEventListener('click', () => {
+        document.querySelector('.mobile-menu').classList.remove('active');
+        document.querySelector('.mobile-menu-btn').innerHTML = '<i class="fas fa-bars"></i>';
+    });
+});
+
+// Закрытие выпадающего меню при клике вне его
+document.addEventListener('click', function(event) {
+    const userBtn = document.querySelector('.user-btn');
+    const dropdown = document.querySelector('.dropdown-content');
+
+    if (userBtn && dropdown && !userBtn.contains(event.target) && !dropdown.contains(event.target)) {
+        dropdown.classList.remove('show');
+    }
+});
+
+// Выпадающее меню пользователя
+document.querySelectorAll('.user-btn').forEach(btn => {
+    btn.addEventListener('click', function(e) {
+        e.stopPropagation();
+        const dropdown = this.nextElementSibling;
+        dropdown.classList.toggle('show');
+    });
+});
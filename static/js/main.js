@@ -1,3 +1,21 @@
+// Обновляет счётчик голосов на карточке без перезагрузки страницы
+function updateVoteCount(initiativeId, votes, deleted) {
+    const card = document.querySelector(`.initiative-card[data-id="${initiativeId}"]`);
+    if (!card) {
+        return;
+    }
+    if (deleted) {
+        card.remove();
+        return;
+    }
+    const badge = card.querySelector('.votes-badge');
+    if (badge) {
+        badge.textContent = votes;
+        badge.classList.toggle('positive', votes >= 0);
+        badge.classList.toggle('negative', votes < 0);
+    }
+}
+
 async function vote(initiativeId, voteValue) {
     const response = await fetch('/api/vote', {
         method: 'POST',
@@ -12,8 +30,64 @@ async function vote(initiativeId, voteValue) {
 
     const data = await response.json();
     if (data.success) {
-        location.reload();
+        updateVoteCount(initiativeId, data.votes, data.deleted);
     } else {
         alert(data.message);
     }
-}
\ No newline at end of file
+}
+
+// Живые обновления рейтинга: сервер присылает новые итоги по инициативам,
+// счётчики на странице обновляются на месте. Подписываются только страницы
+// с живыми счётчиками (data-live-votes), в скрытой вкладке поток закрыт:
+// каждый открытый поток занимает поток сервера.
+function subscribeVoteUpdates() {
+    if (!window.EventSource || !document.querySelector('[data-live-votes]')) {
+        return;
+    }
+    let source = null;
+    let retryTimer = null;
+    let lastEventId = '';
+
+    function connect() {
+        retryTimer = null;
+        if (source || document.hidden) {
+            return;
+        }
+        const query = lastEventId ? `?last_event_id=${encodeURIComponent(lastEventId)}` : '';
+        source = new EventSource('/api/stream' + query);
+        source.addEventListener('votes', function(event) {
+            lastEventId = event.lastEventId;
+            JSON.parse(event.data).forEach(change => {
+                updateVoteCount(change.id, change.votes, change.deleted);
+            });
+        });
+        source.addEventListener('error', function() {
+            // Обрыв браузер переподключит сам, а после отказа (503) — нет:
+            // пробуем снова позже, вразброс, чтобы не прийти всем сразу
+            if (source && source.readyState === EventSource.CLOSED) {
+                source = null;
+                retryTimer = setTimeout(connect, 10000 + Math.random() * 20000);
+            }
+        });
+    }
+
+    function disconnect() {
+        if (source) {
+            source.close();
+            source = null;
+        }
+        clearTimeout(retryTimer);
+        retryTimer = null;
+    }
+
+    document.addEventListener('visibilitychange', function() {
+        if (document.hidden) {
+            disconnect();
+        } else {
+            connect();
+        }
+    });
+    connect();
+}
+
+document.addEventListener('DOMContentLoaded', subscribeVoteUpdates);
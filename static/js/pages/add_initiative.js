@@ -0,0 +1,44 @@
+document.getElementById('addInitiativeForm').addEventListener('submit', async function(e) {
+    e.preventDefault();
+
+    const title = document.getElementById('title').value.trim();
+    const description = document.getElementById('description').value.trim();
+
+    // Валидация
+    let isValid = true;
+
+    if (title.length < 5) {
+        document.getElementById('titleError').textContent = 'Название должно быть не менее 5 символов';
+        isValid = false;
+    } else {
+        document.getElementById('titleError').textContent = '';
+    }
+
+    if (description.length < 20) {
+        document.getElementById('descError').textContent = 'Описание должно быть не менее 20 символов';
+        isValid = false;
+    } else {
+        document.getElementById('descError').textContent = '';
+    }
+
+    if (!isValid) return;
+
+    try {
+        const response = await fetch('/api/add', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ title, description })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            alert('Инициатива успешно добавлена!');
+            window.location.href = '/';
+        } else {
+            alert('Ошибка: ' + data.message);
+        }
+    } catch (error) {
+        alert('Ошибка соединения с сервером');
+    }
+});
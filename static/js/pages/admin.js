@@ -0,0 +1,116 @@
+// Управление вкладками
+document.addEventListener('DOMContentLoaded', function() {
+    // Обработчики вкладок
+    document.querySelectorAll('.tab-btn').forEach(btn => {
+        btn.addEventListener('click', function() {
+            const tabName = this.getAttribute('data-tab');
+            showTab(tabName);
+        });
+    });
+
+    // Обработчики кнопок админки
+    document.querySelectorAll('.toggle-admin-btn').forEach(btn => {
+        btn.addEventListener('click', function() {
+            const userId = this.getAttribute('data-user-id');
+            toggleAdmin(userId);
+        });
+    });
+
+    document.querySelectorAll('.delete-user-btn').forEach(btn => {
+        btn.addEventListener('click', function() {
+            const userId = this.getAttribute('data-user-id');
+            deleteUser(userId);
+        });
+    });
+});
+
+function showTab(tabName) {
+    document.querySelectorAll('.tab-content').forEach(tab => {
+        tab.classList.remove('active');
+    });
+    document.querySelectorAll('.tab-btn').forEach(btn => {
+        btn.classList.remove('active');
+    });
+
+    document.getElementById(tabName + 'Tab').classList.add('active');
+    event.currentTarget.classList.add('active');
+}
+
+// Функции администратора
+async function toggleAdmin(userId) {
+    const response = await fetch(`/api/admin/toggle/${userId}`, { method: 'POST' });
+    const data = await response.json();
+
+    if (data.success) {
+        location.reload();
+    } else {
+        alert('Ошибка: ' + data.message);
+    }
+}
+
+async function deleteUser(userId) {
+    if (!confirm('Вы уверены? Это действие нельзя отменить.')) return;
+
+    const response = await fetch(`/api/admin/delete/user/${userId}`, { method: 'DELETE' });
+    const data = await response.json();
+
+    if (data.success) {
+        location.reload();
+    } else {
+        alert('Ошибка: ' + data.message);
+    }
+}
+
+// Поиск инициатив
+async function searchInitiatives() {
+    const query = document.getElementById('searchInitiatives').value;
+    if (!query.trim()) {
+        document.getElementById('initiativesList').innerHTML = 
+            '<p class="text-muted">Введите запрос для поиска инициатив</p>';
+        return;
+    }
+
+    try {
+        const response = await fetch(`/api/admin/search?q=${encodeURIComponent(query)}`);
+        const data = await response.json();
+
+        const container = document.getElementById('initiativesList');
+        if (data.initiatives && data.initiatives.length > 0) {
+            container.innerHTML = data.initiatives.map(init => `
+                <div class="initiative-card">
+                    <div class="initiative-header">
+                        <h4>${init.title}</h4>
+                        <span class="votes ${init.votes >= 0 ? 'positive' : 'negative'}">${init.votes}</span>
+                    </div>
+                    <p>Автор: ${init.author} | Дата: ${init.created_at}</p>
+                    <div class="initiative-actions">
+                        <button class="btn btn-sm btn-danger" onclick="deleteInitiativeAdmin(${init.id})">
+                            <i class="fas fa-trash"></i> Удалить
+                        </button>
+                    </div>
+                </div>
+            `).join('');
+        } else {
+            container.innerHTML = '<p class="text-muted">Инициативы не найдены</p>';
+        }
+    } catch (error) {
+        document.getElementById('initiativesList').innerHTML = 
+            '<p class="error">Ошибка при поиске</p>';
+    }
+}
+
+async function deleteInitiativeAdmin(initiativeId) {
+    if (!confirm('Удалить эту инициативу?')) return;
+
+    const response = await fetch(`/api/initiative/${initiativeId}`, {
+        method: 'DELETE'
+    });
+
+    const data = await response.json();
+
+    if (data.success) {
+        searchInitiatives(); // Обновляем список
+    } else {
+        alert('Ошибка: ' + data.message);
+    }
+}
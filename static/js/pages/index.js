@@ -0,0 +1,67 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Голосование
+    document.querySelectorAll('.btn-vote').forEach(button => {
+        button.addEventListener('click', async function() {
+            const initiativeId = this.getAttribute('data-init-id');
+            const voteValue = parseInt(this.getAttribute('data-vote-value'));
+
+            try {
+                const response = await fetch('/api/vote', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({
+                        initiative_id: parseInt(initiativeId),
+                        vote: voteValue
+                    })
+                });
+
+                const data = await response.json();
+                if (data.success) {
+                    updateVoteCount(initiativeId, data.votes, data.deleted);
+                } else {
+                    if (data.message.includes('Не авторизован')) {
+                        window.location.href = '/login';
+                    } else {
+                        alert('Ошибка: ' + data.message);
+                    }
+                }
+            } catch (error) {
+                alert('Ошибка соединения с сервером');
+            }
+        });
+    });
+
+    // Поиск
+    const searchInput = document.getElementById('searchInput');
+    const applyFiltersBtn = document.getElementById('applyFilters');
+
+    if (searchInput && applyFiltersBtn) {
+        searchInput.addEventListener('keypress', function(e) {
+            if (e.key === 'Enter') {
+                applyFilters();
+            }
+        });
+
+        applyFiltersBtn.addEventListener('click', applyFilters);
+    }
+
+    function applyFilters() {
+        const query = searchInput ? searchInput.value.trim() : '';
+        const sortBy = document.getElementById('sortSelect') ? 
+                      document.getElementById('sortSelect').value : 'new';
+
+        let url = `/?page=1`;
+
+        if (query) {
+            url += `&search=${encodeURIComponent(query)}`;
+        }
+
+        if (sortBy !== 'new') {
+            url += `&sort=${sortBy}`;
+        }
+
+        window.location.href = url;
+    }
+});
@@ -0,0 +1,34 @@
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.delete-initiative-btn').forEach(btn => {
+        btn.addEventListener('click', function() {
+            if (this.disabled) {
+                alert('Эту инициативу нельзя удалить (набрала менее -10 голосов)');
+                return;
+            }
+
+            const initiativeId = this.getAttribute('data-init-id');
+            deleteInitiative(initiativeId);
+        });
+    });
+});
+
+async function deleteInitiative(initiativeId) {
+    if (!confirm('Вы уверены, что хотите удалить эту инициативу?')) return;
+
+    try {
+        const response = await fetch(`/api/initiative/${initiativeId}`, {
+            method: 'DELETE'
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            alert('Инициатива успешно удалена');
+            location.reload();
+        } else {
+            alert('Ошибка: ' + data.message);
+        }
+    } catch (error) {
+        alert('Ошибка соединения с сервером');
+    }
+}
@@ -0,0 +1,33 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.querySelector('form');
+    const password = document.getElementById('password');
+    const confirmPassword = document.getElementById('confirm_password');
+    const registerBtn = document.getElementById('registerBtn');
+
+    function validatePasswords() {
+        if (password.value !== confirmPassword.value) {
+            confirmPassword.setCustomValidity('Пароли не совпадают');
+            registerBtn.disabled = true;
+            registerBtn.style.opacity = '0.7';
+            return false;
+        } else {
+            confirmPassword.setCustomValidity('');
+            registerBtn.disabled = false;
+            registerBtn.style.opacity = '1';
+            return true;
+        }
+    }
+
+    password.addEventListener('input', validatePasswords);
+    confirmPassword.addEventListener('input', validatePasswords);
+
+    form.addEventListener('submit', function(event) {
+        if (!validatePasswords()) {
+            event.preventDefault();
+            alert('Пароли не совпадают!');
+        }
+    });
+
+    // Изначальная проверка
+    validatePasswords();
+});
@@ -0,0 +1,62 @@
+import re
+
+import pytest
+
+import app as app_module
+from conftest import login
+
+@pytest.fixture
+def admin(client):
+    login(client, 1, 'admin')
+    return client
+
+def user_page(client, url):
+    page = client.get(url).get_data(as_text=True)
+    usernames = re.findall(r'<td>\d+</td>\s*<td>([^<]+)</td>', page)
+    next_link = re.search(r'href="(\?after=[^"]+)"', page)
+    return usernames, next_link and next_link.group(1).replace('&amp;', '&')
+
+# Список пользователей по курсору: каждый ровно один раз, в том числе
+# среди зарегистрированных в одну секунду
+def test_admin_users_page_by_cursor(admin, db, monkeypatch):
+    monkeypatch.setattr(app_module, 'ADMIN_USERS_LIMIT', 2)
+    db.executemany("INSERT INTO users (username, password, created_at) VALUES (?, '', '2020-01-01 00:00:00')",
+                   [(f'user{n}',) for n in range(4)])
+    db.commit()
+
+    seen = []
+    url = '/admin'
+    while url:
+        usernames, after = user_page(admin, url)
+        assert len(usernames) <= 2
+        seen += usernames
+        url = after and '/admin' + after
+    assert sorted(seen) == ['admin', 'alice', 'bob', 'user0', 'user1', 'user2', 'user3']
+    assert seen[-4:] == ['user3', 'user2', 'user1', 'user0']
+
+def stats(client):
+    assert client.get('/admin').status_code == 200
+    return app_module.admin_stats_cache['stats']
+
+# Статистика кэшируется, но запись через приложение сбрасывает кэш
+def test_admin_stats_cache_is_reset_by_changes(admin, db):
+    assert stats(admin)['total_users'] == 3
+    assert stats(admin)['active_initiatives'] == 1
+
+    # Запись в обход приложения не видна до истечения срока
+    db.execute("INSERT INTO users (username, password) VALUES ('carol', '')")
+    db.commit()
+    assert stats(admin)['total_users'] == 3
+
+    assert admin.delete('/api/admin/delete/user/3').get_json()['success']
+    assert stats(admin)['total_users'] == 3
+
+    assert admin.post('/api/add', json={'title': 'Вторая', 'description': 'Текст'}).get_json()['success']
+    assert stats(admin)['active_initiatives'] == 2
+    assert stats(admin)['total_initiatives'] == 2
+
+    db.execute("DELETE FROM users WHERE username = 'carol'")
+    db.commit()
+    assert stats(admin)['total_users'] == 3
+    assert admin.post('/api/admin/toggle/2').get_json()['success']
+    assert stats(admin)['total_users'] == 2
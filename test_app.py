@@ -0,0 +1,137 @@
+import os
+import re
+import subprocess
+import sys
+import threading
+
+import app as app_module
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def run_python(code, **env):
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True,
+                          env={**os.environ, **env}, timeout=60)
+
+# Импорт ничего не запускает: ни пула, ни потоков (до fork в server.py и в процессах хэширования)
+def test_import_has_no_side_effects(tmp_path):
+    result = run_python('''
+import threading, app
+assert threading.active_count() == 1, threading.enumerate()
+assert app.db_pool is None and app.reaper is None and app.hot_decay is None
+''', DATABASE_PATH=str(tmp_path / 'missing.db'))
+    assert result.returncode == 0, result.stderr
+    assert not os.path.exists(tmp_path / 'missing.db')
+
+def test_create_app_starts_no_background_jobs(app):
+    assert app_module.db_pool is not None
+    assert app_module.reaper is None
+    assert app_module.hot_decay is None
+    assert app_module.rollup_compactor is None
+    assert not any(t.name in ('initiative-reaper', 'hot-decay', 'rollup-compactor') for t in threading.enumerate())
+
+def test_create_app_switches_database(make_app, db_path, tmp_path):
+    make_app()
+    other = str(tmp_path / 'other.db')
+    os.rename(db_path, other)
+    make_app({'DATABASE': other})
+    assert app_module.db_pool.path == other
+
+def test_release_process_resources_is_idempotent(app):
+    app_module.release_process_resources()
+    app_module.release_process_resources()
+    assert app_module.db_pool is None
+
+def test_api_initiatives_pages_by_cursor(client, db):
+    db.executemany("INSERT INTO initiatives (title, description, author_id, votes) VALUES (?, '', 2, ?)",
+                   [('Вторая', 5), ('Третья', 3)])
+    db.commit()
+    seen = []
+    after = ''
+    while True:
+        data = client.get(f'/api/initiatives?sort=top&limit=2&fields=id,votes&after={after}').get_json()
+        seen += [item['votes'] for item in data['initiatives']]
+        if not data['next']:
+            break
+        after = data['next']
+    assert seen == [5, 3, 0]
+
+# Лента по курсору показывает каждую инициативу ровно один раз, в том числе
+# созданные в одну секунду и с одинаковым рейтингом (страница — 20 инициатив)
+def test_feed_cursor_visits_every_initiative_once(client, db):
+    db.executemany("INSERT INTO initiatives (title, description, author_id, votes, created_at) VALUES (?, '', 2, ?, ?)",
+                   [(str(n), n % 3, '2020-01-01 00:00:00' if n < 30 else '2020-01-02 00:00:00')
+                    for n in range(44)])
+    db.commit()
+    for sort in ('new', 'top', 'hot'):
+        seen = []
+        pages = 0
+        url = f'/?sort={sort}'
+        while url:
+            page = client.get(url).get_data(as_text=True)
+            pages += 1
+            seen += [int(id) for id in re.findall(r'class="initiative-card" data-id="(\d+)"', page)]
+            after = re.search(r'href="\?after=([^"&]+)', page)
+            url = after and f'/?sort={sort}&after={after.group(1)}'
+        assert pages == 3, sort
+        assert sorted(seen) == list(range(1, 46)), sort
+
+def test_feed_page_renders_every_sort(client):
+    for sort in ('new', 'top', 'hot'):
+        assert client.get(f'/?sort={sort}').status_code == 200
+        assert client.get(f'/?sort={sort}&page=2').status_code == 200
+
+def search(client, query):
+    return [item['title'] for item in client.get('/api/search', query_string={'q': query}).get_json()['initiatives']]
+
+# Поиск по словам и их началу, ё и е не различаются
+def test_search_matches_words_and_prefixes(client, db):
+    db.executemany("INSERT INTO initiatives (title, description, author_id) VALUES (?, ?, 2)",
+                   [('Ёлка на площади', 'Новогодняя'), ('Ремонт дороги', 'Ямы на улице Зелёной')])
+    db.commit()
+    assert search(client, 'ремонт') == ['Ремонт дороги']
+    assert search(client, 'ремо') == ['Ремонт дороги']
+    assert search(client, 'елка') == ['Ёлка на площади']
+    assert search(client, 'ЁЛК') == ['Ёлка на площади']
+    assert search(client, 'зеленой') == ['Ремонт дороги']
+    # Все слова обязательны
+    assert search(client, 'ремонт площади') == []
+    assert sorted(search(client, 'на')) == ['Ёлка на площади', 'Ремонт дороги']
+
+# Синтаксис MATCH из запроса не доходит до FTS5: ни ошибки, ни лишних совпадений
+def test_search_escapes_query_syntax(client):
+    for query in ('"', 'Перв* OR', 'NEAR(Первая', 'title:Первая', '-', '*', ')(', 'AND'):
+        response = client.get('/api/search', query_string={'q': query})
+        assert response.status_code == 200, query
+    assert search(client, 'Перв" OR "x') == []
+    assert search(client, 'title:Первая') == []
+    assert search(client, '(Первая)') == ['Первая']
+
+# Отдаются только запрошенные поля, служебные поля курсора наружу не попадают
+def test_api_initiatives_returns_requested_fields(client, db):
+    db.execute("INSERT INTO initiatives (title, description, author_id, votes) VALUES ('Вторая', 'Текст', 3, 2)")
+    db.commit()
+    data = client.get('/api/initiatives').get_json()
+    assert set(data['initiatives'][0]) == {'id', 'title', 'author', 'votes', 'created_at'}
+    assert [item['author'] for item in data['initiatives']] == ['bob', 'alice']
+    assert data['next'] is None
+
+    data = client.get('/api/initiatives?sort=top&fields=title,description').get_json()
+    assert data['initiatives'] == [{'title': 'Вторая', 'description': 'Текст'},
+                                   {'title': 'Первая', 'description': 'Описание'}]
+    response = client.get('/api/initiatives?fields=id,password')
+    assert response.status_code == 400
+
+# Курсор новой ленты проходит инициативы с одинаковым временем создания
+def test_api_initiatives_cursor_continues_new_sort(client, db):
+    db.executemany("INSERT INTO initiatives (title, description, author_id, created_at) VALUES (?, '', 2, ?)",
+                   [(str(n), '2020-01-01 00:00:00') for n in range(5)])
+    db.commit()
+    seen = []
+    after = ''
+    while True:
+        data = client.get('/api/initiatives', query_string={'limit': 2, 'fields': 'id', 'after': after}).get_json()
+        seen += [item['id'] for item in data['initiatives']]
+        if not data['next']:
+            break
+        after = data['next']
+    assert seen == [1, 6, 5, 4, 3, 2]
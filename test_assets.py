@@ -0,0 +1,26 @@
+import shutil
+
+import assets
+
+def test_build_and_load_manifest(tmp_path):
+    static = tmp_path / 'static'
+    shutil.copytree(assets.STATIC_DIR, static, ignore=shutil.ignore_patterns(assets.DIST))
+    assert assets.load_manifest(str(static)) is None
+
+    manifest = assets.build(str(static))
+    assert assets.load_manifest(str(static)) == manifest
+    # Повторная сборка тех же исходников даёт те же имена
+    assert assets.build(str(static)) == manifest
+
+# Процесс приложения только читает манифест, а не собирает статику заново
+def test_create_app_loads_built_manifest(make_app, monkeypatch):
+    manifest = assets.build()
+
+    def fail(*args, **kwargs):
+        raise AssertionError('сборка статики при запуске приложения')
+    monkeypatch.setattr(assets, 'build', fail)
+
+    client = make_app().test_client()
+    response = client.get(f"/assets/{manifest['app.css']['file']}")
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
@@ -0,0 +1,44 @@
+import os
+import sqlite3
+
+import backup
+
+def test_backups_in_the_same_second_do_not_collide(db_path, tmp_path):
+    backup_dir = str(tmp_path / 'backups')
+    targets = [backup.backup(db_path, backup_dir, keep=10, pause=0)[0] for _ in range(3)]
+    assert len(set(targets)) == 3
+    assert backup.list_backups(db_path, backup_dir) == sorted(targets)
+
+def test_backup_is_a_consistent_copy(db_path, tmp_path):
+    target = backup.backup(db_path, str(tmp_path / 'backups'), pause=0)[0]
+    conn = sqlite3.connect(target)
+    assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 3
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    conn.close()
+
+def test_rotation_keeps_newest(db_path, tmp_path):
+    backup_dir = str(tmp_path / 'backups')
+    targets = [backup.backup(db_path, backup_dir, keep=2, pause=0)[0] for _ in range(4)]
+    assert backup.list_backups(db_path, backup_dir) == targets[-2:]
+
+# Копия, сохранённая перед восстановлением, не вытесняет обычные копии
+def test_restore_does_not_evict_snapshots(db_path, tmp_path):
+    backup_dir = str(tmp_path / 'backups')
+    first, _, _, _ = backup.backup(db_path, backup_dir, keep=2, pause=0)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO users (username, password) VALUES ('carol', 'x')")
+    conn.commit()
+    conn.close()
+    second, _, _, _ = backup.backup(db_path, backup_dir, keep=2, pause=0)
+
+    saved = backup.restore(first, db_path, backup_dir)
+    assert saved.endswith(f'{backup.PRE_RESTORE}.db')
+    assert backup.list_backups(db_path, backup_dir, backup.PRE_RESTORE) == [saved]
+
+    _, _, _, removed = backup.backup(db_path, backup_dir, keep=2, pause=0)
+    assert removed == [first]
+    assert os.path.exists(saved) and os.path.exists(second)
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 3
+    conn.close()
@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+import database
+
+from database import check_query_plans, is_table_scan, migrate, rebuild_user_stats, schema_version, MIGRATIONS
+from feed import feed_queries
+
+def test_migrate_is_idempotent(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'app.db')
+    migrate(conn, quiet=True)
+    migrate(conn, quiet=True)
+    assert schema_version(conn) == len(MIGRATIONS)
+    conn.close()
+
+# Пересборка таблиц в миграции 8 сохраняет счётчик AUTOINCREMENT, даже когда
+# строки с наибольшим номером уже удалены или таблица опустела
+@pytest.mark.parametrize('deleted', ['id = 3', '1'])
+def test_add_cascades_keeps_autoincrement(tmp_path, monkeypatch, deleted):
+    conn = sqlite3.connect(tmp_path / 'app.db')
+    version = MIGRATIONS.index(database.add_cascades)
+    monkeypatch.setattr(database, 'MIGRATIONS', MIGRATIONS[:version])
+    migrate(conn, quiet=True)
+    conn.execute("INSERT INTO users (username, password) VALUES ('alice', '')")
+    conn.executemany("INSERT INTO initiatives (title, description, author_id) VALUES (?, '', 1)",
+                     [('Первая',), ('Вторая',), ('Третья',)])
+    conn.execute(f'DELETE FROM initiatives WHERE {deleted}')
+    conn.commit()
+
+    monkeypatch.setattr(database, 'MIGRATIONS', MIGRATIONS)
+    migrate(conn, quiet=True)
+    cursor = conn.execute("INSERT INTO initiatives (title, description, author_id) VALUES ('Новая', '', 1)")
+    assert cursor.lastrowid == 4
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_sequence WHERE name = 'initiatives'").fetchone()[0] == 1
+    conn.close()
+
+# Каждый запрос приложения, включая собранные в коде варианты ленты, идёт по индексу
+def test_query_plans_use_indexes():
+    failures = check_query_plans()
+    assert failures == [], '\n'.join(f'{location}: {scans}' for location, _, scans in failures)
+
+def test_feed_queries_are_checked():
+    locations = [location for location, _ in feed_queries()]
+    assert len(locations) == 9
+    assert "feed.py:feed_query('hot', after=True, offset=False)" in locations
+
+def test_unindexed_query_is_reported(tmp_path):
+    source = tmp_path / 'queries.py'
+    source.write_text("db.execute('SELECT * FROM initiatives WHERE description = ?', (text,))\n")
+    failures = check_query_plans([str(source)])
+    assert [location for location, _, _ in failures] == [f'{source}:1']
+    assert is_table_scan('SCAN initiatives', 'SELECT * FROM initiatives WHERE description = ?')
+
+def break_user_stats(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('UPDATE user_stats SET total_votes = total_votes + 5 WHERE user_id = 2')
+    conn.commit()
+    conn.close()
+
+# Сверка не берёт блокировку записи: проходит, пока другой процесс пишет
+def test_rebuild_user_stats_check_only_reads(db_path):
+    break_user_stats(db_path)
+    writer = sqlite3.connect(db_path)
+    writer.execute('BEGIN IMMEDIATE')
+    conn = sqlite3.connect(db_path, timeout=0.1)
+    try:
+        assert rebuild_user_stats(conn, check_only=True) == 1
+        assert not conn.in_transaction
+    finally:
+        writer.rollback()
+        writer.close()
+    # Ничего не исправлено
+    assert rebuild_user_stats(conn, check_only=True) == 1
+    assert rebuild_user_stats(conn) == 1
+    assert rebuild_user_stats(conn, check_only=True) == 0
+    conn.close()
+
+def fts_ids(conn, match):
+    return [row[0] for row in conn.execute(
+        'SELECT rowid FROM initiatives_fts WHERE initiatives_fts MATCH ? ORDER BY rowid', (match,))]
+
+# Индекс без содержимого (content='') обновляют только триггеры: вставка,
+# правка и удаление строки должны сразу отражаться в поиске
+def test_fts_triggers_keep_index_in_sync(db):
+    db.execute("INSERT INTO initiatives (title, description, author_id) VALUES ('Ёлка во дворе', 'Зелёная', 2)")
+    assert fts_ids(db, 'елка') == [2]
+    assert fts_ids(db, 'зеленая') == [2]
+
+    db.execute("UPDATE initiatives SET title = 'Каток во дворе' WHERE id = 2")
+    assert fts_ids(db, 'елка') == []
+    assert fts_ids(db, 'каток') == [2]
+    assert fts_ids(db, 'дворе') == [2]
+
+    db.execute('DELETE FROM initiatives WHERE id = 2')
+    assert fts_ids(db, 'каток') == []
+    assert fts_ids(db, 'первая') == [1]
+    # Удаление передало ровно те токены, что были вставлены: индекс цел
+    db.execute("INSERT INTO initiatives_fts (initiatives_fts) VALUES ('integrity-check')")
@@ -0,0 +1,55 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+import app as app_module
+from conftest import login
+
+@pytest.fixture
+def admin(client, db, monkeypatch):
+    # Маленькие пачки: выгрузка идёт несколькими кусками
+    monkeypatch.setattr(app_module, 'EXPORT_BATCH', 2)
+    db.executemany("INSERT INTO initiatives (title, description, author_id) VALUES (?, ?, 3)",
+                   [('Вторая', 'Текст, с запятой'), ('Третья', 'Строка\nвторая строка')])
+    db.executemany('INSERT INTO votes (user_id, initiative_id, vote) VALUES (?, ?, ?)',
+                   [(2, 1, 1), (3, 1, -1), (3, 2, 1)])
+    db.commit()
+    login(client, 1, 'admin')
+    return client
+
+def test_export_csv(admin):
+    response = admin.get('/api/export?table=initiatives&format=csv')
+    assert response.is_streamed
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=initiatives.csv'
+    assert response.headers['Cache-Control'] == 'no-store'
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['id', 'title', 'description', 'author_id', 'votes', 'created_at', 'status', 'hidden_at']
+    assert [row[:3] for row in rows[1:]] == [['1', 'Первая', 'Описание'],
+                                             ['2', 'Вторая', 'Текст, с запятой'],
+                                             ['3', 'Третья', 'Строка\nвторая строка']]
+
+# Сжатый поток — один корректный gzip-файл с тем же содержимым
+def test_export_gzip(admin):
+    plain = admin.get('/api/export?table=votes').get_data()
+    response = admin.get('/api/export?table=votes&gzip=1')
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=votes.ndjson.gz'
+
+    data = gzip.decompress(response.get_data())
+    assert data == plain
+    votes = [json.loads(line) for line in data.decode().splitlines()]
+    assert [(vote['user_id'], vote['initiative_id'], vote['vote']) for vote in votes] == \
+        [(2, 1, 1), (3, 1, -1), (3, 2, 1)]
+
+def test_export_requires_admin(client):
+    login(client, 2)
+    assert client.get('/api/export').get_json()['success'] is False
+
+def test_export_rejects_unknown_table(admin):
+    assert admin.get('/api/export?table=users').status_code == 400
+    assert admin.get('/api/export?format=xml').status_code == 400
@@ -0,0 +1,67 @@
+import gzip
+
+import app as app_module
+from conftest import login
+
+def test_index_answers_not_modified(client):
+    response = client.get('/')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert not etag.startswith('W/')
+
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+
+# Сжатый ответ несёт слабый ETag, и браузер присылает его обратно как есть
+def test_gzip_response_has_weak_etag(client):
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    assert 'Первая' in gzip.decompress(response.data).decode()
+
+    response = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+
+# Голос и новая инициатива меняют поколение данных: старый ETag и запись кэша не годятся
+def test_index_cache_follows_data_generation(make_app):
+    app = make_app()
+    reader = app.test_client()
+    writer = app.test_client()
+    login(writer, 2)
+
+    etag = reader.get('/').headers['ETag']
+    assert writer.post('/api/vote', json={'initiative_id': 1, 'vote': 1}).get_json()['success']
+    response = reader.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    etag = response.headers['ETag']
+    assert writer.post('/api/add', json={'title': 'Свежая', 'description': 'Текст'}).get_json()['success']
+    misses = app_module.page_cache.misses
+    response = reader.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Свежая' in response.get_data(as_text=True)
+    assert app_module.page_cache.misses == misses + 1
+
+# Страница из кэша общая для всех вошедших, а меню в ней — своё у каждого
+def test_cached_page_gets_own_user_menu(make_app):
+    app = make_app()
+    alice = app.test_client()
+    bob = app.test_client()
+    login(alice, 2, 'alice')
+    login(bob, 3, 'bob')
+
+    first = alice.get('/')
+    hits = app_module.page_cache.hits
+    second = bob.get('/')
+    assert app_module.page_cache.hits == hits + 1
+
+    page = second.get_data(as_text=True)
+    assert '<span>bob</span>' in page
+    assert '<span>alice</span>' not in page
+    assert '<!-- user-menu:' not in page
+    assert '<span>alice</span>' in first.get_data(as_text=True)
+    assert first.headers['ETag'] != second.headers['ETag']
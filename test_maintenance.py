@@ -0,0 +1,31 @@
+import sqlite3
+import time
+
+from maintenance import Report
+
+class SlowCommit(sqlite3.Connection):
+    def commit(self):
+        if self.in_transaction:
+            time.sleep(0.05)
+        super().commit()
+
+# Время блокировки включает COMMIT
+def test_report_times_commit(db_path):
+    conn = sqlite3.connect(db_path, factory=SlowCommit)
+    report = Report()
+    report.write(conn, ('DELETE FROM user_stats WHERE user_id = ?', (-1,)))
+    assert not conn.in_transaction
+    assert report.longest_lock >= 0.05
+    assert report.writes == 1
+    conn.close()
+
+def test_report_write_rolls_back_on_error(db_path):
+    conn = sqlite3.connect(db_path)
+    report = Report()
+    try:
+        report.write(conn, ("DELETE FROM users WHERE id = 3", ()), ('SELECT * FROM missing', ()))
+    except sqlite3.OperationalError:
+        pass
+    assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 3
+    assert report.writes == 0
+    conn.close()
@@ -0,0 +1,19 @@
+import app as app_module
+
+# Метрики включаются настройкой create_app(), а не переменной окружения при импорте
+def test_metrics_follow_app_config(make_app):
+    client = make_app({'METRICS_ENABLED': True, 'METRICS_TOKEN': None}).test_client()
+    client.get('/')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'app_requests_total{endpoint="index"' in body
+    assert 'app_request_render_seconds' in body
+
+    client = make_app({'METRICS_ENABLED': False}).test_client()
+    client.get('/')
+    assert app_module.metrics is None
+    assert client.get('/metrics').status_code == 404
+
+def test_metrics_token(make_app):
+    client = make_app({'METRICS_ENABLED': True, 'METRICS_TOKEN': 'secret'}).test_client()
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from passwords import HasherBusy, PasswordHasher
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1', workers=1)
+    try:
+        pwhash = hasher.hash('secret')
+        assert hasher.verify(pwhash, 'secret')
+        assert not hasher.verify(pwhash, 'wrong')
+        assert not hasher.needs_rehash(pwhash)
+    finally:
+        hasher.shutdown()
+
+# Процесс хэширования (spawn) заново импортирует главный модуль — как app.py
+# при запуске сервера. Импорт не должен поднимать в нём пул и потоки приложения.
+def test_spawned_worker_starts_no_app_threads(tmp_path):
+    script = tmp_path / 'main.py'
+    script.write_text(f'''
+import sys, threading
+sys.path.insert(0, {ROOT!r})
+import app
+from passwords import PasswordHasher
+
+def child_state():
+    return threading.active_count(), app.db_pool is None
+
+if __name__ == '__main__':
+    hasher = PasswordHasher(workers=1)
+    print(*hasher._submit(child_state))
+    hasher.shutdown()
+''')
+    result = subprocess.run([sys.executable, str(script)], capture_output=True, text=True,
+                            env={**os.environ, 'DATABASE_PATH': str(tmp_path / 'app.db')}, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ['1', 'True']
+
+# Задача, которую перестали ждать по таймауту, всё ещё занимает место в очереди
+def test_timed_out_job_counts_against_max_pending():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1', workers=1, max_pending=1, timeout=0.2)
+    try:
+        with pytest.raises(HasherBusy):
+            hasher._submit(time.sleep, 2)
+        started = time.monotonic()
+        with pytest.raises(HasherBusy):
+            hasher.hash('secret')
+        assert time.monotonic() - started < 0.1
+
+        deadline = time.monotonic() + 10
+        while hasher._pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+        hasher.timeout = 10
+        assert hasher.verify(hasher.hash('secret'), 'secret')
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,75 @@
+import math
+
+import pytest
+
+from app import apply_vote
+from database import write_transaction
+from ranking import decay
+
+def set_hot(db, score, age):
+    db.execute("UPDATE initiatives SET hot_score = ?, hot_at = datetime('now', ?) WHERE id = 1",
+               (score, age))
+    db.commit()
+
+def hot(db):
+    return db.execute('''
+        SELECT hot_score, (julianday('now') - julianday(hot_at)) * 86400 AS age
+        FROM initiatives WHERE id = 1
+    ''').fetchone()
+
+def vote(db, user_id, value):
+    with write_transaction(db):
+        return apply_vote(db, user_id, 1, value)
+
+# Голос за давно забытую инициативу: значение пересчитывается к текущему моменту,
+# а не раздувается множителем от старого hot_at
+@pytest.mark.parametrize('score', [0, 5, -3])
+def test_vote_on_long_idle_initiative(db, score):
+    set_hot(db, score, '-3 years')
+    assert vote(db, 2, 1) == 1
+    row = hot(db)
+    assert math.isfinite(row['hot_score'])
+    assert row['hot_score'] == pytest.approx(1, abs=1e-6)
+    assert row['age'] < 5
+
+def test_revote_replaces_previous_weight(db):
+    vote(db, 2, 1)
+    vote(db, 3, 1)
+    vote(db, 2, -1)
+    assert hot(db)['hot_score'] == pytest.approx(0, abs=1e-3)
+
+def test_decay_halves_after_half_life(db):
+    set_hot(db, 8, '-12 hours')
+    assert decay(db, min_age=0) == 1
+    row = hot(db)
+    assert row['hot_score'] == pytest.approx(4, rel=1e-3)
+    assert row['age'] < 5
+
+def test_decay_zeroes_forgotten_rows_and_moves_hot_at(db):
+    set_hot(db, 1, '-30 days')
+    decay(db, min_age=0)
+    row = hot(db)
+    assert row['hot_score'] == 0
+    assert row['age'] < 5
+
+def vote_age(db, user_id):
+    return db.execute('''
+        SELECT (julianday('now') - julianday(created_at)) * 86400 FROM votes
+        WHERE user_id = ? AND initiative_id = 1
+    ''', (user_id,)).fetchone()[0]
+
+# Повтор того же голоса не обновляет ни время голоса, ни его вес в рейтинге
+def test_repeated_vote_does_not_refresh_weight(db):
+    vote(db, 2, 1)
+    # Голос подан сутки назад: за два полураспада его вес упал до 1/4
+    db.execute("UPDATE votes SET created_at = datetime('now', '-1 day') WHERE user_id = 2")
+    set_hot(db, 0.25, '+0 seconds')
+
+    assert vote(db, 2, 1) == 1
+    assert hot(db)['hot_score'] == pytest.approx(0.25, rel=1e-3)
+    assert vote_age(db, 2) == pytest.approx(86400, abs=5)
+
+    # Изменённый голос — новый: старый вес вычитается, новый идёт с полным весом
+    assert vote(db, 2, -1) == -1
+    assert hot(db)['hot_score'] == pytest.approx(-1, rel=1e-3)
+    assert vote_age(db, 2) < 5
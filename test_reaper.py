@@ -0,0 +1,46 @@
+import pytest
+
+from reaper import reap, reap_batch
+
+# Три инициативы скрыты давно, одна — только что, одна активна
+@pytest.fixture
+def hidden(db):
+    db.executemany('''
+        INSERT INTO initiatives (title, description, author_id, votes, status, hidden_at)
+        VALUES (?, '', 2, -11, 'hidden', datetime('now', ?))
+    ''', [('Старая', '-3 hours'), ('Постарше', '-2 hours'), ('Недавняя', '-90 minutes'),
+          ('Свежая', '-10 seconds')])
+    db.executemany('INSERT INTO votes (user_id, initiative_id, vote) VALUES (?, ?, ?)',
+                   [(1, 2, -1), (2, 2, -1), (3, 2, 1), (1, 5, -1), (1, 1, 1)])
+    db.commit()
+    return db
+
+def initiative_ids(db):
+    return [row[0] for row in db.execute('SELECT id FROM initiatives ORDER BY id')]
+
+# Пачка берёт самые давно скрытые, не больше batch
+def test_reap_batch_stops_at_limit(hidden):
+    assert reap_batch(hidden, grace=3600, batch=2) == 2
+    assert initiative_ids(hidden) == [1, 4, 5]
+    assert reap_batch(hidden, grace=3600, batch=2) == 1
+    assert reap_batch(hidden, grace=3600, batch=2) == 0
+    assert initiative_ids(hidden) == [1, 5]
+
+# Убранная инициатива остаётся в архиве с итогами, её голоса удаляются каскадом
+def test_reap_batch_archives_and_cascades(hidden):
+    reap_batch(hidden, grace=3600, batch=1)
+    archived = hidden.execute('SELECT * FROM initiatives_archive').fetchall()
+    assert len(archived) == 1
+    row = archived[0]
+    assert (row['id'], row['title'], row['author_id'], row['votes']) == (2, 'Старая', 2, -11)
+    assert (row['positive_votes'], row['negative_votes']) == (1, 2)
+    assert row['hidden_at'] is not None
+
+    assert hidden.execute('SELECT COUNT(*) FROM votes WHERE initiative_id = 2').fetchone()[0] == 0
+    assert hidden.execute('SELECT COUNT(*) FROM votes').fetchone()[0] == 2
+
+def test_reap_takes_everything_past_grace(hidden):
+    assert reap(hidden, grace=3600, batch=1) == 3
+    assert initiative_ids(hidden) == [1, 5]
+    assert reap(hidden, grace=0) == 1
+    assert initiative_ids(hidden) == [1]
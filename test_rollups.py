@@ -0,0 +1,102 @@
+import pytest
+
+from database import ROLLUP_HOURLY_DAYS, ROLLUP_SITE
+from rollups import compact, compact_batch
+
+# Голоса за последние 30 суток: 10 пользователей, 3 инициативы
+@pytest.fixture
+def votes(db):
+    db.executemany("INSERT INTO users (username, password) VALUES (?, '')",
+                   [(f'user{n}',) for n in range(10)])
+    db.executemany("INSERT INTO initiatives (title, description, author_id) VALUES (?, '', 2)",
+                   [('Вторая',), ('Третья',)])
+    rows = []
+    for n in range(30):
+        user_id, initiative_id = 4 + n % 10, 1 + n // 10
+        rows.append((user_id, initiative_id, 1 if n % 3 else -1, f'-{n * 23 + 1} hours'))
+    db.executemany("INSERT INTO votes (user_id, initiative_id, vote, created_at) VALUES (?, ?, ?, datetime('now', ?))",
+                   rows)
+    db.commit()
+    return db
+
+def raw_days(db, initiative_id):
+    key = 'TRUE' if initiative_id == ROLLUP_SITE else 'initiative_id = ?'
+    params = () if initiative_id == ROLLUP_SITE else (initiative_id,)
+    return db.execute(f'''
+        SELECT date(created_at), SUM(vote = 1), SUM(vote = -1) FROM votes
+        WHERE {key} GROUP BY 1 ORDER BY 1
+    ''', params).fetchall()
+
+def rollup_days(db, initiative_id):
+    return db.execute('''
+        SELECT bucket, SUM(positive), SUM(negative) FROM (
+            SELECT bucket, positive, negative FROM vote_rollup_daily WHERE initiative_id = ?
+            UNION ALL
+            SELECT substr(bucket, 1, 10), positive, negative FROM vote_rollup_hourly WHERE initiative_id = ?
+        )
+        GROUP BY 1 ORDER BY 1
+    ''', (initiative_id, initiative_id)).fetchall()
+
+def assert_rollups_match(db):
+    for initiative_id in (ROLLUP_SITE, 1, 2, 3):
+        expected = [tuple(row) for row in raw_days(db, initiative_id)]
+        assert [tuple(row) for row in rollup_days(db, initiative_id)] == expected
+
+# Триггеры пишут каждый голос в свой час у инициативы и у площадки
+def test_triggers_fill_hourly_rollups(votes):
+    assert votes.execute('SELECT COUNT(*) FROM vote_rollup_daily').fetchone()[0] == 0
+    hours = votes.execute('''
+        SELECT SUM(positive + negative) FROM vote_rollup_hourly WHERE initiative_id = ?
+    ''', (ROLLUP_SITE,)).fetchone()[0]
+    assert hours == 30
+    assert_rollups_match(votes)
+
+# Смена голоса — ещё одно событие в часе голоса
+def test_changed_vote_is_counted_again(votes):
+    before = votes.execute('''
+        SELECT SUM(positive), SUM(negative) FROM vote_rollup_hourly WHERE initiative_id = 1
+    ''').fetchone()
+    votes.execute('UPDATE votes SET vote = -vote WHERE user_id = 5 AND initiative_id = 1')
+    after = votes.execute('''
+        SELECT SUM(positive), SUM(negative) FROM vote_rollup_hourly WHERE initiative_id = 1
+    ''').fetchone()
+    assert (after[0], after[1]) == (before[0], before[1] + 1)
+
+# Пачка переносит не больше batch часов, итоги по суткам при этом не меняются
+def test_compact_batch_moves_oldest_hours(votes):
+    cutoff = votes.execute("SELECT date('now', ?)", (f'-{ROLLUP_HOURLY_DAYS} days',)).fetchone()[0]
+    old = votes.execute('SELECT COUNT(*) FROM vote_rollup_hourly WHERE bucket < ?', (cutoff,)).fetchone()[0]
+    assert old > 3
+
+    assert compact_batch(votes, cutoff, batch=3) == 3
+    assert votes.execute('SELECT COUNT(*) FROM vote_rollup_hourly WHERE bucket < ?',
+                         (cutoff,)).fetchone()[0] == old - 3
+    assert_rollups_match(votes)
+
+    assert compact(votes, batch=3) == old - 3
+    assert votes.execute('SELECT COUNT(*) FROM vote_rollup_hourly WHERE bucket < ?', (cutoff,)).fetchone()[0] == 0
+    assert votes.execute('SELECT MIN(bucket) FROM vote_rollup_daily').fetchone()[0] < cutoff
+    assert_rollups_match(votes)
+    assert compact(votes) == 0
+
+# График берёт суточные точки из обеих таблиц: до и после сворачивания одинаковы
+def test_timeline_matches_raw_votes(client, votes):
+    expected = [{'bucket': day, 'positive': positive, 'negative': negative}
+                for day, positive, negative in raw_days(votes, 1)]
+    url = '/api/initiative/1/timeline?days=40'
+    data = client.get(url).get_json()
+    assert data['granularity'] == 'day' and data['days'] == 40
+    assert data['points'] == expected
+
+    compact(votes)
+    assert client.get(url).get_json()['points'] == expected
+
+    recent = votes.execute('''
+        SELECT COUNT(*) FROM votes WHERE initiative_id = 1 AND created_at >= date('now', '-1 days')
+    ''').fetchone()[0]
+    hours = client.get('/api/initiative/1/timeline?granularity=hour&days=2').get_json()['points']
+    assert recent and sum(point['positive'] + point['negative'] for point in hours) == recent
+
+def test_timeline_of_missing_initiative(client):
+    assert client.get('/api/initiative/99/timeline').status_code == 404
+    assert client.get('/api/initiative/1/timeline?granularity=week').status_code == 400
@@ -0,0 +1,49 @@
+import sqlite3
+from datetime import datetime
+
+import database
+from database import migrate
+from seed import seed
+
+SMALL = {'users': 20, 'initiatives': 40, 'votes_per_initiative': 6, 'until': datetime(2024, 1, 1)}
+
+# Хэши паролей солятся случайно, а рейтинг «в тренде» считается к моменту
+# загрузки, поэтому сравниваем всё, кроме них
+DUMP_QUERIES = (
+    'SELECT id, username, is_admin, created_at FROM users ORDER BY id',
+    'SELECT id, title, description, author_id, votes, created_at, status, hidden_at FROM initiatives ORDER BY id',
+    'SELECT * FROM votes ORDER BY user_id, initiative_id',
+    'SELECT * FROM user_stats ORDER BY user_id',
+)
+
+def seeded(path, **params):
+    conn = sqlite3.connect(path)
+    migrate(conn, quiet=True)
+    counts = seed(conn, quiet=True, **{**SMALL, **params})
+    dump = [conn.execute(sql).fetchall() for sql in DUMP_QUERIES]
+    conn.close()
+    return counts, dump
+
+def test_seed_is_deterministic(tmp_path):
+    counts, first = seeded(tmp_path / 'first.db')
+    assert counts[:2] == (21, 40)
+    assert seeded(tmp_path / 'second.db') == (counts, first)
+    assert seeded(tmp_path / 'other.db', seed_value=7)[1] != first
+
+def run_seed(path, *args):
+    return database.main(['--db', str(path), 'seed', '--users', '5', '--initiatives', '10',
+                          '--votes', '2', '--until', '2024-01-01', *args])
+
+# Заполненную базу seed не трогает без явного --reset
+def test_seed_refuses_to_wipe_existing_data(db_path, capsys):
+    assert run_seed(db_path) == 1
+    assert '--reset' in capsys.readouterr().out
+    conn = sqlite3.connect(db_path)
+    assert [row[0] for row in conn.execute('SELECT username FROM users ORDER BY id')] == ['admin', 'alice', 'bob']
+    conn.close()
+
+    assert run_seed(db_path, '--reset') == 0
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM users WHERE username = 'alice'").fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM initiatives').fetchone()[0] == 10
+    conn.close()
@@ -0,0 +1,72 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_healthy(url, proc, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert proc.poll() is None, proc.stdout.read()
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise AssertionError('сервер не ответил')
+
+def children_of(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+def thread_count(pid):
+    return len(os.listdir(f'/proc/{pid}/task'))
+
+# Мастер без потоков; обработчики и ровно один процесс фоновых задач
+def test_serve_runs_jobs_in_one_process(db_path):
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, 'app.py', '--db', db_path, 'serve', '--workers', '2',
+                             '--bind', f'127.0.0.1:{port}', '--graceful-timeout', '2'],
+                            cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                            env={**os.environ, 'RATE_LIMIT_ENABLED': '0'})
+    try:
+        wait_healthy(f'http://127.0.0.1:{port}/health', proc)
+        assert thread_count(proc.pid) == 1
+        children = children_of(proc.pid)
+        assert len(children) == 3
+        job_threads = [thread_count(child) for child in children]
+        # У процесса задач — главный поток и три задачи
+        assert job_threads.count(4) == 1
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(15)
+
+# Открытый /api/stream не задерживает остановку на весь graceful_timeout
+def test_stop_does_not_wait_for_streams(db_path):
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, 'app.py', '--db', db_path, 'serve', '--workers', '1',
+                             '--bind', f'127.0.0.1:{port}', '--graceful-timeout', '30'],
+                            cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                            env={**os.environ, 'RATE_LIMIT_ENABLED': '0'})
+    try:
+        wait_healthy(f'http://127.0.0.1:{port}/health', proc)
+        stream = urllib.request.urlopen(f'http://127.0.0.1:{port}/api/stream', timeout=10)
+        assert stream.readline().startswith(b'retry:')
+        started = time.monotonic()
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(15)
+        assert time.monotonic() - started < 10
+        stream.close()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
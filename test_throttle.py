@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+
+from conftest import login
+from throttle import MemoryLimiter, SqliteLimiter, WriteBusy, WriteGate
+
+def test_memory_limiter_charges_cost():
+    limiter = MemoryLimiter()
+    assert limiter.take('k', rate=1, burst=5, cost=3) == 0
+    assert limiter.take('k', rate=1, burst=5, cost=3) > 0
+    assert limiter.take('k', rate=1, burst=5, cost=2) == 0
+
+# Корзины в файле общие для всех экземпляров (процессов)
+def test_sqlite_limiter_is_shared(tmp_path):
+    path = str(tmp_path / 'rate_limit.db')
+    first, second = SqliteLimiter(path), SqliteLimiter(path)
+    try:
+        assert first.take('k', rate=0.01, burst=4, cost=3) == 0
+        assert second.take('k', rate=0.01, burst=4, cost=2) > 0
+        assert second.take('k', rate=0.01, burst=4) == 0
+        assert first.take('k', rate=0.01, burst=4) > 0
+    finally:
+        first.close()
+        second.close()
+
+def test_write_gate_sheds_when_queue_is_full():
+    gate = WriteGate(max_writers=1, max_waiting=0, wait=0.1)
+    with gate:
+        with pytest.raises(WriteBusy):
+            with gate:
+                pass
+    with gate:
+        pass
+
+def test_write_gate_waits_for_a_slot():
+    gate = WriteGate(max_writers=1, max_waiting=1, wait=5)
+    entered = threading.Event()
+    with gate:
+        thread = threading.Thread(target=lambda: gate.__enter__() and entered.set())
+        thread.start()
+        assert not entered.wait(0.1)
+    thread.join(5)
+    assert entered.is_set()
+
+@pytest.fixture
+def limited_client(make_app):
+    client = make_app({'RATE_LIMIT_ENABLED': True, 'RATE_LIMIT_BACKEND': 'memory',
+                       'RATE_LIMIT_VOTE_PER_MIN': 0.01, 'RATE_LIMIT_VOTE_BURST': 3}).test_client()
+    login(client, 2)
+    return client
+
+def batch(*values):
+    return {'votes': [{'initiative_id': 1, 'vote': value} for value in values]}
+
+# Пакет списывает по голосу; неверные запросы лимит не тратят
+def test_batch_is_charged_per_vote(limited_client):
+    for _ in range(5):
+        assert limited_client.post('/api/vote', json={'initiative_id': 1}).status_code == 200
+        assert limited_client.post('/api/votes/batch', json={'votes': [{}]}).status_code == 200
+    assert limited_client.post('/api/votes/batch', json=batch(1, -1)).get_json()['success']
+    assert limited_client.post('/api/vote', json={'initiative_id': 1, 'vote': 1}).get_json()['success']
+    response = limited_client.post('/api/vote', json={'initiative_id': 1, 'vote': 1})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+def test_batch_larger_than_burst_takes_whole_bucket(limited_client):
+    assert limited_client.post('/api/votes/batch', json=batch(1, 1, 1, 1, 1)).status_code == 200
+    assert limited_client.post('/api/votes/batch', json=batch(1)).status_code == 429
+
+def test_refund_returns_tokens(tmp_path):
+    for limiter in (MemoryLimiter(), SqliteLimiter(str(tmp_path / 'rate_limit.db'))):
+        assert limiter.take('k', rate=0.01, burst=2, cost=2) == 0
+        limiter.refund('k', burst=2)
+        assert limiter.take('k', rate=0.01, burst=2) == 0
+        assert limiter.take('k', rate=0.01, burst=2) > 0
+        limiter.close()
+
+def vote_from(client, user_id, address):
+    login(client, user_id)
+    return client.post('/api/vote', json={'initiative_id': 1, 'vote': 1},
+                       headers={'X-Forwarded-For': address}).status_code
+
+LIMITS = {'RATE_LIMIT_ENABLED': True, 'RATE_LIMIT_BACKEND': 'memory',
+          'RATE_LIMIT_VOTE_PER_MIN': 0.01, 'RATE_LIMIT_VOTE_BURST': 1, 'RATE_LIMIT_IP_FACTOR': 1}
+
+# За прокси у каждого клиента своя корзина IP, а не одна на всех
+def test_ip_bucket_uses_forwarded_address(make_app):
+    client = make_app({**LIMITS, 'PROXY_FIX_X_FOR': 1}).test_client()
+    assert vote_from(client, 2, '203.0.113.1') == 200
+    assert vote_from(client, 3, '203.0.113.2') == 200
+
+    client = make_app({**LIMITS, 'PROXY_FIX_X_FOR': 0}).test_client()
+    assert vote_from(client, 2, '203.0.113.1') == 200
+    assert vote_from(client, 3, '203.0.113.2') == 429
+
+# Отказ по корзине пользователя не тратит лимит адреса
+def test_user_refusal_does_not_spend_ip_budget(make_app):
+    client = make_app({**LIMITS, 'RATE_LIMIT_IP_FACTOR': 2}).test_client()
+    assert vote_from(client, 2, '') == 200
+    assert vote_from(client, 2, '') == 429
+    assert vote_from(client, 3, '') == 200
@@ -0,0 +1,61 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app import apply_vote
+from database import ConnectionPool
+from vote_buffer import VoteBuffer
+
+@pytest.fixture
+def buffer(db_path):
+    pool = ConnectionPool(db_path, size=2)
+    yield VoteBuffer(pool, apply_vote)
+    pool.close_all()
+
+def stored_votes(db):
+    return db.execute('SELECT votes FROM initiatives WHERE id = 1').fetchone()[0]
+
+def test_flush_writes_pending_votes(buffer, db):
+    assert buffer.add(db, 2, 1, 1) == 1
+    assert buffer.add(db, 3, 1, 1) == 2
+    assert stored_votes(db) == 0
+    assert buffer.flush() == 2
+    assert stored_votes(db) == 2
+    assert buffer.pending_delta(1) == 0
+
+# Запись пачки между чтением базы и постановкой голоса в буфер
+# не должна давать голосу устаревшее прежнее значение
+class FlushAfterRead:
+    def __init__(self, db, buffer):
+        self.db = db
+        self.buffer = buffer
+        self.flusher = None
+
+    def execute(self, sql, params=()):
+        row = self.db.execute(sql, params).fetchone()
+        self.flusher = threading.Thread(target=self.buffer.flush)
+        self.flusher.start()
+        self.flusher.join(0.3)
+        return SimpleNamespace(fetchone=lambda: row)
+
+def test_concurrent_flush_does_not_make_vote_stale(buffer, db):
+    buffer.add(db, 2, 1, 1)
+    racing = FlushAfterRead(db, buffer)
+    assert buffer.add(racing, 2, 1, -1) == -1
+    racing.flusher.join(5)
+    db.rollback()
+    assert stored_votes(db) + buffer.pending_delta(1) == -1
+    buffer.flush()
+    assert stored_votes(db) == -1
+    assert buffer.pending_delta(1) == 0
+
+# Голос пользователя, удалённого до записи, отбрасывается, остальные записываются
+def test_flush_drops_votes_of_deleted_users(buffer, db):
+    buffer.add(db, 2, 1, 1)
+    buffer.add(db, 3, 1, 1)
+    db.execute('DELETE FROM users WHERE id = 3')
+    db.commit()
+    assert buffer.flush() == 2
+    assert stored_votes(db) == 1
+    assert buffer.flush() == 0
@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+import app as app_module
+from conftest import login
+from database import ConnectionPool
+from vote_stream import VoteHub
+
+@pytest.fixture
+def pool(db_path):
+    pool = ConnectionPool(db_path, size=2)
+    yield pool
+    pool.close_all()
+
+def set_votes(db, initiative_id, votes):
+    db.execute('UPDATE initiatives SET votes = ? WHERE id = ?', (votes, initiative_id))
+    db.commit()
+
+def next_event(stream):
+    event = next(stream)
+    while event.startswith(':'):
+        event = next(stream)
+    return event
+
+def test_subscribers_are_capped(pool):
+    hub = VoteHub(pool, max_clients=2)
+    assert hub.subscribe() and hub.subscribe()
+    assert not hub.subscribe()
+    hub.unsubscribe()
+    assert hub.subscribe()
+    hub.close()
+
+# Изменения читаются из журнала в базе и сливаются в одно событие на интервал
+def test_stream_delivers_changes_from_journal(pool, db):
+    hub = VoteHub(pool, heartbeat=5)
+    hub.poll()
+    stream = hub.stream()
+    assert next(stream).startswith('retry:')
+    set_votes(db, 1, 2)
+    set_votes(db, 1, 3)
+    hub.poll()
+    assert next_event(stream) == 'id: 2\nevent: votes\ndata: [{"id": 1, "votes": 3, "deleted": false}]\n\n'
+
+# Хабы разных процессов видят одни и те же изменения под одними номерами:
+# подписчик продолжает с Last-Event-ID у другого обработчика
+def test_hubs_share_changes_across_processes(db_path, db):
+    pools = [ConnectionPool(db_path, size=1) for _ in range(2)]
+    try:
+        first, second = (VoteHub(pool) for pool in pools)
+        first.poll()
+        stream = first.stream()
+        next(stream)
+        set_votes(db, 1, 5)
+        first.poll()
+        event = next_event(stream)
+        assert event.startswith('id: 1\n')
+
+        set_votes(db, 1, 6)
+        second.poll()
+        resumed = second.stream(last_seq=1)
+        next(resumed)
+        assert next_event(resumed) == 'id: 2\nevent: votes\ndata: [{"id": 1, "votes": 6, "deleted": false}]\n\n'
+    finally:
+        for pool in pools:
+            pool.close_all()
+
+def test_hidden_and_deleted_initiatives_are_reported(pool, db):
+    hub = VoteHub(pool)
+    hub.poll()
+    db.execute("UPDATE initiatives SET status = 'hidden' WHERE id = 1")
+    db.commit()
+    stream = hub.stream()
+    next(stream)
+    hub.poll()
+    assert '"deleted": true' in next_event(stream)
+
+# close() будит ждущие потоки, и они завершаются, не дожидаясь heartbeat
+def test_close_ends_streams(pool):
+    hub = VoteHub(pool, heartbeat=60)
+    hub.poll()
+    stream = hub.stream()
+    next(stream)
+    finished = threading.Event()
+
+    def consume():
+        for _ in stream:
+            pass
+        finished.set()
+    threading.Thread(target=consume, daemon=True).start()
+
+    hub.close()
+    assert finished.wait(5)
+    assert not hub.subscribe()
+
+def test_stream_limit_response(make_app):
+    client = make_app({'STREAM_MAX_CLIENTS': 0, 'STREAM_RETRY_S': 7}).test_client()
+    response = client.get('/api/stream')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '7'
+    assert response.get_json()['retry'] == 7
+
+# Голос через API попадает в поток подписчика
+def test_vote_reaches_stream(make_app):
+    client = make_app({'STREAM_INTERVAL_MS': 10}).test_client()
+    assert app_module.vote_hub.subscribe()
+    stream = app_module.vote_hub.stream()
+    next(stream)
+    login(client, 2)
+    client.post('/api/vote', json={'initiative_id': 1, 'vote': 1})
+    assert '"votes": 1' in next_event(stream)
+    app_module.vote_hub.unsubscribe()
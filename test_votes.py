@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+import database
+from conftest import login
+
+def test_vote_updates_total(client, db):
+    login(client, 2)
+    response = client.post('/api/vote', json={'initiative_id': 1, 'vote': 1})
+    assert response.get_json() == {'success': True, 'initiative_id': 1, 'votes': 1, 'deleted': False}
+    assert db.execute('SELECT votes FROM initiatives WHERE id = 1').fetchone()[0] == 1
+
+def test_vote_on_missing_initiative(client):
+    login(client, 2)
+    response = client.post('/api/vote', json={'initiative_id': 99, 'vote': 1})
+    assert response.status_code == 200
+    assert response.get_json()['success'] is False
+
+# Пользователя удалили, а сессия осталась: ответ об ошибке, а не 500
+def test_vote_from_deleted_user(client, db):
+    db.execute('DELETE FROM users WHERE id = 3')
+    db.commit()
+    login(client, 3, 'bob')
+    response = client.post('/api/vote', json={'initiative_id': 1, 'vote': 1})
+    assert response.status_code == 200
+    assert response.get_json() == {'success': False, 'message': 'Инициатива не найдена'}
+
+    response = client.post('/api/votes/batch', json={'votes': [{'initiative_id': 1, 'vote': 1}]})
+    assert response.status_code == 200
+    assert response.get_json()['success'] is False
+    # Транзакция откатилась целиком: счётчик не изменился
+    assert db.execute('SELECT votes FROM initiatives WHERE id = 1').fetchone()[0] == 0
+
+def test_batch_reports_each_vote(client):
+    login(client, 2)
+    response = client.post('/api/votes/batch', json={'votes': [
+        {'initiative_id': 1, 'vote': -1},
+        {'initiative_id': 99, 'vote': 1},
+    ]})
+    results = response.get_json()['results']
+    assert [r['success'] for r in results] == [True, False]
+    assert results[0]['votes'] == -1
+
+# Не дождались блокировки записи — 503 и Retry-After
+def test_locked_database_answers_busy(make_app, db_path, monkeypatch):
+    pragmas = tuple((name, 50 if name == 'busy_timeout' else value) for name, value in database.SQLITE_PRAGMAS)
+    monkeypatch.setattr(database, 'SQLITE_PRAGMAS', pragmas)
+    client = make_app().test_client()
+    login(client, 2)
+    writer = sqlite3.connect(db_path)
+    writer.execute('BEGIN IMMEDIATE')
+    try:
+        response = client.post('/api/vote', json={'initiative_id': 1, 'vote': 1})
+    finally:
+        writer.rollback()
+        writer.close()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+# Настоящий сбой базы не выдаётся за занятость
+def test_schema_error_is_not_busy(client, db):
+    db.execute('DROP TRIGGER trg_vote_rollup_insert')
+    db.execute('ALTER TABLE vote_rollup_hourly RENAME TO vote_rollup_hourly_old')
+    db.execute('''
+        CREATE TRIGGER trg_vote_rollup_insert AFTER INSERT ON votes
+        BEGIN INSERT INTO vote_rollup_missing VALUES (1); END
+    ''')
+    db.commit()
+    login(client, 2)
+    with pytest.raises(sqlite3.OperationalError, match='no such table'):
+        client.post('/api/vote', json={'initiative_id': 1, 'vote': 1})
@@ -0,0 +1,168 @@
+import sqlite3
+import threading
+import time
+
+from database import ConnectionPool
+
+# Защита записи в базу от перегрузки.
+#
+# Частота запросов — корзина токенов на ключ (пользователь, IP): корзина вмещает
+# burst токенов и пополняется на rate токенов в секунду, запрос забирает cost.
+# Токенов не хватает — отказ и время до появления нужного (для Retry-After).
+# MemoryLimiter держит корзины в памяти процесса: у многопроцессного сервера
+# (server.py) у каждого обработчика свои корзины, и лимит умножается на число
+# процессов. SqliteLimiter держит их в отдельном файле SQLite, общем для всех
+# процессов, — не в основной базе, чтобы учёт запросов не занимал её блокировку записи.
+#
+# WriteGate ограничивает число одновременных записей в процессе: остальные ждут
+# недолго в очереди ограниченной длины, а не копятся в busy_timeout sqlite.
+# Очередь у каждого процесса своя: между обработчиками server.py записи
+# по-прежнему упорядочивает блокировка записи sqlite.
+
+# Корзину, к которой не обращались дольше, удаляем: при наших лимитах
+# она давно полная, и новая корзина ничем от неё не отличается
+BUCKET_IDLE_S = 3600
+
+class MemoryLimiter:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    # Возвращает 0, если запрос разрешён, иначе сколько секунд ждать
+    def take(self, key, rate, burst, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                return (cost - tokens) / rate
+            if key not in self._buckets and len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            self._buckets[key] = (tokens - cost, now)
+            return 0
+
+    # Возвращает списанные токены (запрос всё же отклонён)
+    def refund(self, key, burst, cost=1):
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(burst, tokens + cost), updated)
+
+    def _prune(self, now):
+        for key in [key for key, (_, updated) in self._buckets.items()
+                    if now - updated > BUCKET_IDLE_S]:
+            del self._buckets[key]
+
+    def close(self):
+        pass
+
+class LimiterPool(ConnectionPool):
+    def _open(self):
+        conn = super()._open()
+        # Корзины не жалко потерять при падении, а ждать чужую запись долго нельзя
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('PRAGMA busy_timeout = 200')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        conn.commit()
+        return conn
+
+class SqliteLimiter:
+    def __init__(self, path, pool_size=4, prune_every=10000):
+        self.prune_every = prune_every
+        self._pool = LimiterPool(path, size=pool_size, timeout=1)
+        self._takes = 0
+
+    # Списание — один UPSERT: пополнение и проверка идут атомарно в базе,
+    # поэтому одновременные запросы из разных процессов не тратят один токен дважды.
+    # Часы у процессов общие (time.time), небольшой разброс отсекает max(..., 0).
+    def take(self, key, rate, burst, cost=1):
+        now = time.time()
+        try:
+            conn = self._pool.acquire()
+        except sqlite3.Error:
+            return 0
+        try:
+            with conn:
+                allowed = conn.execute('''
+                    INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE
+                    SET tokens = min(?, tokens + max(excluded.updated - updated, 0) * ?) - ?,
+                        updated = excluded.updated
+                    WHERE min(?, tokens + max(excluded.updated - updated, 0) * ?) >= ?
+                    RETURNING tokens
+                ''', (key, burst - cost, now, burst, rate, cost, burst, rate, cost)).fetchall()
+            if allowed:
+                self._maybe_prune(conn, now)
+                return 0
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = min(burst, row['tokens'] + max(now - row['updated'], 0) * rate)
+            return max(cost - tokens, 0) / rate
+        except sqlite3.Error as e:
+            # Сбой учёта не должен останавливать запись: пропускаем запрос
+            print(f"Ошибка ограничителя запросов: {e}")
+            return 0
+        finally:
+            self._pool.release(conn)
+
+    def refund(self, key, burst, cost=1):
+        try:
+            conn = self._pool.acquire()
+        except sqlite3.Error:
+            return
+        try:
+            with conn:
+                conn.execute('UPDATE buckets SET tokens = min(?, tokens + ?) WHERE key = ?',
+                             (burst, cost, key))
+        except sqlite3.Error as e:
+            print(f"Ошибка ограничителя запросов: {e}")
+        finally:
+            self._pool.release(conn)
+
+    def _maybe_prune(self, conn, now):
+        self._takes += 1
+        if self._takes % self.prune_every == 0:
+            with conn:
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - BUCKET_IDLE_S,))
+
+    def close(self):
+        self._pool.close_all()
+
+class WriteBusy(Exception):
+    pass
+
+class WriteGate:
+    def __init__(self, max_writers=4, max_waiting=16, wait=0.5):
+        self.max_writers = max_writers
+        self.max_waiting = max_waiting
+        self.wait = wait
+        self._active = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            if self._active >= self.max_writers:
+                # Очередь полна — отказываем сразу, не дожидаясь таймаута
+                if self._waiting >= self.max_waiting:
+                    raise WriteBusy()
+                self._waiting += 1
+                try:
+                    if not self._cond.wait_for(lambda: self._active < self.max_writers, self.wait):
+                        raise WriteBusy()
+                finally:
+                    self._waiting -= 1
+            self._active += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
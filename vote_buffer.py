@@ -0,0 +1,170 @@
+import sqlite3
+import threading
+
+from database import write_transaction
+
+class BufferFull(Exception):
+    pass
+
+# Отложенная запись голосов (write-behind).
+# Голоса копятся в памяти по ключу (user_id, initiative_id) — повторный голос
+# того же пользователя просто заменяет предыдущий. Фоновый поток раз в
+# flush_interval секунд (или при накоплении max_batch голосов) пишет их пачками
+# в одной транзакции. flush_interval — это и окно потери данных при падении процесса.
+class VoteBuffer:
+    def __init__(self, pool, apply_vote, flush_interval=0.2, max_batch=500, max_pending=10000):
+        self.pool = pool
+        self.apply_vote = apply_vote
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+
+        # key -> (голос, голос в базе до первого изменения в буфере)
+        self._pending = {}
+        self._in_flight = {}
+        # initiative_id -> сумма ещё не записанных изменений рейтинга
+        self._deltas = {}
+        # Растёт при каждом изменении буфера — входит в поколение данных для кэша страниц
+        self.version = 0
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='vote-flusher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # Всё, что осталось в буфере, пишем перед выходом
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Ошибка записи голосов: {e}")
+
+    # Ставит голос в очередь и возвращает рейтинг с учётом незаписанных голосов
+    # или None, если инициативы нет. При переполнении — BufferFull,
+    # тогда голос нужно записать синхронно.
+    # База читается под блокировкой буфера: flush() фиксирует пачку и убирает её
+    # из буфера под той же блокировкой, поэтому голос виден либо в базе, либо
+    # в буфере — одновременный голос того же пользователя не возьмёт старое значение.
+    def add(self, db, user_id, initiative_id, vote_value):
+        key = (user_id, initiative_id)
+        with self._lock:
+            row = db.execute('''
+                SELECT i.votes, v.vote FROM initiatives i
+                LEFT JOIN votes v ON v.initiative_id = i.id AND v.user_id = ?
+                WHERE i.id = ? AND i.status = 'active'
+            ''', (user_id, initiative_id)).fetchone()
+            if row is None:
+                return None
+            stored_total, stored_vote = row[0], row[1] or 0
+
+            if key in self._pending:
+                prev, base = self._pending[key]
+            elif key in self._in_flight:
+                prev = base = self._in_flight[key][0]
+            else:
+                if len(self._pending) >= self.max_pending:
+                    self._wake.set()
+                    raise BufferFull()
+                prev = base = stored_vote
+
+            self._pending[key] = (vote_value, base)
+            delta = self._deltas.get(initiative_id, 0) + vote_value - prev
+            self._deltas[initiative_id] = delta
+            self.version += 1
+            if len(self._pending) >= self.max_batch:
+                self._wake.set()
+            return stored_total + delta
+
+    def pending_delta(self, initiative_id):
+        with self._lock:
+            return self._deltas.get(initiative_id, 0)
+
+    # Подмешивает незаписанные голоса в строки инициатив для отображения
+    def merge(self, initiatives):
+        with self._lock:
+            if not self._deltas:
+                return initiatives
+            deltas = dict(self._deltas)
+
+        merged = []
+        for init in initiatives:
+            delta = deltas.get(init['id'])
+            if delta:
+                init = dict(init)
+                init['votes'] += delta
+            merged.append(init)
+        return merged
+
+    # Записанная пачка больше не учитывается в буфере. Вызывается под self._lock.
+    def _settle(self, chunk):
+        for key, (vote_value, base) in chunk:
+            initiative_id = key[1]
+            delta = self._deltas.get(initiative_id, 0) - (vote_value - base)
+            if delta:
+                self._deltas[initiative_id] = delta
+            else:
+                self._deltas.pop(initiative_id, None)
+            self._in_flight.pop(key, None)
+        self.version += 1
+
+    # Голос пользователя, удалённого, пока голос ждал записи, отбрасываем:
+    # иначе пачка откатывалась бы и повторялась вечно
+    def _apply(self, conn, user_id, initiative_id, vote_value):
+        conn.execute('SAVEPOINT vote')
+        try:
+            self.apply_vote(conn, user_id, initiative_id, vote_value)
+        except sqlite3.IntegrityError:
+            conn.execute('ROLLBACK TO vote')
+        conn.execute('RELEASE vote')
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._in_flight, self._pending = self._pending, {}
+                items = list(self._in_flight.items())
+
+            flushed = 0
+            conn = self.pool.acquire()
+            try:
+                for start in range(0, len(items), self.max_batch):
+                    chunk = items[start:start + self.max_batch]
+                    with write_transaction(conn):
+                        for (user_id, initiative_id), (vote_value, _) in chunk:
+                            self._apply(conn, user_id, initiative_id, vote_value)
+                        # Фиксация и снятие пачки из буфера — под одной блокировкой (см. add)
+                        with self._lock:
+                            conn.commit()
+                            self._settle(chunk)
+                    flushed += len(chunk)
+            except sqlite3.Error as e:
+                # Незаписанное возвращаем в буфер, если пользователь не успел переголосовать
+                print(f"Не удалось записать голоса, повторим позже: {e}")
+                with self._lock:
+                    for key, entry in items[flushed:]:
+                        self._in_flight.pop(key, None)
+                        if key in self._pending:
+                            self._pending[key] = (self._pending[key][0], entry[1])
+                        else:
+                            self._pending[key] = entry
+            finally:
+                self.pool.release(conn)
+            return flushed
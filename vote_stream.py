@@ -0,0 +1,142 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Рассылка изменений рейтинга подписчикам /api/stream (Server-Sent Events).
+# Источник — журнал vote_changes в базе: его пишут триггеры при любом изменении
+# итога, в каком бы процессе ни был принят голос (обработчики server.py, буфер
+# голосов, уборщик). Раз в interval секунд один поток-рассыльщик процесса читает
+# новые записи и превращает их в одно событие — не больше одного обновления
+# на инициативу за интервал. Номер события — номер записи журнала, он общий
+# для всех процессов, поэтому Last-Event-ID годится и после переподключения
+# к другому обработчику.
+# У подписчика нет своей очереди и своего потока в хабе: все читают общий журнал
+# последних событий по номеру. Но сервер (werkzeug) держит на каждый открытый
+# ответ свой поток, поэтому подписчиков не больше max_clients на процесс,
+# а close() завершает все потоки (остановка обработчика).
+class VoteHub:
+    def __init__(self, pool, interval=1.0, history=256, heartbeat=15, max_clients=100):
+        self.pool = pool
+        self.interval = interval
+        self.history = history
+        self.heartbeat = heartbeat
+        self.max_clients = max_clients
+        self.clients = 0
+        self.closed = False
+
+        self._events = deque(maxlen=history)
+        # Номер последней прочитанной записи журнала; None — журнал ещё не читали
+        self._seq = None
+        self._cond = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._seq is None:
+                self.poll()
+            # После fork поток-рассыльщик не переживает, поэтому проверяем is_alive
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='vote-stream', daemon=True)
+                self._thread.start()
+
+    def _read(self, sql, params):
+        conn = self.pool.acquire()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            self.pool.release(conn)
+
+    # Читает новые записи журнала. Первый вызов загружает последние history
+    # записей, чтобы подписчик, пришедший от другого процесса, получил пропущенное.
+    def poll(self):
+        if self._seq is None:
+            rows = self._read('''
+                SELECT seq, initiative_id, votes, deleted FROM vote_changes
+                ORDER BY seq DESC LIMIT ?
+            ''', (self.history,))[::-1]
+            events = [(row[0], json.dumps([change(row)])) for row in rows]
+            with self._cond:
+                self._events.extend(events)
+                self._seq = rows[-1][0] if rows else 0
+            return
+
+        rows = self._read('''
+            SELECT seq, initiative_id, votes, deleted FROM vote_changes
+            WHERE seq > ? ORDER BY seq
+        ''', (self._seq,))
+        if not rows:
+            return
+        changes = {row[1]: change(row) for row in rows}
+        with self._cond:
+            self._seq = rows[-1][0]
+            self._events.append((self._seq, json.dumps(list(changes.values()))))
+            self._cond.notify_all()
+
+    def _run(self):
+        while not self.closed:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except sqlite3.Error as e:
+                print(f"Ошибка чтения журнала голосов: {e}")
+
+    def _events_after(self, last_seq):
+        return [event for event in self._events if event[0] > last_seq]
+
+    def subscribe(self):
+        with self._cond:
+            if self.closed or self.clients >= self.max_clients:
+                return False
+            self.clients += 1
+        try:
+            self._ensure_started()
+        except BaseException:
+            self.unsubscribe()
+            raise
+        return True
+
+    def unsubscribe(self):
+        with self._cond:
+            self.clients -= 1
+
+    # Завершает все открытые потоки: клиенты переподключатся к другому обработчику
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    # Генератор потока событий для одного подписчика.
+    # last_seq — номер последнего полученного события (заголовок Last-Event-ID),
+    # None для нового подписчика.
+    def stream(self, last_seq=None):
+        with self._cond:
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            # Подписчик пропустил больше, чем хранит журнал
+            missed = last_seq is not None and last_seq < oldest - 1
+            if last_seq is None or missed or last_seq > self._seq:
+                last_seq = self._seq
+
+        yield 'retry: 3000\n\n'
+        if missed:
+            yield 'event: resync\ndata: {}\n\n'
+
+        while True:
+            with self._cond:
+                events = self._events_after(last_seq)
+                if not events:
+                    self._cond.wait(self.heartbeat)
+                    events = self._events_after(last_seq)
+                if self.closed:
+                    return
+            if not events:
+                yield ': ping\n\n'
+                continue
+            for seq, data in events:
+                last_seq = seq
+                yield f'id: {seq}\nevent: votes\ndata: {data}\n\n'
+
+def change(row):
+    return {'id': row[1], 'votes': row[2], 'deleted': bool(row[3])}